@@ -0,0 +1,45 @@
+'''
+  Time rendering ASCII art text of different lengths in each font
+  /asciiart/text offers, with art's text2art and with our glyph tables.
+
+    $ poetry run python benchmarks/ascii_text.py [--repeat N]
+'''
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from art import text2art
+
+from ncss_apis.glyphs import ART_FONTS, load_fonts
+
+LENGTHS = (1, 10, 100, 1000)
+
+def per_call(render, text, repeat):
+  start = time.perf_counter()
+  for _ in range(repeat):
+    render(text)
+  return (time.perf_counter() - start) / repeat
+
+def main():
+  parser = argparse.ArgumentParser()
+  parser.add_argument('--repeat', type=int, default=200)
+  args = parser.parse_args()
+
+  start = time.perf_counter()
+  fonts = load_fonts()
+  print(f'building glyph tables: {(time.perf_counter() - start) * 1000:.1f} ms')
+
+  sample = 'The quick brown fox jumps over the lazy dog. '
+  print(f'{"font":14} {"length":>7} {"text2art":>12} {"tables":>12}')
+  for name in ART_FONTS:
+    for length in LENGTHS:
+      text = (sample * (length // len(sample) + 1))[:length]
+      art = per_call(lambda text: text2art(text, font=name), text, args.repeat)
+      tables = per_call(fonts[name].render, text, args.repeat)
+      print(f'{name:14} {length:7} {art * 1e6:9.1f} µs {tables * 1e6:9.1f} µs')
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,44 @@
+'''
+  Time drawing bar charts of the largest values out of large datasets, and
+  all of a small one compared with ascii_art's Bar.
+
+    $ poetry run python benchmarks/bar_chart.py [--repeat N]
+'''
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from ascii_art import Bar
+
+from ncss_apis.chart import bar_chart
+
+def per_call(draw, repeat):
+  start = time.perf_counter()
+  for _ in range(repeat):
+    draw()
+  return (time.perf_counter() - start) / repeat
+
+def main():
+  parser = argparse.ArgumentParser()
+  parser.add_argument('--repeat', type=int, default=20)
+  args = parser.parse_args()
+
+  rng = random.Random(1)
+  for size in (1000, 10000, 100000):
+    items = [(f'item{n}', rng.expovariate(0.001)) for n in range(size)]
+    for options in ({'top': 20}, {'top': 20, 'sort': 'desc'}, {'top': 1000, 'log': True}):
+      took = per_call(lambda: bar_chart(items, **options), args.repeat)
+      print(f'{size:6} items, {str(options):32} {took * 1000:8.2f} ms')
+
+  data = {f'item{n}': rng.expovariate(0.001) for n in range(1000)}
+  items = list(data.items())
+  ours = per_call(lambda: bar_chart(items), args.repeat)
+  theirs = per_call(lambda: Bar(data).render(), args.repeat)
+  print(f'all of 1000 items:  {ours * 1000:8.2f} ms, ascii_art: {theirs * 1000:8.2f} ms')
+
+if __name__ == '__main__':
+  main()
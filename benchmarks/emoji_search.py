@@ -0,0 +1,60 @@
+'''
+  Time looking up emojis: /emoji/<key> with the index against emojislib's
+  searches, and /emoji/search for exact words, prefixes and typos.
+
+    $ poetry run python benchmarks/emoji_search.py [--repeat N]
+'''
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import emojislib
+
+from ncss_apis.emoji import EmojiIndex, EmojiSearch, Emojis
+
+KEYS = ['dog', 'face', 'smile', 'food', 'oodl', 'xyzzy']
+QUERIES = ['dog', 'do', 'dgo', 'smlie', 'thmubsup', 'pizaa', 'animals', 'xyzzy']
+
+def emojislib_emojis(key):
+  # What /emoji/<key> did before the index.
+  by_key = list(emojislib.by_key(key))
+  by_name = [emojislib.by_name(key).char] if emojislib.by_name(key) else []
+  search_by_name = list(emojislib.search_by_name(key))
+  search_by_key = list(emojislib.search_by_key(key))
+  search_by_category = list(emojislib.search_by_cate(key))
+  return list(set(by_key or by_name or search_by_name or search_by_key or search_by_category))
+
+def per_call(find, query, repeat):
+  start = time.perf_counter()
+  for _ in range(repeat):
+    find(query)
+  return (time.perf_counter() - start) / repeat
+
+def main():
+  parser = argparse.ArgumentParser()
+  parser.add_argument('--repeat', type=int, default=200)
+  args = parser.parse_args()
+
+  start = time.perf_counter()
+  index = EmojiIndex(Emojis)
+  built = time.perf_counter()
+  search = EmojiSearch(Emojis)
+  print(f'building the index: {(built - start) * 1000:.1f} ms, the search index: {(time.perf_counter() - built) * 1000:.1f} ms')
+
+  print('/emoji/<key>')
+  for key in KEYS:
+    ours = per_call(index.search, key, args.repeat) if key not in index.index else per_call(index.__getitem__, key, args.repeat)
+    theirs = per_call(emojislib_emojis, key, args.repeat)
+    print(f'  {key:10} {ours * 1e6:9.1f} µs, emojislib: {theirs * 1e6:9.1f} µs')
+
+  # Uncached, as each query would be the first time it's asked.
+  print('/emoji/search')
+  for query in QUERIES:
+    took = per_call(lambda query: search.search.__wrapped__(search, query, 10), query, args.repeat)
+    print(f'  {query:10} {took * 1e6:9.1f} µs')
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,53 @@
+'''
+  Time working out sunrise, sunset and golden hours for every day over a
+  range of years, as /goldenhour does for a latitude and longitude.
+
+    $ poetry run python benchmarks/golden_hour.py [--years N]
+'''
+import argparse
+import os
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from astral import Astral, AstralError, SUN_RISING, SUN_SETTING
+
+from ncss_apis.solar import DAY_EVENTS, day_events, day_events_range
+
+def main():
+  parser = argparse.ArgumentParser()
+  parser.add_argument('--years', type=int, default=10)
+  args = parser.parse_args()
+
+  lat, lon = -33.87, 151.21
+  days = [date(2020, 1, 1) + timedelta(days=n) for n in range(round(args.years * 365.25))]
+
+  start = time.perf_counter()
+  day_events_range(days[0], len(days), lat, lon)
+  solar = time.perf_counter() - start
+
+  start = time.perf_counter()
+  for day in days:
+    day_events(day, lat, lon)
+  one_by_one = time.perf_counter() - start
+
+  # The same six times per day from Astral, for comparison.
+  a = Astral()
+  start = time.perf_counter()
+  for day in days:
+    for _, elevation, rising in DAY_EVENTS:
+      try:
+        a.time_at_elevation_utc(elevation, SUN_RISING if rising else SUN_SETTING, day, lat, lon)
+      except AstralError:
+        pass
+  astral = time.perf_counter() - start
+
+  print(f'days:                   {len(days)}')
+  print(f'all six times:          {solar * 1000:8.1f} ms')
+  print(f'one day at a time:      {one_by_one * 1000:8.1f} ms')
+  print(f'astral, all six times:  {astral * 1000:8.1f} ms')
+
+if __name__ == '__main__':
+  main()
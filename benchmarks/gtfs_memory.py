@@ -0,0 +1,69 @@
+'''
+  Compare the memory used per stop time by the columnar GTFS tables with
+  the csv.DictReader rows they replaced.
+
+    $ poetry run python benchmarks/gtfs_memory.py [--scale N] [path]
+
+  --scale repeats the feed's stop times N times under fresh trip IDs, to
+  approximate a larger feed.
+'''
+import argparse
+import csv
+import gc
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from ncss_apis.gtfs import FEED_TABLES, Table, Feed
+
+def read_rows(path, scale):
+  with open(os.path.join(path, 'stop_times.txt'), encoding='utf-8-sig', newline='') as f:
+    reader = csv.reader(f)
+    names = next(reader)
+    rows = list(reader)
+  trip = names.index('trip_id')
+  for copy in range(scale):
+    for row in rows:
+      row = list(row)
+      row[trip] = f'{row[trip]}{copy:04}'
+      yield names, row
+
+def measure(build):
+  gc.collect()
+  tracemalloc.start()
+  result = build()
+  gc.collect()
+  size, _ = tracemalloc.get_traced_memory()
+  tracemalloc.stop()
+  return result, size
+
+def main():
+  parser = argparse.ArgumentParser()
+  parser.add_argument('path', nargs='?', default='data/buses')
+  parser.add_argument('--scale', type=int, default=1)
+  args = parser.parse_args()
+
+  source = list(read_rows(args.path, args.scale))
+  names = source[0][0]
+  rows = [row for _, row in source]
+  # Copy the strings so both measurements pay for their own.
+  fresh = lambda: ([value[:1] + value[1:] for value in row] for row in rows)
+
+  dicts, dicts_size = measure(lambda: [dict(zip(names, row)) for row in fresh()])
+  del dicts
+  table, table_size = measure(lambda: Table.build(names, fresh()))
+
+  tables = {name: Table.read(args.path, name) for name in FEED_TABLES if name != 'stop_times'}
+  tables['stop_times'] = table
+  feed, feed_size = measure(lambda: Feed(tables))
+
+  count = len(rows)
+  print(f'stop times:          {count}')
+  print(f'dict per row:        {dicts_size / count:8.1f} bytes per stop time')
+  print(f'columnar table:      {table_size / count:8.1f} bytes per stop time')
+  print(f'+ indexes:           {feed_size / count:8.1f} bytes per stop time')
+
+if __name__ == '__main__':
+  main()
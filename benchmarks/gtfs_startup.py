@@ -0,0 +1,71 @@
+'''
+  Compare how long a worker takes to load the GTFS feed by parsing the .txt
+  files against loading the binary snapshot.
+
+    $ poetry run python benchmarks/gtfs_startup.py [--scale N] [path]
+
+  --scale writes a copy of the feed with its trips repeated N times
+  under fresh trip IDs, to approximate a larger feed.
+'''
+import argparse
+import csv
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from ncss_apis.gtfs import FEED_TABLES, build_snapshot, read_feed, read_snapshot
+
+def scaled_copy(path, directory, scale):
+  for name in FEED_TABLES:
+    shutil.copy(os.path.join(path, f'{name}.txt'), directory)
+
+  for name in ['stop_times', 'trips']:
+    with open(os.path.join(path, f'{name}.txt'), encoding='utf-8-sig', newline='') as f:
+      reader = csv.reader(f)
+      names = next(reader)
+      rows = list(reader)
+    trip = names.index('trip_id')
+    with open(os.path.join(directory, f'{name}.txt'), 'w', encoding='utf-8', newline='') as f:
+      writer = csv.writer(f)
+      writer.writerow(names)
+      for copy in range(scale):
+        for row in rows:
+          writer.writerow(row[:trip] + [f'{row[trip]}{copy:04}'] + row[trip + 1:])
+
+def best_of(repeat, load):
+  times = []
+  for _ in range(repeat):
+    start = time.perf_counter()
+    load()
+    times.append(time.perf_counter() - start)
+  return min(times)
+
+def main():
+  parser = argparse.ArgumentParser()
+  parser.add_argument('path', nargs='?', default='data/buses')
+  parser.add_argument('--scale', type=int, default=1)
+  parser.add_argument('--repeat', type=int, default=5)
+  args = parser.parse_args()
+
+  with tempfile.TemporaryDirectory() as directory:
+    path = os.path.join(directory, 'feed')
+    os.mkdir(path)
+    scaled_copy(args.path, path, args.scale)
+    snapshot = os.path.join(directory, 'feed.snapshot')
+
+    build = best_of(1, lambda: build_snapshot(path, snapshot))
+    parse = best_of(args.repeat, lambda: read_feed(path))
+    load = best_of(args.repeat, lambda: read_snapshot(snapshot, path))
+
+    print(f'stop times:      {len(read_feed(path).stop_times)}')
+    print(f'snapshot size:   {os.path.getsize(snapshot) / 1024:.0f} KiB')
+    print(f'build snapshot:  {build * 1000:8.1f} ms (once per feed change)')
+    print(f'parse .txt:      {parse * 1000:8.1f} ms per worker')
+    print(f'load snapshot:   {load * 1000:8.1f} ms per worker')
+
+if __name__ == '__main__':
+  main()
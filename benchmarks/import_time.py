@@ -0,0 +1,55 @@
+'''
+  Measure how long a worker takes to start: the import time of each
+  ncss_apis module, from python -X importtime, then how long each value
+  loaded on first use takes to build.
+
+    $ poetry run python benchmarks/import_time.py
+'''
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(__file__), '..')
+sys.path.insert(0, ROOT)
+
+def import_times():
+  '''Cumulative import time in microseconds of ncss_apis and each of its
+  modules, in a fresh interpreter.'''
+  result = subprocess.run(
+    [sys.executable, '-X', 'importtime', '-c', 'import ncss_apis'],
+    cwd=ROOT, capture_output=True, text=True, check=True,
+    env={key: value for key, value in os.environ.items() if key != 'NCSS_APIS_WARM'},
+  )
+  times = {}
+  for line in result.stderr.splitlines():
+    if not line.startswith('import time:') or '|' not in line:
+      continue
+    _, cumulative, name = line.split('|')
+    name = name.strip()
+    if name == 'ncss_apis' or name.startswith('ncss_apis.'):
+      times[name] = int(cumulative)
+  return times
+
+def main():
+  times = import_times()
+  print('import                               ms')
+  for name, micros in sorted(times.items(), key=lambda item: -item[1]):
+    print(f'  {name:<32} {micros / 1000:8.1f}')
+
+  os.chdir(ROOT)
+  import ncss_apis  # noqa: F401
+  from ncss_apis.utils import lazy_values
+
+  print('first use                            ms')
+  total = 0
+  for value in lazy_values:
+    start = time.perf_counter()
+    value.get()
+    elapsed = time.perf_counter() - start
+    total += elapsed
+    print(f'  {value.name:<32} {elapsed * 1000:8.1f}')
+  print(f'  {"all (NCSS_APIS_WARM=1)":<32} {total * 1000:8.1f}')
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,83 @@
+'''
+  Time journey planning queries against a synthetic city: routes running
+  back and forth across a grid of stops all day, with transfers wherever
+  they cross, short walks between stops, and some trips that don't run.
+
+    $ poetry run python benchmarks/journey_planner.py [--routes N] [--queries Q]
+'''
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from ncss_apis.planner import Connections, earliest_arrival
+
+def main():
+  parser = argparse.ArgumentParser()
+  parser.add_argument('--routes', type=int, default=100)
+  parser.add_argument('--stops-per-route', type=int, default=40)
+  parser.add_argument('--headway', type=int, default=600, help='seconds between buses on a route')
+  parser.add_argument('--queries', type=int, default=200)
+  parser.add_argument('--footpaths', type=int, default=3, help='stops each stop can walk to')
+  args = parser.parse_args()
+
+  rng = random.Random(0)
+  stops = args.routes * args.stops_per_route // 4
+  dep_stop, arr_stop, dep_time, arr_time, trips = [], [], [], [], []
+  trip = 0
+  for _ in range(args.routes):
+    route = rng.sample(range(stops), args.stops_per_route)
+    hops = [rng.randint(60, 180) for _ in route[1:]]
+    for start in range(5 * 3600 + rng.randrange(args.headway), 23 * 3600, args.headway):
+      for path in (route, route[::-1]):
+        clock = start
+        for hop, (here, there) in zip(hops, zip(path, path[1:])):
+          dep_stop.append(here)
+          arr_stop.append(there)
+          dep_time.append(clock)
+          clock += hop
+          arr_time.append(clock)
+          clock += 20
+        trips.append(trip)
+        trip += 1
+  # trip per connection: each trip has stops_per_route - 1 connections
+  trip_of = [t for t in trips for _ in range(args.stops_per_route - 1)]
+
+  # Sorted the way build_indexes sorts them.
+  start = time.perf_counter()
+  columns = zip(*sorted(zip(dep_time, arr_time, dep_stop, arr_stop, trip_of)))
+  dep_time, arr_time, dep_stop, arr_stop, trip_of = map(list, columns)
+  connections = Connections(dep_stop, arr_stop, dep_time, arr_time, trip_of)
+  build = time.perf_counter() - start
+
+  footpaths = {}
+  for stop in range(stops):
+    for other in rng.sample(range(stops), args.footpaths):
+      if other != stop:
+        footpaths.setdefault(stop, []).append((other, rng.randint(60, 600)))
+  # Every fifth trip doesn't run, as if its service had the day off.
+  runs = lambda c: trip_of[c] % 5 != 0
+
+  queries = [
+    (rng.randrange(stops), rng.randrange(stops), rng.randrange(6 * 3600, 20 * 3600))
+    for _ in range(args.queries)
+  ]
+  timings = {}
+  for name, options in [('journey', {}), ('with walks', {'footpaths': footpaths, 'runs': runs})]:
+    found = 0
+    start = time.perf_counter()
+    for source, target, depart in queries:
+      found += earliest_arrival(connections, source, target, depart, **options) is not None
+    timings[name] = ((time.perf_counter() - start) / len(queries), found)
+
+  print(f'stops:         {stops}')
+  print(f'connections:   {len(connections)}')
+  print(f'sort:          {build * 1000:8.1f} ms')
+  for name, (query, found) in timings.items():
+    print(f'{name + ":":<15}{query * 1000:8.1f} ms per query ({found}/{len(queries)} found)')
+
+if __name__ == '__main__':
+  main()
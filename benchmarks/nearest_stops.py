@@ -0,0 +1,59 @@
+'''
+  Time nearest stop queries against a synthetic national scale stop table:
+  stops clustered around cities across Australia.
+
+    $ poetry run python benchmarks/nearest_stops.py [--stops N] [--k K]
+'''
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from ncss_apis.geo import PointGrid, build_grid
+
+def main():
+  parser = argparse.ArgumentParser()
+  parser.add_argument('--stops', type=int, default=300000)
+  parser.add_argument('--k', type=int, default=5)
+  parser.add_argument('--queries', type=int, default=10000)
+  args = parser.parse_args()
+
+  rng = random.Random(0)
+  cities = [(rng.uniform(-42, -12), rng.uniform(115, 153)) for _ in range(50)]
+  lats, lons = [], []
+  for _ in range(args.stops):
+    lat, lon = rng.choice(cities)
+    lats.append(rng.gauss(lat, 0.15))
+    lons.append(rng.gauss(lon, 0.15))
+
+  start = time.perf_counter()
+  grid = PointGrid(lats, lons, *build_grid(lats, lons))
+  build = time.perf_counter() - start
+
+  queries = []
+  for _ in range(args.queries):
+    lat, lon = rng.choice(cities)
+    queries.append((rng.gauss(lat, 0.1), rng.gauss(lon, 0.1)))
+  start = time.perf_counter()
+  for lat, lon in queries:
+    grid.nearest(lat, lon, args.k)
+  query = (time.perf_counter() - start) / len(queries)
+
+  # Places far from every city, where the nearest stops are hundreds of
+  # kilometres away, and off the coast.
+  far = [(-25, 133), (-30, 125), (-20, 140), (-45, 100), (0, 170)]
+  start = time.perf_counter()
+  for lat, lon in far:
+    grid.nearest(lat, lon, args.k)
+  far_query = (time.perf_counter() - start) / len(far)
+
+  print(f'stops:         {args.stops}')
+  print(f'build grid:    {build * 1000:8.1f} ms')
+  print(f'nearest {args.k}:     {query * 1e6:8.1f} us per query')
+  print(f'far from all:  {far_query * 1000:8.1f} ms per query')
+
+if __name__ == '__main__':
+  main()
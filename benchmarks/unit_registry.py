@@ -0,0 +1,50 @@
+'''
+  Time building the unit registry in a fresh worker: without a cache, with
+  an empty cache (the first worker after a deploy), and with the cache
+  already written (every worker after that).
+
+    $ poetry run python benchmarks/unit_registry.py [--runs N]
+'''
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.join(os.path.dirname(__file__), '..')
+
+# Run in a new interpreter each time, as a worker would be.
+WORKER = '''
+import sys, time
+start = time.perf_counter()
+from ncss_apis.convert import make_units
+import pint
+if sys.argv[1] == 'none':
+  pint.UnitRegistry()
+else:
+  make_units(sys.argv[1])
+print(time.perf_counter() - start)
+'''
+
+def worker(cache):
+  result = subprocess.run([sys.executable, '-c', WORKER, cache], cwd=ROOT, capture_output=True, text=True, check=True)
+  return float(result.stdout)
+
+def main():
+  parser = argparse.ArgumentParser()
+  parser.add_argument('--runs', type=int, default=5)
+  args = parser.parse_args()
+
+  uncached, cold, warm = [], [], []
+  for _ in range(args.runs):
+    uncached.append(worker('none'))
+    with tempfile.TemporaryDirectory() as cache:
+      cold.append(worker(cache))
+      warm.append(worker(cache))
+
+  print(f'no cache:      {min(uncached) * 1000:8.1f} ms per worker')
+  print(f'empty cache:   {min(cold) * 1000:8.1f} ms per worker')
+  print(f'warm cache:    {min(warm) * 1000:8.1f} ms per worker')
+
+if __name__ == '__main__':
+  main()
@@ -12,3 +12,10 @@ from . import (
     secret
 )
 
+from .utils import warm
+
+# Load everything up front, e.g. with gunicorn --preload so that workers
+# start with it all already loaded and share it. Set with NCSS_APIS_WARM,
+# which like any setting is read as JSON, so 0 and false leave it off.
+if app.config.get('WARM'):
+  warm()
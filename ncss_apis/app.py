@@ -1,3 +1,7 @@
 from flask import Flask
 
 app = Flask('ncss-apis')
+
+# Settings can be changed with NCSS_APIS_ environment variables, e.g.
+# NCSS_APIS_ASCII_ART_MAX_LENGTH=500.
+app.config.from_prefixed_env('NCSS_APIS')
@@ -1,9 +1,26 @@
-from ascii_art import Bar
-from art import text2art
-from flask import request, abort
+import csv
+import io
+from math import isfinite
+
+from flask import request, abort, Response
 
 from .app import app
-from .utils import plain_textify
+from .chart import SORTS, bar_chart
+from .glyphs import largest_glyph, load_fonts
+from .utils import Lazy, lazy_import, plain_textify
+
+# art takes a while to import, so wait until it's used.
+text2art = lazy_import('art', 'text2art')
+fonts = Lazy(load_fonts, 'ASCII art fonts')
+largest_glyphs = Lazy(largest_glyph, 'largest ASCII art glyph')
+
+# Wide fonts turn a few characters into kilobytes, so /asciiart/text limits
+# how long the string, and how big the art, can be. Art bigger than
+# ASCII_ART_STREAM_SIZE is streamed a line at a time rather than built up
+# in memory. Each can be changed with e.g. NCSS_APIS_ASCII_ART_MAX_LENGTH.
+app.config.setdefault('ASCII_ART_MAX_LENGTH', 1000)
+app.config.setdefault('ASCII_ART_MAX_SIZE', 1000000)
+app.config.setdefault('ASCII_ART_STREAM_SIZE', 64000)
 
 @app.route('/asciiart/text', methods=['GET'])
 def ascii_art_api():
@@ -36,19 +53,45 @@ def ascii_art_api():
             schema:
               type: string
               example: 3140 metres
+      413:
+        description: The string is too long
+      422:
+        description: The string would make too much ASCII art in that font
   '''
   value = request.args.get('string', '')
   font = request.args.get('font')
-  art = text2art(value, font=font).replace('\r\n', '\n')
-  return plain_textify(art)
 
-@app.route('/chart/bar', methods=['GET'])
+  max_length = app.config['ASCII_ART_MAX_LENGTH']
+  if len(value) > max_length:
+    abort(413, f"The string can be at most {max_length} characters long")
+
+  # Fonts we don't have tables for are sized as if every character were the
+  # biggest glyph in any font.
+  glyphs = fonts.get().get(font.lower()) if isinstance(font, str) else None
+  size = glyphs.size(value) if glyphs else len(value) * largest_glyphs.get()
+  if size > app.config['ASCII_ART_MAX_SIZE']:
+    abort(422, "That would be too much ASCII art, try a shorter string or a smaller font")
+
+  if glyphs is None:
+    return plain_textify(text2art(value, font=font).replace('\r\n', '\n'))
+  if size > app.config['ASCII_ART_STREAM_SIZE']:
+    return Response(glyphs.lines(value), content_type='text/plain; charset=utf-8')
+  return plain_textify(glyphs.render(value))
+
+MAX_BAR_ITEMS = 100000
+MAX_BAR_ROWS = 1000
+MAX_BAR_WIDTH = 1000
+
+@app.route('/chart/bar', methods=['GET', 'POST'])
 def chart_bar_api():
   '''
-    Render data as a bar chart using ASCII art. Any number of key/value pairs may be provided.
+    Render data as a bar chart using ASCII art. Any number of key/value pairs may be provided, as query parameters, or for larger datasets as a JSON object or CSV of label,value rows in a POST body.
     ---
     tags:
       - ASCII
+    consumes:
+      - application/json
+      - text/csv
     parameters:
       - in: query
         name: item1
@@ -68,6 +111,40 @@ def chart_bar_api():
           type: integer
           example: 1
         description: an example of a key/value pair
+      - in: query
+        name: top
+        schema:
+          type: integer
+          example: 10
+        description: only draw this many of the largest values
+      - in: query
+        name: sort
+        schema:
+          type: string
+          enum: ['desc', 'asc', 'key']
+          example: desc
+        description: sort the bars by value, largest or smallest first, or by key, rather than in the order given
+      - in: query
+        name: width
+        schema:
+          type: integer
+          default: 60
+          example: 40
+        description: how many characters long the largest bar is, at most 1000
+      - in: query
+        name: log
+        schema:
+          type: boolean
+          default: false
+        description: scale the bars logarithmically
+      - in: body
+        name: data
+        schema:
+          type: object
+          additionalProperties:
+            type: number
+          example: {"item1": 12, "item2": 23, "item3": 1}
+        description: up to 100000 key/value pairs, as a JSON object, or CSV rows of key,value. At most 1000 are drawn, so use top for more
     responses:
       200:
         description: The bar chart
@@ -77,16 +154,59 @@ def chart_bar_api():
               type: string
               example: item1 | ###############################                              | 12.0
   '''
+  def int_arg(name, default=None):
+    value = request.args.get(name)
+    if value is None:
+      return default
+    try:
+      value = int(value)
+    except ValueError:
+      abort(400, f"{name} must be a whole number")
+    if value < 1:
+      abort(400, f"{name} must be at least 1")
+    return value
+
+  top = int_arg('top')
+  width = int_arg('width', 60)
+  if width > MAX_BAR_WIDTH:
+    abort(400, f"width can be at most {MAX_BAR_WIDTH}")
+  sort = request.args.get('sort')
+  if sort is not None and sort not in SORTS:
+    abort(400, "sort must be one of " + ', '.join(SORTS))
+  log = request.args.get('log', 'false').lower()
+  if log not in ('true', 'false'):
+    abort(400, "log must be true or false")
+
+  if request.method == 'GET':
+    pairs = [(key, value) for key, value in request.args.items() if key not in ('top', 'sort', 'width', 'log')]
+  elif request.mimetype == 'text/csv':
+    rows = csv.reader(io.StringIO(request.get_data(as_text=True)))
+    pairs = [row for row in rows if row]
+    if any(len(row) != 2 for row in pairs):
+      abort(400, "Each CSV row must be a key and a value")
+  else:
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+      abort(400, "expecting a json object or csv of key/value pairs in request body")
+    pairs = [(key, value) for key, value in data.items() if not isinstance(value, bool)]
+    if len(pairs) != len(data):
+      abort(400, "One or more values was not a valid integer")
+
+  if len(pairs) > MAX_BAR_ITEMS:
+    abort(400, f"At most {MAX_BAR_ITEMS} key/value pairs can be charted")
   try:
-    data = {key: float(value) for key, value in request.args.items()}
-  except ValueError:
+    items = [(key, float(value)) for key, value in pairs]
+  except (TypeError, ValueError):
+    abort(400, "One or more values was not a valid integer")
+  if not all(isfinite(value) for _, value in items):
     abort(400, "One or more values was not a valid integer")
 
-  if not data:
+  if not items:
     abort(400, "Must provide at least one key/value pair")
+  if min(len(items), top or len(items)) > MAX_BAR_ROWS:
+    abort(400, f"At most {MAX_BAR_ROWS} bars can be drawn, use top to pick out the largest")
 
-  b = Bar(data)
-  return plain_textify(b.render())
+  return plain_textify(bar_chart(items, width=width, top=top, sort=sort, log=log == 'true'))
 
 
 @app.route('/woah', methods=['GET'])
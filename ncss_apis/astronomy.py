@@ -1,9 +1,106 @@
-from astral import Astral
-from flask import request, abort
-from datetime import datetime
+from flask import request, abort, jsonify
+from werkzeug.exceptions import HTTPException
+from datetime import date, datetime, timedelta, timezone
+from functools import lru_cache
+from math import ceil, degrees, floor, radians, sin
 
 from .app import app
-from .utils import plain_textify
+from .solar import day_events_range
+from .utils import Lazy, plain_textify
+
+def _proper_angle(value):
+  if value > 0.0:
+    value /= 360.0
+    return (value - floor(value)) * 360.0
+  else:
+    tmp = ceil(abs(value / 360.0))
+    return value + tmp * 360.0
+
+def _moon_phase(day):
+  # The same sums as Astral.moon_phase, in the same order so the results
+  # are identical, but without building an Astral and its city database.
+  jd = day.toordinal() - date(1900, 1, 1).toordinal() + 2 + 2415018.5 + 0.0
+  DT = pow((jd - 2382148), 2) / (41048480 * 86400)
+  T = (jd + DT - 2451545.0) / 36525
+  T2 = pow(T, 2)
+  T3 = pow(T, 3)
+  D = 297.85 + (445267.1115 * T) - (0.0016300 * T2) + (T3 / 545868)
+  D = radians(_proper_angle(D))
+  M = 357.53 + (35999.0503 * T)
+  M = radians(_proper_angle(M))
+  M1 = 134.96 + (477198.8676 * T) + (0.0089970 * T2) + (T3 / 69699)
+  M1 = radians(_proper_angle(M1))
+  elong = degrees(D) + 6.29 * sin(M1)
+  elong -= 2.10 * sin(M)
+  elong += 1.27 * sin(2 * D - M1)
+  elong += 0.66 * sin(2 * D)
+  elong = _proper_angle(elong)
+  elong = round(elong)
+  moon = ((elong + 6.43) / 360) * 28
+  if moon >= 28.0:
+    moon -= 28.0
+  return int(moon)
+
+@lru_cache(maxsize=4096)
+def moon_phase(day):
+  '''The phase of the moon on `day`, from 0 (new moon) to 27.'''
+  return _moon_phase(day)
+
+def make_astral():
+  from astral import Astral
+  astral = Astral()
+  astral.solar_depression = 'civil'
+  return astral
+
+# Astral loads its database of cities when it's created, so share one.
+astral = Lazy(make_astral)
+
+# The golden hour in each city, as (date, (start, end)), for the date it
+# was last asked for in that city's time zone.
+golden_hours = {}
+
+def golden_hour(city):
+  '''The start and end of today's golden hour in `city`, in its own time
+  zone. The times only change at the city's midnight, so they are worked
+  out once per city per day.'''
+  try:
+    location = astral[city]
+  except KeyError:
+    abort(404, "city not found in database")
+
+  today = datetime.now(location.tz).date()
+  cached = golden_hours.get(location.name)
+  if cached is not None and cached[0] == today:
+    window = cached[1]
+  else:
+    from astral import AstralError
+    try:
+      window = (location.time_at_elevation(174, date=today), location.time_at_elevation(184, date=today))
+    except AstralError:
+      # Near midsummer far enough from the equator, the sun never sets far
+      # enough for golden hour to end (or near midwinter, rise to start).
+      window = None
+    golden_hours[location.name] = (today, window)
+
+  if window is None:
+    abort(422, f'There is no golden hour in {city} today')
+  return window
+
+def golden_hour_message(city, start, end):
+  time = lambda dt: dt.strftime('%-I:%M %p')
+  return f'Golden hour is {time(start)} - {time(end)} in {city}'
+
+def moon_phase_name(phase):
+  if phase < 3.5:
+    return "New Moon"
+  elif phase < 10.5:
+    return "First Quarter"
+  elif phase < 17.5:
+    return "Full Moon"
+  elif phase < 24.5:
+    return "Last Quarter"
+  else:
+    return "New Moon"
 
 @app.route('/moonphase', methods=['GET'])
 def moon_phase_api():
@@ -43,7 +140,6 @@ def moon_phase_api():
               type: string
               example: Full Moon
   """
-  a = Astral()
   year = request.args.get('year')
   month = request.args.get('month')
   day = request.args.get('day')
@@ -73,26 +169,89 @@ def moon_phase_api():
   except ValueError:
     abort(400, 'Invalid date')
 
-  phase = a.moon_phase(dt)
+  return plain_textify(moon_phase_name(moon_phase(dt.date())))
 
-  if phase < 3.5:
-    phase_text = "New Moon"
-  elif phase < 10.5:
-    phase_text = "First Quarter"
-  elif phase < 17.5:
-    phase_text = "Full Moon"
-  elif phase < 24.5:
-    phase_text = "Last Quarter"
-  else:
-    phase_text = "New Moon"
+def date_arg(name, default=None):
+  '''Parse a YYYY-MM-DD query parameter, which is required unless it has
+  a default.'''
+  value = request.args.get(name)
+  if not value:
+    if default is None:
+      abort(400, f'No {name} parameter given')
+    return default
+  try:
+    return datetime.strptime(value, '%Y-%m-%d').date()
+  except ValueError:
+    abort(400, f'{name.capitalize()} is not a valid date')
+
+def date_range_args(limit, default=None, supported=None):
+  '''Every date from the start parameter to the end parameter inclusive,
+  at most `limit` of them. If there's a default start, the end defaults to
+  the start. `supported`, if given, is the (first, last) dates allowed.'''
+  start = date_arg('start', default)
+  end = date_arg('end', default and start)
+  if end < start:
+    abort(400, 'End is before start')
+  if supported is not None and not supported[0] <= start <= end <= supported[1]:
+    abort(400, f'Dates must be from {supported[0].isoformat()} to {supported[1].isoformat()}')
+  if (end - start).days >= limit:
+    abort(400, f'At most {limit} days can be asked for at once')
+  return [start + timedelta(days=offset) for offset in range((end - start).days + 1)]
 
-  return plain_textify(phase_text)
+MAX_MOON_RANGE = 3660  # days, about ten years
+
+@app.route('/moonphase/range', methods=['GET'])
+def moon_phase_range_api():
+  """
+    Show the moon's phase for every day in a range of dates
+    ---
+    tags:
+      - astronomy
+    parameters:
+      - in: query
+        name: start
+        required: true
+        schema:
+          type: string
+          example: '2019-01-01'
+        description: the first date (YYYY-MM-DD) you would like the moon phase for
+      - in: query
+        name: end
+        required: true
+        schema:
+          type: string
+          example: '2019-12-31'
+        description: the last date (YYYY-MM-DD) you would like the moon phase for, at most 3660 days after the start
+    responses:
+      200:
+        description: The moon phase for each day, in order
+        schema:
+          type: array
+          items:
+            type: object
+            properties:
+              date:
+                type: string
+                example: '2019-01-13'
+              phase:
+                type: integer
+                example: 7
+                description: the day of the lunar cycle, from 0 (new moon) to 27
+              name:
+                type: string
+                example: First Quarter
+  """
+  phases = []
+  for day in date_range_args(MAX_MOON_RANGE):
+    phase = _moon_phase(day)
+    phases.append({'date': day.isoformat(), 'phase': phase, 'name': moon_phase_name(phase)})
+  return jsonify(phases)
 
 
 @app.route('/goldenhour', methods=['GET'])
 def goldenhour_api():
   '''
-    Find out the time of today's 'golden hour' for a given city
+    Find out the time of today's 'golden hour' for a given city, or of sunrise, sunset and golden hours anywhere over a range of dates
     ---
     tags:
       - astronomy
@@ -104,26 +263,138 @@ def goldenhour_api():
           example: Sydney
           default: Sydney
         description: the city you want to know the time of golden hour in
+      - in: query
+        name: lat
+        schema:
+          type: number
+          example: -33.87
+        description: the latitude of anywhere at all, instead of a city. Needs lon too
+      - in: query
+        name: lon
+        schema:
+          type: number
+          example: 151.21
+        description: the longitude, to go with lat
+      - in: query
+        name: start
+        schema:
+          type: string
+          example: '2019-01-01'
+        description: with lat and lon, the first date (YYYY-MM-DD, UTC) to give times for, from 0001-01-02 to 9999-12-30. Defaults to today
+      - in: query
+        name: end
+        schema:
+          type: string
+          example: '2019-01-31'
+        description: with lat and lon, the last date (YYYY-MM-DD, UTC) to give times for, at most 3660 days after the start. Defaults to the start
     responses:
       200:
-        description: A description of the time of golden hour
+        description: For a city, a description of the time of golden hour. For lat and lon, a JSON array with the UTC times of sunrise, sunset, and the morning and evening golden hours (the sun between -4 and 6 degrees) on each day. A time is null if the sun doesn't reach that elevation that day
         content:
           text/plain:
             schema:
               type: string
               example: Golden hour is 7:27pm - 8:22pm in Sydney'
+      422:
+        description: The city has no golden hour today, e.g. because the sun doesn't set far enough
   '''
+  if 'lat' in request.args or 'lon' in request.args:
+    return goldenhour_location()
+
   city = request.args.get('city', 'Sydney')
+  start, end = golden_hour(city)
+  return plain_textify(golden_hour_message(city, start, end))
 
-  a = Astral()
-  a.solar_depression = 'civil'
-  try:
-    city_data = a[city]
-  except KeyError:
-    abort(404, "city not found in database")
+MAX_GOLDEN_HOUR_RANGE = 3660  # days, about ten years
+# Times on the very first and last days can fall outside what a datetime
+# can hold, depending on the longitude.
+GOLDEN_HOUR_DATES = (date.min + timedelta(days=1), date.max - timedelta(days=1))
 
-  start = city_data.time_at_elevation(174)
-  end = city_data.time_at_elevation(184)
-  time = lambda dt: dt.strftime('%-I:%M %p')
+def goldenhour_location():
+  def coordinate_arg(name, limit):
+    value = request.args.get(name)
+    if not value:
+      abort(400, f'No {name} parameter given')
+    try:
+      value = float(value)
+    except ValueError:
+      abort(400, f'{name.capitalize()} is an invalid number')
+    if not -limit <= value <= limit:
+      abort(400, f'{name.capitalize()} must be between {-limit} and {limit}')
+    return value
+
+  lat = coordinate_arg('lat', 90)
+  lon = coordinate_arg('lon', 180)
+  today = datetime.now(timezone.utc).date()
+
+  days = date_range_args(MAX_GOLDEN_HOUR_RANGE, today, GOLDEN_HOUR_DATES)
+  events = day_events_range(days[0], len(days), lat, lon)
+  return jsonify([
+    {'date': day.isoformat(), **{name: time and time.isoformat() for name, time in day_events.items()}}
+    for day, day_events in zip(days, events)
+  ])
+
+MAX_GOLDEN_HOUR_CITIES = 100
+
+@app.route('/goldenhour/batch', methods=['GET'])
+def goldenhour_batch_api():
+  '''
+    Find out the time of today's 'golden hour' in many cities at once
+    ---
+    tags:
+      - astronomy
+    parameters:
+      - in: query
+        name: city
+        required: true
+        schema:
+          type: array
+          items:
+            type: string
+          example: [Sydney, Adelaide]
+        style: form
+        explode: true
+        description: the cities you want to know the time of golden hour in, up to 100, e.g. ?city=Sydney&city=Adelaide
+    responses:
+      200:
+        description: The golden hour in each city, in the order they were given. A city that isn't in the database, or has no golden hour today, gets an object with an error code and message instead
+        schema:
+          type: array
+          items:
+            type: object
+            properties:
+              city:
+                type: string
+                example: Sydney
+              start:
+                type: string
+                example: '2019-01-13T19:27:41+11:00'
+                description: when golden hour starts, in the city's time zone
+              end:
+                type: string
+                example: '2019-01-13T20:22:05+11:00'
+                description: when golden hour ends, in the city's time zone
+              message:
+                type: string
+                example: Golden hour is 7:27 PM - 8:22 PM in Sydney
+  '''
+  cities = request.args.getlist('city')
+  if not cities:
+    abort(400, 'No city parameter given')
+  if len(cities) > MAX_GOLDEN_HOUR_CITIES:
+    abort(400, f'At most {MAX_GOLDEN_HOUR_CITIES} cities can be asked for at once')
 
-  return plain_textify(f'Golden hour is {time(start)} - {time(end)} in {city}')
+  results = []
+  for city in cities:
+    try:
+      start, end = golden_hour(city)
+    except HTTPException as e:
+      results.append({'city': city, 'error': e.code, 'message': e.description})
+      continue
+    results.append({
+      'city': city,
+      'start': start.isoformat(),
+      'end': end.isoformat(),
+      'message': golden_hour_message(city, start, end),
+    })
+  return jsonify(results)
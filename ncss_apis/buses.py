@@ -1,13 +1,77 @@
-import csv
-from datetime import datetime
+import json
+from datetime import date, datetime
 
-from flask import request, abort, jsonify
+from flask import request, abort, jsonify, url_for, Response
+from werkzeug.exceptions import HTTPException
 
 from .app import app
+from .geo import encode_polyline
+from .gtfs import load_feed, parse_time, format_time
+from .ticker import Ticker
+from .utils import Lazy, StaticBody
 
-stops = list(csv.DictReader(open('data/buses/stops.txt', encoding="utf-8-sig")))
-stop_times = list(csv.DictReader(open('data/buses/stop_times.txt', encoding="utf-8-sig")))
-routes = list(csv.DictReader(open('data/buses/routes.txt', encoding="utf-8-sig")))
+feed = Lazy(lambda: load_feed('data/buses'), 'bus feed')
+
+# These collections never change once the feed is loaded, so serialize them once.
+stops_body = Lazy(lambda: StaticBody.json(list(feed.stops)), 'stops body')
+stop_times_body = Lazy(lambda: StaticBody.json(list(feed.stop_times)), 'stop_times body')
+routes_body = Lazy(lambda: StaticBody.json(list(feed.routes)), 'routes body')
+
+# Tolerances in metres that shapes are simplified to, roughly a pixel at
+# zoom levels 17, 15, 13 and 11. Each shape's body at each of them is
+# serialized the first time it's asked for and kept.
+SHAPE_TOLERANCES = (0, 1, 5, 20, 80)
+shape_bodies = {}
+
+def time_arg(name):
+  '''Parse an optional H:MM:SS query parameter into seconds since midnight.'''
+  value = request.args.get(name)
+  if value is None:
+    return None
+  try:
+    return parse_time(value)
+  except ValueError:
+    abort(400, f'{name!r} was not in the correct format')
+
+def date_arg(name):
+  '''Parse an optional YYYY-MM-DD query parameter.'''
+  value = request.args.get(name)
+  if value is None:
+    return None
+  try:
+    return datetime.strptime(value, '%Y-%m-%d').date()
+  except ValueError:
+    abort(400, f'{name!r} was not in the correct format')
+
+def count_arg(name, minimum, maximum=None):
+  '''Parse an optional whole number query parameter.'''
+  value = request.args.get(name)
+  if value is None:
+    return None
+  try:
+    value = int(value)
+  except ValueError:
+    abort(400, f'{name!r} is not a number')
+  if value < minimum:
+    abort(400, f'{name!r} is too small')
+  if maximum is not None and value > maximum:
+    abort(400, f'{name!r} is too big')
+  return value
+
+def number_arg(name, minimum, maximum, default=None, required=False):
+  '''Parse a query parameter that is a number in a given range.'''
+  value = request.args.get(name)
+  if value is None:
+    if required:
+      abort(400, f'No {name} parameter given')
+    return default
+  try:
+    value = float(value)
+  except ValueError:
+    abort(400, f'{name!r} is not a number')
+  if not minimum <= value <= maximum:
+    abort(400, f'{name!r} must be between {minimum} and {maximum}')
+  return value
 
 @app.route('/buses/stops', methods=['GET'])
 def bus_stops():
@@ -45,8 +109,10 @@ def bus_stops():
                 type: string
                 example: '2'
                 description: the zone ID for the bus stop
+      304:
+        description: The data hasn't changed since the ETag given in If-None-Match
   '''
-  return jsonify(stops)
+  return stops_body.response()
 
 @app.route('/buses/stop_times', methods=['GET'])
 def bus_stop_times():
@@ -55,6 +121,55 @@ def bus_stop_times():
     ---
     tags:
       - buses
+    parameters:
+      - in: query
+        name: stop_id
+        schema:
+          type: string
+          example: '82'
+        description: only include times the bus stops at this stop
+      - in: query
+        name: trip_id
+        schema:
+          type: string
+          example: '1848'
+        description: only include times for this trip, in stop sequence order
+      - in: query
+        name: from
+        schema:
+          type: string
+          example: '07:00:00'
+        description: only include buses arriving at or after this time (24 hour time)
+      - in: query
+        name: until
+        schema:
+          type: string
+          example: '09:00:00'
+        description: only include buses arriving at or before this time (24 hour time)
+      - in: query
+        name: date
+        schema:
+          type: string
+          example: '2015-03-02'
+        description: only include buses running on this date (YYYY-MM-DD)
+      - in: query
+        name: limit
+        schema:
+          type: integer
+          example: 100
+        description: the most stop times to return. If there are more, the Link header gives the URL of the next page
+      - in: query
+        name: cursor
+        schema:
+          type: string
+        description: where to continue from, as given in the Link header of the previous page
+      - in: query
+        name: format
+        schema:
+          type: string
+          enum: ['json', 'ndjson']
+          default: json
+        description: either one JSON array, or newline delimited JSON with one stop time per line
     responses:
       200:
         description: An array of JSON objects each describing the buses' stopping times
@@ -80,8 +195,40 @@ def bus_stop_times():
                 type: string
                 example: '7:04:00'
                 description: the time the bus arrives
+      304:
+        description: The data hasn't changed since the ETag given in If-None-Match
   '''
-  return jsonify(stop_times)
+  stop_id = request.args.get('stop_id')
+  trip_id = request.args.get('trip_id')
+  fmt = request.args.get('format', 'json')
+
+  start = time_arg('from')
+  day = date_arg('date')
+  end = time_arg('until')
+  limit = count_arg('limit', 1)
+  cursor = count_arg('cursor', 0) or 0
+
+  if fmt not in ('json', 'ndjson'):
+    abort(400, "unknown 'format' value")
+
+  filters = (stop_id, trip_id, start, end, day, limit)
+  if fmt == 'json' and cursor == 0 and all(f is None for f in filters):
+    return stop_times_body.response()
+
+  stop_times = feed.find_stop_times(stop_id=stop_id, trip_id=trip_id, start=start, end=end, day=day)
+  page_end = len(stop_times) if limit is None else min(cursor + limit, len(stop_times))
+  page = stop_times[cursor:page_end]
+
+  if fmt == 'ndjson':
+    # Write one row at a time rather than building the whole body in memory.
+    resp = Response((app.json.dumps(stop_time) + '\n' for stop_time in page), mimetype='application/x-ndjson')
+  else:
+    resp = jsonify(list(page))
+
+  if page_end < len(stop_times):
+    next_url = url_for('bus_stop_times', **{**request.args.to_dict(), 'cursor': page_end})
+    resp.headers['Link'] = f'<{next_url}>; rel="next"'
+  return resp
 
 @app.route('/buses/routes', methods=['GET'])
 def bus_routes():
@@ -115,8 +262,116 @@ def bus_routes():
                 type: string
                 example: '004C5B'
                 description: the canonical colour used for the route in maps and diagrams
+      304:
+        description: The data hasn't changed since the ETag given in If-None-Match
+  '''
+  return routes_body.response()
+
+# Joined views of single trips and routes, serialized the first time each
+# one is asked for.
+trip_bodies = {}
+route_stops_bodies = {}
+
+@app.route('/buses/trips/<trip_id>', methods=['GET'])
+def bus_trip(trip_id):
+  '''
+    A trip with its stops in order
+    ---
+    tags:
+      - buses
+    parameters:
+      - in: path
+        name: trip_id
+        required: true
+        schema:
+          type: string
+          example: '1848'
+        description: the ID of the trip
+    responses:
+      200:
+        description: The trip, with each of its stop times joined with the stop it's at, in the order the bus visits them
+        schema:
+          type: object
+          properties:
+            trip_id:
+              type: string
+              example: '1848'
+            route_id:
+              type: string
+              example: '1415'
+            stops:
+              type: array
+              items:
+                type: object
+                properties:
+                  stop_id:
+                    type: string
+                    example: '87'
+                  stop_name:
+                    type: string
+                    example: 'Alice Springs Interchange'
+                  stop_lat:
+                    type: string
+                    example: '-23.698731'
+                  stop_lon:
+                    type: string
+                    example: '133.878503'
+                  arrival_time:
+                    type: string
+                    example: '7:00:00'
+                  stop_sequence:
+                    type: string
+                    example: '0'
+      404:
+        description: There is no trip with that ID
+  '''
+  body = trip_bodies.get(trip_id)
+  if body is None:
+    trip = feed.trip(trip_id)
+    if trip is None:
+      abort(404, 'Trip not found')
+    body = trip_bodies[trip_id] = StaticBody.json(trip)
+  return body.response()
+
+@app.route('/buses/routes/<route_id>/stops', methods=['GET'])
+def bus_route_stops(route_id):
+  '''
+    The stops a route visits, in order
+    ---
+    tags:
+      - buses
+    parameters:
+      - in: path
+        name: route_id
+        required: true
+        schema:
+          type: string
+          example: '1415'
+        description: the ID of the route
+    responses:
+      200:
+        description: An array of the distinct stops the route visits, in the order of its longest trip in each direction, then any only its other trips visit
+        schema:
+          type: array
+          items:
+            type: object
+            properties:
+              stop_id:
+                type: string
+                example: '87'
+              stop_name:
+                type: string
+                example: 'Alice Springs Interchange'
+      404:
+        description: There is no route with that ID
   '''
-  return jsonify(routes)
+  body = route_stops_bodies.get(route_id)
+  if body is None:
+    stops = feed.route_stops(route_id)
+    if stops is None:
+      abort(404, 'Route not found')
+    body = route_stops_bodies[route_id] = StaticBody.json(stops)
+  return body.response()
 
 @app.route('/buses/hail', methods=['POST'])
 def bus_hail():
@@ -144,6 +399,10 @@ def bus_hail():
               type: string
               example: '15:20:00'
               description: the time (24 hour time) you want to hail the bus
+            date:
+              type: string
+              example: '2015-03-02'
+              description: the date (YYYY-MM-DD) you want to hail the bus. Defaults to today. Only buses running on that day are included
     responses:
       200:
         description: A JSON object confirming your hail
@@ -168,41 +427,400 @@ def bus_hail():
   if data is None:
     abort(400, "expecting json object in request body")
 
+  return jsonify(hail_bus(data, datetime.now()))
+
+def hail_bus(data, now):
+  '''Answer one hail, given as the dict posted to /buses/hail. The time and
+  date default to `now`.'''
+  if not isinstance(data, dict):
+    abort(400, "expecting json object")
+
   stop_id = data.get("stop_id")
   if not stop_id:
     abort(400, "stop_id is required")
+  # Stop IDs are strings, so nothing else can be a stop, and can't be
+  # looked up either.
+  if not isinstance(stop_id, str):
+    abort(404, 'Stop not found')
 
-  stop = [stop for stop in stops if stop['stop_id'] == stop_id]
-  if not stop:
+  stop = feed.stop(stop_id)
+  if stop is None:
     abort(404, 'Stop not found')
-  else:
-    stop = stop[0]
 
-  parse_time = lambda t: datetime.strptime(t, "%H:%M:%S").replace(year=datetime.now().year, month=datetime.now().month, day=datetime.now().day)
-  format_time = lambda dt: dt.strftime('%-I:%M %p')
   try:
     if 'time' in data:
-      query_time = parse_time(data['time'])
+      query_time = datetime.strptime(data['time'], '%H:%M:%S')
     else:
-      query_time = datetime.now()
+      query_time = now
   except:
     abort(400, 'Time was not in the correct format')
+  query_seconds = query_time.hour * 3600 + query_time.minute * 60 + query_time.second
+
+  try:
+    if 'date' in data:
+      query_date = datetime.strptime(data['date'], '%Y-%m-%d').date()
+    else:
+      query_date = now.date()
+  except:
+    abort(400, 'Date was not in the correct format')
 
-  hail_stop_times = [stop_time for stop_time in stop_times if stop_time['stop_id'] == stop_id and parse_time(stop_time['arrival_time']) > query_time][:5]
+  hail_stop_times = feed.next_stop_times(stop_id, query_seconds, day=query_date)
 
   if hail_stop_times:
-    hail = {
+    return {
       'message': f'You can catch the bus at {stop["stop_name"]} from {format_time(parse_time(hail_stop_times[0]["arrival_time"]))}',
       'stop': stop,
       'stop_times': hail_stop_times,
     }
   else:
-    hail = {
+    return {
       'message': f'No buses will be stopping at {stop["stop_name"]}',
       'stop': stop,
       'stop_times': [],
     }
 
-  print(hail)
+MAX_HAIL_BATCH = 100
+
+@app.route('/buses/hail/batch', methods=['POST'])
+def bus_hail_batch():
+  '''
+    Hail buses at many stops and times in one request, e.g. for a departure board
+    ---
+    tags:
+      - buses
+    consumes:
+      - application/json
+    parameters:
+      - in: body
+        required: true
+        name: content
+        schema:
+          type: array
+          description: up to 100 hails, each like the body of /buses/hail
+          items:
+            $ref: '#/definitions/Hail'
+    responses:
+      200:
+        description: An array with the answer to each hail, in the same order. A hail that couldn't be answered gets an object with its error code and message instead, and doesn't stop the others
+        schema:
+          type: array
+          items:
+            type: object
+            properties:
+              message:
+                type: string
+                example: 'You can catch the bus at Power Street from 7:18 am'
+              stop:
+                type: object
+              stop_times:
+                type: array
+              error:
+                type: integer
+                example: 404
+                description: only present if the hail failed, the HTTP status it would have got on its own
+  '''
+  data = request.get_json()
+
+  if not isinstance(data, list):
+    abort(400, "expecting json array in request body")
+  if len(data) > MAX_HAIL_BATCH:
+    abort(400, f'at most {MAX_HAIL_BATCH} hails can be made at once')
+
+  # Every hail without a time is for the same moment, and a board asking
+  # about one stop twice gets the same answer without looking it up again.
+  now = datetime.now()
+  answers = {}
+  results = []
+  for item in data:
+    key = json.dumps(item, sort_keys=True)
+    if key not in answers:
+      try:
+        answers[key] = hail_bus(item, now)
+      except HTTPException as e:
+        answers[key] = {'error': e.code, 'message': e.description}
+    results.append(answers[key])
+  return jsonify(results)
+
+@app.route('/buses/nearest', methods=['GET'])
+def bus_nearest():
+  '''
+    Find the bus stops nearest a location
+    ---
+    tags:
+      - buses
+    parameters:
+      - in: query
+        name: lat
+        required: true
+        schema:
+          type: number
+          example: -23.6980
+        description: the latitude of the location
+      - in: query
+        name: lon
+        required: true
+        schema:
+          type: number
+          example: 133.8807
+        description: the longitude of the location
+      - in: query
+        name: k
+        schema:
+          type: integer
+          default: 5
+          example: 5
+        description: how many stops to return (at most 100)
+      - in: query
+        name: radius
+        schema:
+          type: number
+          example: 1000
+        description: only include stops within this many metres of the location
+    responses:
+      200:
+        description: An array of the nearest stops, closest first
+        schema:
+          type: array
+          items:
+            type: object
+            properties:
+              stop_id:
+                type: string
+                example: '82'
+                description: the unique ID for the bus stop
+              stop_name:
+                type: string
+                example: 'Power Street'
+                description: the name of the stop
+              distance:
+                type: number
+                example: 412.5
+                description: the distance to the stop in metres
+  '''
+  lat = number_arg('lat', -90, 90, required=True)
+  lon = number_arg('lon', -180, 180, required=True)
+  k = number_arg('k', 1, 100, default=5)
+  radius = number_arg('radius', 0, float('inf'))
+
+  if k != int(k):
+    abort(400, "'k' must be a whole number")
+
+  nearest = feed.nearest_stops(lat, lon, int(k), radius)
+  return jsonify([dict(stop, distance=round(distance, 1)) for distance, stop in nearest])
+
+@app.route('/buses/journey', methods=['GET'])
+def bus_journey():
+  '''
+    Plan a journey between two stops, arriving as early as possible
+    ---
+    tags:
+      - buses
+    parameters:
+      - in: query
+        name: from_stop
+        required: true
+        schema:
+          type: string
+          example: '82'
+        description: the ID of the stop to start from
+      - in: query
+        name: to_stop
+        required: true
+        schema:
+          type: string
+          example: '180'
+        description: the ID of the stop to get to
+      - in: query
+        name: depart_after
+        schema:
+          type: string
+          example: '07:00:00'
+        description: the earliest time (24 hour time) to leave. Defaults to now
+      - in: query
+        name: date
+        schema:
+          type: string
+          example: '2015-03-02'
+        description: the date (YYYY-MM-DD) of the journey. Defaults to today
+      - in: query
+        name: limit
+        schema:
+          type: integer
+          default: 3
+          example: 3
+        description: how many journeys to return (at most 10), each leaving later than the last
+    responses:
+      200:
+        description: An array of journeys, each with the legs riding buses or walking between stops
+        schema:
+          type: array
+          items:
+            type: object
+            properties:
+              departure_time:
+                type: string
+                example: '7:18:00'
+                description: when the journey leaves the first stop
+              arrival_time:
+                type: string
+                example: '7:30:00'
+                description: when the journey gets to the last stop
+              legs:
+                type: array
+                description: each bus ridden (mode bus, with its trip_id and route_id) or walk (mode walk) between stops
+  '''
+  from_stop = request.args.get('from_stop')
+  to_stop = request.args.get('to_stop')
+  if not from_stop:
+    abort(400, 'No from_stop parameter given')
+  if not to_stop:
+    abort(400, 'No to_stop parameter given')
+  if feed.stop(from_stop) is None or feed.stop(to_stop) is None:
+    abort(404, 'Stop not found')
+  if from_stop == to_stop:
+    abort(400, 'from_stop and to_stop are the same stop')
+
+  depart = time_arg('depart_after')
+  if depart is None:
+    now = datetime.now()
+    depart = now.hour * 3600 + now.minute * 60 + now.second
+  day = date_arg('date') or date.today()
+  limit = count_arg('limit', 1, 10) or 3
+
+  journeys = feed.plan_journeys(from_stop, to_stop, depart, day=day, limit=limit)
+  return jsonify([
+    {'departure_time': legs[0]['departure_time'], 'arrival_time': legs[-1]['arrival_time'], 'legs': legs}
+    for legs in journeys
+  ])
+
+@app.route('/buses/shapes/<shape_id>', methods=['GET'])
+def bus_shape(shape_id):
+  '''
+    The path a bus follows, simplified for drawing at a given scale
+    ---
+    tags:
+      - buses
+    parameters:
+      - in: path
+        name: shape_id
+        required: true
+        schema:
+          type: string
+          example: '1415'
+        description: the ID of the shape, as given by a trip's shape_id
+      - in: query
+        name: tolerance
+        schema:
+          type: number
+          default: 0
+          example: 20
+        description: how far in metres the simplified line may stray from the real one. Rounded down to one of 0, 1, 5, 20 or 80
+      - in: query
+        name: format
+        schema:
+          type: string
+          enum: [geojson, polyline]
+          default: geojson
+        description: a GeoJSON LineString feature, or a Google encoded polyline
+    responses:
+      200:
+        description: The shape as a GeoJSON feature, or an object with its encoded polyline
+        schema:
+          type: object
+          properties:
+            shape_id:
+              type: string
+              example: '1415'
+            tolerance:
+              type: number
+              example: 20
+              description: the tolerance the shape was simplified to
+            polyline:
+              type: string
+              description: the encoded polyline, when format is polyline
+      404:
+        description: There is no shape with that ID
+  '''
+  requested = number_arg('tolerance', 0, float('inf'), default=0)
+  tolerance = max(t for t in SHAPE_TOLERANCES if t <= requested)
+  fmt = request.args.get('format', 'geojson')
+  if fmt not in ('geojson', 'polyline'):
+    abort(400, "unknown 'format' value")
+
+  key = (shape_id, tolerance, fmt)
+  body = shape_bodies.get(key)
+  if body is None:
+    points = feed.shape(shape_id, tolerance)
+    if points is None:
+      abort(404, 'Shape not found')
+    if fmt == 'geojson':
+      body = StaticBody.json({
+        'type': 'Feature',
+        'properties': {'shape_id': shape_id, 'tolerance': tolerance},
+        'geometry': {'type': 'LineString', 'coordinates': [[lon, lat] for lat, lon in points]},
+      }, mimetype='application/geo+json')
+    else:
+      body = StaticBody.json({'shape_id': shape_id, 'tolerance': tolerance, 'polyline': encode_polyline(points)})
+    shape_bodies[key] = body
+  return body.response()
+
+BOARD_TICK = 5  # seconds between checking whether boards have changed
+BOARD_KEEPALIVE = 30  # seconds between comments sent to keep idle streams open
+
+def departure_board(key, now):
+  '''The next departures at a stop as of `now`, serialized for an event
+  stream. The time isn't included, so it only changes when a bus leaves.'''
+  stop_id, limit = key
+  seconds = now.hour * 3600 + now.minute * 60 + now.second
+  stop_times = feed.next_stop_times(stop_id, seconds, limit, day=now.date())
+  return app.json.dumps({'stop': feed.stop(stop_id), 'stop_times': stop_times})
+
+boards = Ticker(departure_board, BOARD_TICK)
+
+@app.route('/buses/stops/<stop_id>/board/stream', methods=['GET'])
+def bus_board_stream(stop_id):
+  '''
+    A live departure board for a stop, as a stream of Server-Sent Events
+    ---
+    tags:
+      - buses
+    produces:
+      - text/event-stream
+    parameters:
+      - in: path
+        name: stop_id
+        required: true
+        schema:
+          type: string
+          example: '82'
+        description: the ID of the stop
+      - in: query
+        name: limit
+        schema:
+          type: integer
+          default: 5
+          example: 5
+        description: how many departures to show (at most 20)
+    responses:
+      200:
+        description: A "board" event with the stop and its next stop_times straight away, then again whenever they change, e.g. when a bus leaves. Use it with an EventSource in the browser instead of polling /buses/hail
+      404:
+        description: There is no stop with that ID
+  '''
+  if feed.stop(stop_id) is None:
+    abort(404, 'Stop not found')
+  limit = count_arg('limit', 1, 20) or 5
+
+  def events():
+    yield f'retry: {BOARD_TICK * 1000}\n\n'
+    for board in boards.stream((stop_id, limit), BOARD_KEEPALIVE):
+      if board is None:
+        yield ': keepalive\n\n'
+      else:
+        yield f'event: board\ndata: {board}\n\n'
 
-  return jsonify(hail)
+  resp = Response(events(), mimetype='text/event-stream')
+  resp.headers['Cache-Control'] = 'no-cache'
+  # Stop a reverse proxy holding events back to buffer them.
+  resp.headers['X-Accel-Buffering'] = 'no'
+  return resp
@@ -0,0 +1,54 @@
+'''
+  ASCII art bar charts of any number of values.
+
+  ascii_art's Bar draws every value it's given, adding the chart up one
+  string at a time. This draws the same chart, but can pick out just the
+  largest values with a heap, sort them, draw them on a log scale, and
+  scales them all in a single pass.
+'''
+import heapq
+from math import log1p
+from operator import itemgetter
+
+# How bar_chart can order the bars, besides the order they were given in.
+SORTS = {
+  'desc': (itemgetter(1), True),
+  'asc': (itemgetter(1), False),
+  'key': (itemgetter(0), False),
+}
+
+def bar_chart(items, width=60, top=None, sort=None, log=False, bar_char='#'):
+  '''A chart with a row for each (label, value) in `items`, the same as
+  ascii_art's Bar draws them. The largest value's bar is `width` characters
+  long, and values of zero or less get an empty bar.
+
+  `top` keeps only that many of the largest values, `sort` is one of SORTS,
+  and `log` scales the bars by log(1 + value) rather than by value.'''
+  if top is not None and top < len(items):
+    values = [value for _, value in items]
+    chosen = heapq.nlargest(top, range(len(items)), key=values.__getitem__)
+    if sort is None:
+      chosen.sort()
+    items = [items[index] for index in chosen]
+  if sort is not None:
+    key, reverse = SORTS[sort]
+    items = sorted(items, key=key, reverse=reverse)
+  if not items:
+    return '\n'
+
+  labels = [label for label, _ in items]
+  values = [value for _, value in items]
+  scaled = [log1p(value) if value > 0 else 0.0 for value in values] if log else values
+  largest = max(scaled)
+  if largest > 0:
+    # The same arithmetic as Bar, so the bars round the same way, and a
+    # value too small to round to anything still gets a sliver.
+    shown = [max(0, round(width * (value / largest))) or int(value > 0) for value in scaled]
+  else:
+    shown = [0] * len(scaled)
+
+  bars = bar_char * width
+  blanks = ' ' * width
+  label_width = max(map(len, labels))
+  rows = [f'{label:>{label_width}} | {bars[:n]}{blanks[n:]} | {value}' for label, value, n in zip(labels, values, shown)]
+  return '\n'.join(['', *rows, ''])
@@ -1,13 +1,128 @@
-from flask import request, abort
-from num2words import num2words
-from words2num import w2n as words2num
-import pint
+import csv
+import hashlib
+import io
+import os
+from functools import lru_cache
+from math import isfinite
+
+from flask import request, abort, jsonify, Response
 
 from .app import app
-from .utils import plain_textify
+from .utils import Lazy, lazy_import, plain_textify
+
+# These take a while to import, so wait until they're used.
+num2words = lazy_import('num2words', 'num2words')
+words2num = lazy_import('words2num', 'w2n')
+
+NUMBER_ERRORS = {
+  'words': "Invalid number to convert to words",
+  'rank': "Invalid number to convert to rank",
+  'number': "Invalid number word to convert to number",
+}
+
+@lru_cache(maxsize=4096)
+def convert_number(value, to):
+  """`value`, a string, converted to words, a rank or a number, or None if
+  it can't be."""
+  try:
+    if to == 'words':
+      return num2words(value, to='cardinal')
+    elif to == 'rank':
+      return num2words(value, to='ordinal')
+    else:
+      return str(words2num(value))
+  except:
+    return None
+
+CUSTOM_UNITS = [
+  'tims = 1.5 * m = tims',
+]
+
+UNITS_CACHE = 'data/pint-cache'
 
-units = pint.UnitRegistry()
-units.define('tims = 1.5 * m = tims')
+def units_cache_folder(root=UNITS_CACHE):
+  '''Where pint caches its parsed definitions: a folder for each version of
+  pint and set of custom units, so changing either starts a fresh cache.'''
+  import pint
+  key = hashlib.sha256('\n'.join([pint.__version__, *CUSTOM_UNITS]).encode('utf-8')).hexdigest()[:16]
+  return os.path.join(root, key)
+
+def make_units(cache_root=UNITS_CACHE):
+  '''Build the unit registry. The first worker to build it parses pint's
+  definitions and caches them on disk; after that they're just loaded.'''
+  import pint
+  try:
+    folder = units_cache_folder(cache_root)
+    os.makedirs(folder, exist_ok=True)
+    units = pint.UnitRegistry(cache_folder=folder)
+  except Exception:
+    # e.g. a read only checkout, or a cache another worker is still writing
+    units = pint.UnitRegistry()
+  for definition in CUSTOM_UNITS:
+    units.define(definition)
+  return units
+
+# Building pint's registry takes a while, so wait until it's needed.
+units = Lazy(make_units)
+
+class UnitConversion:
+  '''The conversion between two unit expressions, worked out once so that
+  converting each quantity doesn't parse them again.
+
+  Between multiplicative units it's a single factor found by pint, applied
+  just as pint's own `.to()` does, so the results are identical. Offset
+  units like degC are left to pint, from the already parsed units. A pair
+  that can't be converted keeps the error to respond with instead.'''
+
+  def __init__(self, unit, to):
+    from pint.errors import UndefinedUnitError
+    self.error = None
+    try:
+      from_unit = units.parse_expression(unit)
+    except UndefinedUnitError:
+      self.error = (404, f'Unit {unit!r} not found')
+      return
+    try:
+      to_unit = units.parse_expression(to)
+    except UndefinedUnitError:
+      self.error = (404, f'Unit {unit!r} not found')
+      return
+
+    # A bare number parses to just the number.
+    if not isinstance(from_unit, units.Quantity) or not isinstance(to_unit, units.Quantity) \
+        or from_unit.dimensionality != to_unit.dimensionality:
+      self.error = (400, f'Cannot convert from {unit} to {to}')
+      return
+
+    self.magnitude = from_unit.magnitude
+    self.from_units = from_unit.units
+    self.to_units = to_unit.units
+    self.factor = None
+    if from_unit._is_multiplicative and to_unit._is_multiplicative:
+      self.factor = units.Quantity(1.0, self.from_units).to(self.to_units).magnitude
+
+  def convert(self, quantity):
+    '''`quantity` of the first unit in the second, or abort if it can't be.'''
+    if self.error is not None:
+      abort(*self.error)
+    if self.factor is None:
+      return units.Quantity(quantity * self.magnitude, self.from_units).to(self.to_units)
+    return units.Quantity(quantity * self.magnitude * self.factor, self.to_units)
+
+  def convert_magnitudes(self, quantities):
+    '''Convert a list of plain numbers of the first unit to the second.'''
+    if self.error is not None:
+      abort(*self.error)
+    if self.factor is None:
+      return [units.Quantity(quantity * self.magnitude, self.from_units).to(self.to_units).magnitude for quantity in quantities]
+    magnitude, factor = self.magnitude, self.factor
+    if magnitude == 1:
+      return [quantity * factor for quantity in quantities]
+    return [quantity * magnitude * factor for quantity in quantities]
+
+@lru_cache(maxsize=256)
+def unit_conversion(unit, to):
+  return UnitConversion(unit, to)
 
 @app.route('/convert/number', methods=['GET'])
 def numerals_api():
@@ -45,27 +160,168 @@ def numerals_api():
 
   if not value:
     abort(400, "value to convert is required")
-
-  if to == 'words':
-    try:
-      result = num2words(value, to='cardinal')
-    except:
-      abort(400, "Invalid number to convert to words")
-  elif to =='rank':
-    try:
-      result = num2words(value, to='ordinal')
-    except:
-      abort(400, "Invalid number to convert to rank")
-  elif to == 'number':
-    try:
-      result = str(words2num(value))
-    except:
-      abort(400, "Invalid number word to convert to number")
-  else:
+  if to not in NUMBER_ERRORS:
     abort(400, "unknown 'to' value")
 
+  result = convert_number(value, to)
+  if result is None:
+    abort(400, NUMBER_ERRORS[to])
+
   return plain_textify(result)
 
+MAX_NUMBER_BATCH = 10000
+
+@app.route('/convert/number/batch', methods=['POST'])
+def numerals_batch_api():
+  """
+    Convert many numbers into different representations at once
+    ---
+    tags:
+      - convert
+    consumes:
+      - application/json
+    parameters:
+      - in: query
+        name: to
+        type: string
+        default: words
+        example: rank
+        enum: ["words", "rank", "number"]
+        description: the kind of value you would like to convert to
+      - in: body
+        name: values
+        required: true
+        schema:
+          type: array
+          items:
+            type: string
+          example: ["1", "2", "3"]
+        description: up to 10000 values to convert
+    responses:
+      200:
+        description: The converted values, in the same order. A value that couldn't be converted is null, with the reason in errors
+        schema:
+          type: object
+          properties:
+            values:
+              type: array
+              items:
+                type: string
+              example: ["first", "second", "third"]
+            errors:
+              type: array
+              items:
+                type: object
+                properties:
+                  index:
+                    type: integer
+                    example: 1
+                  message:
+                    type: string
+                    example: Invalid number to convert to rank
+  """
+  to = request.args.get('to', 'words')
+  if to not in NUMBER_ERRORS:
+    abort(400, "unknown 'to' value")
+
+  values = request.get_json(silent=True)
+  if not isinstance(values, list):
+    abort(400, 'expecting a json array of values in request body')
+  if len(values) > MAX_NUMBER_BATCH:
+    abort(400, f'At most {MAX_NUMBER_BATCH} values can be converted at once')
+
+  results = []
+  errors = []
+  for index, value in enumerate(values):
+    # Numbers are converted from how they'd appear in a query string, so
+    # they share the cache with /convert/number.
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+      value = str(value)
+    result = convert_number(value, to) if isinstance(value, str) and value else None
+    if result is None:
+      errors.append({'index': index, 'message': NUMBER_ERRORS[to]})
+    results.append(result)
+
+  return jsonify({'values': results, 'errors': errors})
+
+MAX_NUMBER_RANGE = 1000000
+# Numbers in a range at most this far from zero go through the shared cache.
+HOT_NUMBERS = 1000
+
+@app.route('/convert/number/range', methods=['GET'])
+def numerals_range_api():
+  """
+    Convert every whole number in a range into words or ranks, one per line
+    ---
+    tags:
+      - convert
+    parameters:
+      - in: query
+        name: from
+        required: true
+        schema:
+          type: integer
+          example: 1
+        description: the first number
+      - in: query
+        name: to
+        required: true
+        schema:
+          type: integer
+          example: 100
+        description: the last number, at most a million after the first
+      - in: query
+        name: mode
+        type: string
+        default: words
+        example: rank
+        enum: ["words", "rank"]
+        description: the kind of value you would like to convert to
+    responses:
+      200:
+        description: Each converted number on its own line, sent as they're converted
+        content:
+          text/plain:
+            schema:
+              type: string
+              example: first
+  """
+  def int_arg(name):
+    value = request.args.get(name)
+    if not value:
+      abort(400, f'No {name} parameter given')
+    try:
+      return int(value)
+    except ValueError:
+      abort(400, f'{name.capitalize()} is not a whole number')
+
+  start = int_arg('from')
+  end = int_arg('to')
+  mode = request.args.get('mode', 'words')
+  if mode not in ('words', 'rank'):
+    abort(400, "unknown 'mode' value")
+  if end < start:
+    abort(400, 'To is before from')
+  if mode == 'rank' and start < 0:
+    abort(400, 'Negative numbers have no rank')
+  # Everything in between is no bigger, so converts if the ends do.
+  if convert_number(str(start), mode) is None or convert_number(str(end), mode) is None:
+    abort(400, NUMBER_ERRORS[mode])
+  if end - start >= MAX_NUMBER_RANGE:
+    abort(400, f'At most {MAX_NUMBER_RANGE} numbers can be converted at once')
+
+  # Small numbers are asked for all the time, so share the cache with
+  # everything else. Past them, a range is mostly numbers nobody asks for
+  # again, and would push out the ones that are.
+  uncached = convert_number.__wrapped__
+
+  def lines():
+    for number in range(start, end + 1):
+      convert = convert_number if -HOT_NUMBERS <= number <= HOT_NUMBERS else uncached
+      yield convert(str(number), mode) + '\n'
+
+  return Response(lines(), mimetype='text/plain')
+
 @app.route('/convert/unit', methods=['GET'])
 def units_api():
   '''
@@ -120,21 +376,112 @@ def units_api():
   except:
     abort(400, f'Quantity {quantity!r} is invalid')
 
-  try:
-    from_unit = units.parse_expression(unit)
-  except pint.errors.UndefinedUnitError:
-    abort(404, f'Unit {unit!r} not found')
+  to_value = unit_conversion(unit, to).convert(unitless_quantity)
+  return plain_textify(f'{to_value:P}')
 
-  try:
-    to_unit = units.parse_expression(to)
-  except pint.errors.UndefinedUnitError:
-    abort(404, f'Unit {unit!r} not found')
+MAX_UNIT_BATCH = 100000
+
+@app.route('/convert/unit/batch', methods=['POST'])
+def units_batch_api():
+  '''
+    Convert many values from one unit to another
+    ---
+    tags:
+      - convert
+    consumes:
+      - application/json
+      - text/csv
+    parameters:
+      - in: query
+        name: unit
+        required: true
+        schema:
+          type: string
+          example: km
+        description: the unit you would like to convert from
+      - in: query
+        name: to
+        required: true
+        schema:
+          type: string
+          example: m
+        description: the unit you would like to convert to
+      - in: body
+        name: quantities
+        required: true
+        schema:
+          type: array
+          items:
+            type: number
+          example: [3.14, 42, 0.5]
+        description: up to 100000 quantities, as a JSON array, or as CSV (each field is a quantity, read row by row)
+    responses:
+      200:
+        description: The converted values, in the same order. A value that couldn't be converted is null, with the reason in errors
+        schema:
+          type: object
+          properties:
+            unit:
+              type: string
+              example: meter
+            values:
+              type: array
+              items:
+                type: number
+              example: [3140.0, 42000.0, 500.0]
+            errors:
+              type: array
+              items:
+                type: object
+                properties:
+                  index:
+                    type: integer
+                    example: 1
+                  message:
+                    type: string
+                    example: "Quantity 'lots' is invalid"
+  '''
+  unit = request.args.get('unit')
+  to = request.args.get('to')
 
-  value = unitless_quantity * from_unit
+  if not unit:
+    abort(400, 'No unit parameter given')
+  if not to:
+    abort(400, 'No to parameter given')
 
-  try:
-    to_value = value.to(to_unit)
-  except pint.errors.DimensionalityError:
-    abort(400, f'Cannot convert from {unit} to {to}')
+  if request.mimetype == 'text/csv':
+    rows = csv.reader(io.StringIO(request.get_data(as_text=True)))
+    quantities = [field.strip() for row in rows for field in row]
+  else:
+    quantities = request.get_json(silent=True)
+    if not isinstance(quantities, list):
+      abort(400, 'expecting a json array or csv of quantities in request body')
+  if len(quantities) > MAX_UNIT_BATCH:
+    abort(400, f'At most {MAX_UNIT_BATCH} quantities can be converted at once')
 
-  return plain_textify(f'{to_value:P}')
+  conversion = unit_conversion(unit, to)
+
+  # Pick out the quantities that are numbers and convert them all together.
+  errors = []
+  numbers = []
+  indices = []
+  for index, quantity in enumerate(quantities):
+    try:
+      if isinstance(quantity, bool):
+        raise TypeError
+      number = float(quantity)
+    except (TypeError, ValueError):
+      errors.append({'index': index, 'message': f'Quantity {quantity!r} is invalid'})
+      continue
+    numbers.append(number)
+    indices.append(index)
+
+  values = [None] * len(quantities)
+  for index, value in zip(indices, conversion.convert_magnitudes(numbers)):
+    if isfinite(value):
+      values[index] = value
+    else:
+      errors.append({'index': index, 'message': f'Quantity {quantities[index]!r} does not convert to a finite number'})
+  errors.sort(key=lambda error: error['index'])
+
+  return jsonify({'unit': f'{conversion.to_units:P}', 'values': values, 'errors': errors})
@@ -1,10 +1,172 @@
+import heapq
 import random
+from functools import lru_cache
 
 from flask import request, abort, jsonify
-import emojislib
+from emojislib.emojis import Emojis
 
 from .app import app
-from .utils import plain_textify
+from .fuzzy import TrigramIndex
+from .utils import Lazy, plain_textify
+
+class EmojiIndex:
+  '''Finds the emojis /emoji/<key> picks from, the same way emojislib's
+  lookups would, trying each in turn until one finds something:
+
+    by_key, by_name, search_by_name, search_by_key, search_by_cate
+
+  Every name, word in a name, keyword and category is looked up once up
+  front, so most requests are a single dict lookup.'''
+
+  def __init__(self, emojis):
+    self.emojis = list(emojis.values())
+    self.position = {emoji.name: n for n, emoji in enumerate(self.emojis)}
+    self.by_name = emojis
+    self.by_keyword = {}
+    # A few emojis have a string of keywords rather than a tuple, which
+    # emojislib searches as a string.
+    self.keyword_strings = []
+    for emoji in self.emojis:
+      if isinstance(emoji.keywords, str):
+        self.keyword_strings.append(emoji)
+      else:
+        for keyword in set(emoji.keywords):
+          self.by_keyword.setdefault(keyword, []).append(emoji)
+
+    terms = set()
+    for emoji in self.emojis:
+      terms.update([emoji.name, *emoji.name.split('_'), emoji.category])
+      if isinstance(emoji.keywords, tuple):
+        terms.update(keyword.lower() for keyword in emoji.keywords)
+    self.index = {term: self.search(term) for term in terms}
+
+  def search(self, term):
+    '''The characters of the emojis matching the lowercase `term`.'''
+    found = self.by_keyword.get(term, []) + [emoji for emoji in self.keyword_strings if term in emoji.keywords]
+    found.sort(key=lambda emoji: self.position[emoji.name])
+    if not found and term in self.by_name:
+      found = [self.by_name[term]]
+    if not found:
+      found = [emoji for emoji in self.emojis if term in emoji.name]
+    if not found:
+      found = [emoji for emoji in self.emojis if any(term in keyword for keyword in emoji.keywords)]
+    if not found:
+      found = [emoji for emoji in self.emojis if term in emoji.category]
+    return tuple(emoji.char for emoji in found)
+
+  def __getitem__(self, key):
+    term = key.lower()
+    found = self.index.get(term)
+    if found is None:
+      found = self._search_cached(term)
+    return found
+
+  @lru_cache(maxsize=4096)
+  def _search_cached(self, term):
+    return self.search(term)
+
+emoji_index = Lazy(lambda: EmojiIndex(Emojis), 'emoji index')
+
+class EmojiSearch:
+  '''Ranks emojis by how closely their names, the words in their names,
+  keywords or categories match a query, allowing for typos.'''
+
+  # Matches on fields earlier in this list rank higher.
+  FIELDS = ('name', 'name word', 'keyword', 'category')
+
+  def __init__(self, emojis):
+    self.emojis = list(emojis.values())
+    self.matches = {}  # term -> (field, position) for each emoji it's in
+    for position, emoji in enumerate(self.emojis):
+      keywords = [emoji.keywords] if isinstance(emoji.keywords, str) else emoji.keywords
+      fields = [[emoji.name], emoji.name.split('_'), keywords, [emoji.category]]
+      for field, terms in enumerate(fields):
+        for term in terms:
+          self.matches.setdefault(term.lower(), set()).add((field, position))
+    self.index = TrigramIndex(self.matches)
+
+  @lru_cache(maxsize=4096)
+  def search(self, query, limit):
+    '''Up to `limit` (emoji, term, distance) matches for `query`, best first:
+    fewest typos, then exact matches before terms the query only starts,
+    then by field, then shortest term, then in emojislib's order.'''
+    query = query.lower()
+    best = {}
+    for distance, term in self.index.search(query):
+      for field, position in self.matches[term]:
+        rank = (distance, term != query, field, len(term), position)
+        if position not in best or rank < best[position][0]:
+          best[position] = (rank, term)
+    return tuple(
+      (self.emojis[rank[-1]], term, rank[0])
+      for rank, term in heapq.nsmallest(limit, best.values())
+    )
+
+emoji_search = Lazy(lambda: EmojiSearch(Emojis), 'emoji search')
+
+MAX_EMOJI_SEARCH = 100
+
+@app.route('/emoji/search', methods=['GET'])
+def emoji_search_api():
+  """
+    Search for emojis, allowing for typos
+    ---
+    tags:
+      - emoji
+    parameters:
+      - in: query
+        name: q
+        required: true
+        schema:
+          type: string
+          example: dgo
+        description: a name, keyword or category to search for, or the start of one
+      - in: query
+        name: limit
+        schema:
+          type: integer
+          default: 10
+          example: 5
+        description: how many emojis to return, at most 100
+    responses:
+      200:
+        description: The best matching emojis, best first. Empty if nothing matches
+        content:
+          application/json:
+            schema:
+              type: array
+              items:
+                type: object
+                properties:
+                  emoji:
+                    type: string
+                    example: 🐶
+                  name:
+                    type: string
+                    example: dog
+                  match:
+                    type: string
+                    example: dog
+                    description: the name, word, keyword or category that matched
+                  distance:
+                    type: integer
+                    example: 1
+                    description: how many typos away from the query the match is
+  """
+  query = request.args.get('q', '').strip()
+  if not query:
+    abort(400, 'No q parameter given')
+  try:
+    limit = int(request.args.get('limit', 10))
+  except ValueError:
+    abort(400, 'Limit is not a whole number')
+  if not 1 <= limit <= MAX_EMOJI_SEARCH:
+    abort(400, f'Limit must be between 1 and {MAX_EMOJI_SEARCH}')
+
+  return jsonify([
+    {'emoji': emoji.char, 'name': emoji.name, 'match': term, 'distance': distance}
+    for emoji, term, distance in emoji_search.search(query, limit)
+  ])
 
 @app.route('/emoji/<key>', methods=['GET'])
 def emoji_api(key=''):
@@ -30,15 +192,9 @@ def emoji_api(key=''):
               type: string
               example: 🐩
   """
-  by_key = list(emojislib.by_key(key))
-  by_name = [emojislib.by_name(key).char] if emojislib.by_name(key) else []
-  search_by_name = list(emojislib.search_by_name(key))
-  search_by_key = list(emojislib.search_by_key(key))
-  search_by_category = list(emojislib.search_by_cate(key))
-  emojis = set(by_key or by_name or search_by_name or search_by_key or search_by_category)
-
+  emojis = emoji_index[key]
   if emojis:
-    return plain_textify(str(random.choice(list(emojis))))
+    return plain_textify(random.choice(emojis))
   else:
     abort(404)
 
@@ -0,0 +1,101 @@
+'''
+  Fuzzy search for short strings, tolerant of typos.
+
+  A trigram index narrows a query down to the terms that share the most
+  trigrams with it, without looking at every term. Only those are compared
+  with the query properly, by counting the edits between them.
+'''
+import heapq
+from collections import Counter
+
+# How many terms that turn out not to be close enough are compared with a
+# query, taking those that share the most trigrams with it first, before
+# giving up on the rest.
+MAX_MISSES = 10
+
+def trigrams(text):
+  '''The set of three character slices of `text`, padded so that its start
+  and end count for more.'''
+  padded = f'  {text} '
+  return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def edit_distance(a, b, limit=None):
+  '''The Damerau-Levenshtein (optimal string alignment) distance between `a`
+  and `b`: how many characters must be inserted, deleted, replaced or
+  swapped with their neighbour to turn one into the other. Stops counting
+  once it's sure to be more than `limit`, if given.'''
+  previous, current = None, list(range(len(b) + 1))
+  for i in range(1, len(a) + 1):
+    before, previous, current = previous, current, [i] * (len(b) + 1)
+    char, last = a[i - 1], a[i - 2] if i > 1 else None
+    for j in range(1, len(b) + 1):
+      other = b[j - 1]
+      best = previous[j - 1] + (char != other)
+      if previous[j] + 1 < best:
+        best = previous[j] + 1
+      if current[j - 1] + 1 < best:
+        best = current[j - 1] + 1
+      if j > 1 and char == b[j - 2] and last == other and before[j - 2] + 1 < best:
+        best = before[j - 2] + 1
+      current[j] = best
+    # A swap can reach back two rows, so both must be over the limit.
+    if limit is not None and min(current) > limit and min(previous) > limit:
+      return limit + 1
+  return current[len(b)]
+
+def max_edits(query):
+  '''How many typos a query of its length can have and still match.'''
+  if len(query) < 3:
+    return 0
+  if len(query) < 6:
+    return 1
+  return 2
+
+class TrigramIndex:
+  '''Finds which of `terms` are close to a query.'''
+
+  def __init__(self, terms):
+    self.terms = sorted(set(terms))
+    self.lengths = [len(term) for term in self.terms]
+    self.characters = [frozenset(term) for term in self.terms]
+    self.postings = {}  # trigram -> indexes of the terms with it
+    for index, term in enumerate(self.terms):
+      for gram in trigrams(term):
+        self.postings.setdefault(gram, []).append(index)
+
+  def search(self, query):
+    '''The terms that start with `query`, or are at most max_edits(query)
+    edits from it, as (distance, term) pairs. Terms that start with the
+    query are distance 0. Like any trigram search, it can miss a term that
+    shares few trigrams with the query, e.g. with its first letters swapped.'''
+    grams = trigrams(query)
+    shared = Counter()
+    for gram in grams:
+      shared.update(self.postings.get(gram, ()))
+
+    # Every term that starts with the query shares all of its trigrams but
+    # the one at its end. Of the rest, only those that are about the right
+    # length and aren't missing more of the query's characters than it has
+    # edits to spare are worth counting edits for, most trigrams first.
+    edits = max_edits(query)
+    prefix = len(grams) - 1
+    shortest, longest = len(query) - edits, len(query) + edits
+    characters = frozenset(query)
+    terms, lengths = self.terms, self.lengths
+    found = []
+    candidates = []
+    for index, count in shared.items():
+      if count >= prefix and terms[index].startswith(query):
+        found.append((0, terms[index]))
+      elif edits and shortest <= lengths[index] <= longest and len(characters - self.characters[index]) <= edits:
+        candidates.append((-count, index))
+    heapq.heapify(candidates)
+    misses = 0
+    while candidates and misses < MAX_MISSES:
+      _, index = heapq.heappop(candidates)
+      distance = edit_distance(query, terms[index], edits)
+      if distance <= edits:
+        found.append((distance, terms[index]))
+      else:
+        misses += 1
+    return found
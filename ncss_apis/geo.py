@@ -0,0 +1,232 @@
+'''
+  Geometry for the bus APIs: distances, a spatial index of stops, and
+  simplifying and encoding the lines buses follow.
+'''
+import heapq
+from array import array
+from bisect import bisect_left
+from math import asin, cos, floor, hypot, inf, radians, sin, sqrt
+
+EARTH_RADIUS = 6371008.8  # metres
+
+# Size of a grid cell in degrees, about 1km north to south.
+GRID_SIZE = 0.01
+GRID_OFFSET = 1 << 20
+
+# How many cells nearest searches ring by ring around a query, about 30km
+# in every direction, before it only looks at the occupied cells.
+MAX_RING_CELLS = 4096
+
+def haversine(lat1, lon1, lat2, lon2):
+  '''The great circle distance in metres between two points.'''
+  lat1, lon1, lat2, lon2 = map(radians, (lat1, lon1, lat2, lon2))
+  a = sin((lat2 - lat1) / 2) ** 2 + cos(lat1) * cos(lat2) * sin((lon2 - lon1) / 2) ** 2
+  return 2 * EARTH_RADIUS * asin(min(1.0, sqrt(a)))
+
+def grid_cell(lat, lon):
+  return floor(lat / GRID_SIZE), floor(lon / GRID_SIZE)
+
+def cell_key(i, j):
+  '''Pack a cell's coordinates into one sortable integer.'''
+  return (i + GRID_OFFSET) << 22 | (j + GRID_OFFSET)
+
+def build_grid(lats, lons):
+  '''Bucket points into grid cells.
+
+  Returns the sorted keys of the cells that contain any points, the offset
+  of each cell's points in the third array, and the point indices ordered
+  by cell. Points with a NaN coordinate are left out.'''
+  keyed = sorted(
+    (cell_key(*grid_cell(lat, lon)), index)
+    for index, (lat, lon) in enumerate(zip(lats, lons))
+    if lat == lat and lon == lon
+  )
+  cells, offsets, points = array('q'), array('q'), array('q')
+  for position, (key, index) in enumerate(keyed):
+    if not cells or cells[-1] != key:
+      cells.append(key)
+      offsets.append(position)
+    points.append(index)
+  offsets.append(len(keyed))
+  return cells, offsets, points
+
+def ring_distance(lat, r):
+  '''A lower bound on the distance in metres from a point at `lat` to
+  anything in the cells `r` steps away from its own.
+
+  Those are at least r - 1 whole cells away in latitude or longitude, and a
+  difference in longitude spans the least distance at the highest latitude
+  the ring reaches.'''
+  gap = radians(max(0, r - 1) * GRID_SIZE)
+  highest = radians(min(90.0, abs(lat) + (r + 1) * GRID_SIZE))
+  return 2 * EARTH_RADIUS * asin(min(1.0, cos(highest) * sin(gap / 2)))
+
+class PointGrid:
+  '''Points bucketed into a grid of GRID_SIZE degree cells, for finding the
+  ones nearest a location without measuring the distance to all of them.'''
+
+  def __init__(self, lats, lons, cells, offsets, points):
+    self.lats = lats
+    self.lons = lons
+    self.cells = cells
+    self.offsets = offsets
+    self.points = points
+    self._rows = [(key >> 22) - GRID_OFFSET for key in cells]
+    self._cols = [(key & ((1 << 22) - 1)) - GRID_OFFSET for key in cells]
+    self._distinct_rows, self._distinct_cols = set(self._rows), set(self._cols)
+    if cells:
+      self._min_i, self._max_i = self._rows[0], self._rows[-1]
+      self._min_j, self._max_j = min(self._cols), max(self._cols)
+
+  def _cell_points(self, i, j):
+    key = cell_key(i, j)
+    position = bisect_left(self.cells, key)
+    if position == len(self.cells) or self.cells[position] != key:
+      return ()
+    return self.points[self.offsets[position]:self.offsets[position + 1]]
+
+  def _ring(self, i, j, r):
+    '''The cells r steps out from (i, j), clipped to the grid's extent.'''
+    if r == 0:
+      yield i, j
+      return
+    for di in range(max(-r, self._min_i - i), min(r, self._max_i - i) + 1):
+      if abs(di) == r:
+        for dj in range(max(-r, self._min_j - j), min(r, self._max_j - j) + 1):
+          yield i + di, j + dj
+      else:
+        for dj in (-r, r):
+          if self._min_j <= j + dj <= self._max_j:
+            yield i + di, j + dj
+
+  def _candidates(self, lat, lon, i, j, first, last):
+    '''Yield (bound, points) for the points in the rings from `first` to
+    `last` steps out from (i, j), where none of `points` are less than
+    `bound` metres from (lat, lon), nearest first.
+
+    Rings are searched cell by cell for the first MAX_RING_CELLS cells, or
+    as many as there are occupied ones. Far from every point most of them
+    are empty, so from then on the occupied cells are visited one at a time
+    instead, in order of how close any point in them could be.'''
+    looked_at, limit = 0, min(len(self.cells), MAX_RING_CELLS)
+    for r in range(first, last + 1):
+      if looked_at >= limit:
+        break
+      cells = list(self._ring(i, j, r))
+      looked_at += len(cells)
+      yield ring_distance(lat, r), [point for cell in cells for point in self._cell_points(*cell)]
+    else:
+      return
+
+    # The haversine of the distance to any point in a cell is at least
+    # sin²(Δlat / 2) + cos(lat) cos(cell lat) sin²(Δlon / 2), with the gaps
+    # from (lat, lon) to the cell's edges, and the cell's edge farthest from
+    # the equator. Everything but sin²(Δlon / 2) only depends on the cell's
+    # row, and that only on its column.
+    below, above = {}, {}
+    for row in self._distinct_rows:
+      south, north = row * GRID_SIZE, (row + 1) * GRID_SIZE
+      gap = radians(max(south - lat, lat - north, 0.0))
+      widest = radians(min(90.0, max(abs(south), abs(north))))
+      below[row], above[row] = sin(gap / 2) ** 2, cos(radians(lat)) * cos(widest)
+    across = {}
+    for col in self._distinct_cols:
+      # East to its west edge or west to its east edge, whichever is shorter.
+      west = col * GRID_SIZE
+      gap = 0.0 if col == j else radians(min((west - lon) % 360, (lon - west - GRID_SIZE) % 360))
+      across[col] = sin(gap / 2) ** 2
+    far = list(zip([below[row] + above[row] * across[col] for row, col in zip(self._rows, self._cols)], range(len(self.cells))))
+    heapq.heapify(far)
+    rows, cols, offsets, points = self._rows, self._cols, self.offsets, self.points
+    while far:
+      a, position = heapq.heappop(far)
+      if max(abs(rows[position] - i), abs(cols[position] - j)) < r:
+        continue  # already searched ring by ring
+      yield 2 * EARTH_RADIUS * asin(min(1.0, sqrt(a))), points[offsets[position]:offsets[position + 1]]
+
+  def nearest(self, lat, lon, k, radius=None):
+    '''Up to `k` (distance, point) pairs nearest to (lat, lon), closest
+    first, optionally only those within `radius` metres.'''
+    if not self.cells or k < 1:
+      return []
+    i, j = grid_cell(lat, lon)
+    # Only search the rings that overlap the occupied part of the grid.
+    first_ring = max(self._min_i - i, i - self._max_i, self._min_j - j, j - self._max_j, 0)
+    last_ring = max(abs(i - self._min_i), abs(i - self._max_i), abs(j - self._min_j), abs(j - self._max_j))
+
+    best = []  # max heap of the k nearest, as (-distance, point)
+    lats, lons = self.lats, self.lons
+    for bound, candidates in self._candidates(lat, lon, i, j, first_ring, last_ring):
+      if radius is not None and bound > radius:
+        break
+      if len(best) == k and bound > -best[0][0]:
+        break
+
+      distances = [haversine(lat, lon, lats[point], lons[point]) for point in candidates]
+      for distance, point in zip(distances, candidates):
+        if radius is not None and distance > radius:
+          continue
+        if len(best) < k:
+          heapq.heappush(best, (-distance, point))
+        elif distance < -best[0][0]:
+          heapq.heapreplace(best, (-distance, point))
+
+    return sorted((-distance, point) for distance, point in best)
+
+def segment_distance(x, y, x1, y1, x2, y2):
+  '''The distance from (x, y) to the segment from (x1, y1) to (x2, y2).'''
+  dx, dy = x2 - x1, y2 - y1
+  length = dx * dx + dy * dy
+  t = 0.0 if length == 0 else max(0.0, min(1.0, ((x - x1) * dx + (y - y1) * dy) / length))
+  return hypot(x - x1 - t * dx, y - y1 - t * dy)
+
+def simplification_levels(lats, lons):
+  '''For each point of a line, the largest Douglas-Peucker tolerance in
+  metres that keeps it. The ends are always kept.
+
+  The line simplified to any tolerance is then just the points whose level
+  is at least that tolerance, so it never has to be simplified again.'''
+  n = len(lats)
+  levels = array('d', bytes(8 * n))
+  if n == 0:
+    return levels
+  levels[0] = levels[-1] = inf
+
+  # Lines are short enough to treat as flat, in metres around their start.
+  scale = cos(radians(lats[0]))
+  xs = [radians(lon) * scale * EARTH_RADIUS for lon in lons]
+  ys = [radians(lat) * EARTH_RADIUS for lat in lats]
+
+  # A point is only split on if the point its half of the line was split on
+  # was too, so its level can't be more than that one's.
+  stack = [(0, n - 1, inf)]
+  while stack:
+    lo, hi, limit = stack.pop()
+    if hi - lo < 2:
+      continue
+    x1, y1, x2, y2 = xs[lo], ys[lo], xs[hi], ys[hi]
+    farthest, distance = lo + 1, -1.0
+    for index in range(lo + 1, hi):
+      d = segment_distance(xs[index], ys[index], x1, y1, x2, y2)
+      if d > distance:
+        farthest, distance = index, d
+    level = min(distance, limit)
+    levels[farthest] = level
+    stack.append((lo, farthest, level))
+    stack.append((farthest, hi, level))
+  return levels
+
+def encode_polyline(points):
+  '''Encode (lat, lon) pairs with Google's encoded polyline algorithm.'''
+  chunks = []
+  last_lat = last_lon = 0
+  for lat, lon in points:
+    lat, lon = round(lat * 1e5), round(lon * 1e5)
+    for delta in (lat - last_lat, lon - last_lon):
+      value = ~(delta << 1) if delta < 0 else delta << 1
+      while value >= 0x20:
+        chunks.append(chr((0x20 | value & 0x1f) + 63))
+        value >>= 5
+      chunks.append(chr(value + 63))
+    last_lat, last_lon = lat, lon
+  return ''.join(chunks)
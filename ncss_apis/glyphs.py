@@ -0,0 +1,92 @@
+'''
+  ASCII art text, rendered from glyph tables built once per font.
+
+  art's text2art looks the font up by name, then splits every character's
+  glyph into rows and joins them up one string at a time, on every call. For
+  the fonts /asciiart/text offers, the glyphs are split into rows once, and
+  each row of the output is a single join of the text's glyphs' rows.
+'''
+import sys
+
+# The fonts /asciiart/text offers. Any other font is left to text2art.
+ART_FONTS = ('1943', '3d_diagonal', 'epic', 'graffiti', 'isometric1', 'sub-zero', 'nscript', 'nancyj', 'black_square', 'upside_down')
+
+class GlyphFont:
+  '''A font's glyphs, each split into a tuple of its rows.'''
+
+  def __init__(self, glyphs, lower=False, upper=False):
+    self.glyphs = glyphs
+    self.known = frozenset(glyphs)
+    self.height = len(next(iter(glyphs.values())))
+    self.sizes = {char: sum(map(len, rows)) for char, rows in glyphs.items()}
+    self.lower = lower
+    self.upper = upper
+
+  @classmethod
+  def build(cls, letters, lower=False, upper=False):
+    '''From one of art's font dictionaries, or None if its glyphs aren't all
+    the same height or have Windows line endings.'''
+    # text2art skips tabs and characters with empty glyphs.
+    glyphs = {char: tuple(glyph.split('\n')) for char, glyph in letters.items() if glyph and char != '\t'}
+    heights = {len(rows) for rows in glyphs.values()}
+    if len(heights) != 1 or any('\r' in glyph for glyph in letters.values()):
+      return None
+    return cls(glyphs, lower, upper)
+
+  def _case(self, text):
+    if self.lower:
+      text = text.lower()
+    if self.upper:
+      text = text.upper()
+    return text
+
+  def size(self, text):
+    '''About how many characters `text` is in this font, without rendering
+    it.'''
+    text = self._case(text)
+    sizes = self.sizes
+    return sum([sizes.get(char, 0) for char in text]) + self.height * (text.count('\n') + 1)
+
+  def lines(self, text):
+    '''Yield `text` in this font a line at a time, exactly as text2art would
+    render it.'''
+    words = self._case(text).split('\n')
+    last = len(words) - 1
+    for index, word in enumerate(words):
+      if not self.known.issuperset(word):
+        word = ''.join(char for char in word if char in self.known)
+      if not word:
+        # A blank line is kept, but a word with nothing to show vanishes.
+        if index < last and not words[index]:
+          yield '\n'
+        continue
+      # zip turns the glyphs' rows into the output's rows.
+      rows = map(''.join, zip(*map(self.glyphs.__getitem__, word)))
+      for _ in range(self.height - 1):
+        yield next(rows) + '\n'
+      row = next(rows)
+      if row:
+        yield row + '\n' if index < last else row
+
+  def render(self, text):
+    '''`text` in this font, exactly as text2art would render it.'''
+    return ''.join(self.lines(text))
+
+def load_fonts(names=ART_FONTS):
+  '''A GlyphFont for each of `names`, as text2art resolves them.'''
+  import art
+  art_module = sys.modules[art.text2art.__module__]
+  fonts = {}
+  for name in names:
+    resolved = art_module.indirect_font(name, '')
+    letters, lower = art_module.FONT_MAP[resolved]
+    font = GlyphFont.build(letters, lower=lower, upper=resolved in art_module.UPPERCASE_FONTS)
+    if font is not None and resolved not in ('block', 'mirror', 'mirror_flip'):
+      fonts[name] = fonts[resolved] = font
+  return fonts
+
+def largest_glyph():
+  '''The most characters any character takes up in any of art's fonts.'''
+  import art
+  art_module = sys.modules[art.text2art.__module__]
+  return max(len(glyph) for letters, _ in art_module.FONT_MAP.values() for glyph in letters.values())
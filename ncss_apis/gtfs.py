@@ -0,0 +1,835 @@
+'''
+  Loading and indexing of the GTFS bus feed in data/buses.
+
+  The feed is parsed once and indexed so that requests never have to scan
+  the full list of stop times.
+
+  Tables are stored by column rather than as a dict per row: each column is
+  an array of integer codes, which are the values themselves for numeric and
+  time columns, and indexes into a table of distinct strings otherwise. Rows
+  only become dicts when they are about to be serialized.
+'''
+import csv
+import hashlib
+import json
+import mmap
+import os
+import re
+import struct
+import tempfile
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta
+from itertools import accumulate, islice
+
+from .geo import PointGrid, build_grid, simplification_levels
+from .planner import Connections, earliest_arrival
+
+TIME_RE = re.compile(r'\d+:\d\d:\d\d')
+
+def parse_time(value):
+  '''Convert a GTFS 'H:MM:SS' time into seconds since midnight.
+
+  GTFS allows hours past 23 for trips that run over midnight, so this
+  can't use strptime.'''
+  hours, minutes, seconds = value.split(':')
+  return int(hours) * 3600 + int(minutes) * 60 + int(seconds)
+
+# How a time column stores a blank time. GTFS leaves the times of stops
+# that aren't timepoints blank, for riders to interpolate.
+MISSING_TIME = -1
+
+def unparse_time(seconds):
+  '''The inverse of `parse_time`, in the unpadded form the feed uses.'''
+  minutes, seconds = divmod(seconds, 60)
+  hours, minutes = divmod(minutes, 60)
+  return f'{hours}:{minutes:02}:{seconds:02}'
+
+def format_time(seconds):
+  '''Format seconds since midnight as a 12 hour time, e.g. 7:04 AM.'''
+  return (datetime.min + timedelta(seconds=seconds % 86400)).strftime('%-I:%M %p')
+
+def int_code(value):
+  '''`value` as an int, or None unless it's exactly how that int is written.'''
+  try:
+    code = int(value)
+  except (TypeError, ValueError):
+    return None
+  return code if str(code) == value else None
+
+def time_code(value):
+  '''`value` in seconds since midnight, or None unless it's exactly how the
+  feed writes that time.'''
+  if not isinstance(value, str) or not TIME_RE.fullmatch(value):
+    return None
+  code = parse_time(value)
+  return code if unparse_time(code) == value else None
+
+def compact_array(values):
+  '''The smallest signed integer array that holds `values`. Raises
+  OverflowError if any of them don't fit in 64 bits.'''
+  # A generator would be part used up by the time 'i' overflows.
+  values = list(values)
+  try:
+    return array('i', values)
+  except OverflowError:
+    return array('q', values)
+
+class StringTable:
+  '''A read only list of strings packed into one UTF-8 blob, decoded as
+  they're read.'''
+
+  def __init__(self, offsets, blob):
+    self.offsets = offsets
+    self.blob = blob
+
+  def __len__(self):
+    return len(self.offsets) - 1
+
+  def __getitem__(self, index):
+    return str(self.blob[self.offsets[index]:self.offsets[index + 1]], 'utf-8')
+
+  def __iter__(self):
+    return map(self.__getitem__, range(len(self)))
+
+class StringColumn:
+  '''A column of arbitrary strings, each stored once.'''
+
+  kind = 'string'
+
+  def __init__(self, strings, codes):
+    self.strings = strings
+    self.codes = codes
+    self._lookup = None
+
+  def __len__(self):
+    return len(self.codes)
+
+  def __getitem__(self, row):
+    return self.strings[self.codes[row]]
+
+  def __iter__(self):
+    return map(self.decode, self.codes)
+
+  def decode(self, code):
+    return self.strings[code]
+
+  def encode(self, value):
+    '''The code for `value`, or None if it never appears in the column.'''
+    if self._lookup is None:
+      self._lookup = {string: code for code, string in enumerate(self.strings)}
+    return self._lookup.get(value)
+
+class IntColumn:
+  '''A column of integers, stored as the integers themselves.'''
+
+  kind = 'int'
+
+  def __init__(self, codes):
+    self.codes = codes
+
+  def __len__(self):
+    return len(self.codes)
+
+  def __getitem__(self, row):
+    return str(self.codes[row])
+
+  def __iter__(self):
+    return map(self.decode, self.codes)
+
+  def decode(self, code):
+    return str(code)
+
+  def encode(self, value):
+    return int_code(value)
+
+class TimeColumn(IntColumn):
+  '''A column of H:MM:SS times, stored as seconds since midnight.'''
+
+  kind = 'time'
+
+  def __getitem__(self, row):
+    return self.decode(self.codes[row])
+
+  def decode(self, code):
+    return '' if code == MISSING_TIME else unparse_time(code)
+
+  def encode(self, value):
+    return MISSING_TIME if value == '' else time_code(value)
+
+def make_column(strings, codes):
+  '''Pick the most compact column type that reproduces every one of the
+  distinct `strings` exactly.'''
+  values = [int_code(string) for string in strings]
+  if None not in values:
+    try:
+      return IntColumn(compact_array(values[code] for code in codes))
+    except OverflowError:
+      pass  # an ID too long for 64 bits
+  values = [MISSING_TIME if string == '' else time_code(string) for string in strings]
+  if None not in values and any(value != MISSING_TIME for value in values):
+    return TimeColumn(compact_array(values[code] for code in codes))
+  return StringColumn(strings, codes)
+
+class Table:
+  '''One GTFS table, stored by column.'''
+
+  def __init__(self, names, columns):
+    self.names = names
+    self.columns = dict(zip(names, columns))
+    self._columns = columns
+
+  @classmethod
+  def build(cls, names, rows):
+    '''Build a table from an iterable of rows, each a list of strings.'''
+    interned = [{} for _ in names]
+    codes = [array('i') for _ in names]
+    for row in rows:
+      if len(row) < len(names):
+        row = row + [''] * (len(names) - len(row))
+      for values, column_codes, value in zip(interned, codes, row):
+        code = values.get(value)
+        if code is None:
+          code = values[value] = len(values)
+        column_codes.append(code)
+    return cls(names, [make_column(list(values), column_codes) for values, column_codes in zip(interned, codes)])
+
+  @classmethod
+  def read(cls, path, name):
+    '''Read one GTFS .txt file.'''
+    with open(os.path.join(path, f'{name}.txt'), encoding='utf-8-sig', newline='') as f:
+      reader = csv.reader(f)
+      return cls.build(next(reader), reader)
+
+  def __len__(self):
+    return len(self._columns[0]) if self._columns else 0
+
+  def __getitem__(self, name):
+    return self.columns[name]
+
+  def __iter__(self):
+    return iter(self.rows(range(len(self))))
+
+  def row(self, index):
+    '''Materialize one row as a dict.'''
+    return {name: column[index] for name, column in zip(self.names, self._columns)}
+
+  def rows(self, indices):
+    return Rows(self, indices)
+
+class Rows:
+  '''A selection of rows from a table, turned into dicts only as they're
+  read.'''
+
+  def __init__(self, table, indices):
+    self.table = table
+    self.indices = indices
+
+  def __len__(self):
+    return len(self.indices)
+
+  def __getitem__(self, key):
+    if isinstance(key, slice):
+      return Rows(self.table, self.indices[key])
+    return self.table.row(self.indices[key])
+
+  def __iter__(self):
+    return map(self.table.row, self.indices)
+
+def group_ranges(column, order):
+  '''Map each value in `column` to the range of positions it occupies in
+  `order`, a list of row indices sorted by that column.'''
+  ranges = {}
+  codes = column.codes
+  start = 0
+  for end in range(1, len(order) + 1):
+    if end == len(order) or codes[order[end]] != codes[order[start]]:
+      ranges[column.decode(codes[order[start]])] = (start, end)
+      start = end
+  return ranges
+
+def time_codes(column):
+  '''The values of a time column in seconds since midnight, with
+  MISSING_TIME for blank ones.'''
+  if isinstance(column, TimeColumn):
+    return column.codes
+  # Times the feed writes in some other way, e.g. zero padded.
+  seconds = [MISSING_TIME if string == '' else parse_time(string) for string in column.strings]
+  return compact_array(seconds[code] for code in column.codes)
+
+def service_codes(tables):
+  '''Number each service in the calendar, in order of their IDs.'''
+  service_ids = set(tables['calendar']['service_id']) | set(tables['calendar_dates']['service_id'])
+  return {service_id: code for code, service_id in enumerate(sorted(service_ids))}
+
+def gtfs_date(value):
+  return datetime.strptime(value, '%Y%m%d').date()
+
+def date_key(day):
+  '''A date as the YYYYMMDD integer GTFS uses.'''
+  return day.year * 10000 + day.month * 100 + day.day
+
+WEEKDAYS = ('monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday')
+
+def service_days(tables):
+  '''Work out which services run on each day, as a bitmask of service codes.
+
+  Returns a dict of the masks for every day in the feed's calendar, keyed
+  by `date_key`, and the masks for each day of the week. The latter is the
+  feed's usual weekly timetable, used for days the calendar doesn't cover.'''
+  services = service_codes(tables)
+  days = {}
+  weekly = [0] * 7
+  for row in tables['calendar']:
+    bit = 1 << services[row['service_id']]
+    runs = [row[weekday] == '1' for weekday in WEEKDAYS]
+    for weekday, running in enumerate(runs):
+      if running:
+        weekly[weekday] |= bit
+    day, end = gtfs_date(row['start_date']), gtfs_date(row['end_date'])
+    while day <= end:
+      key = date_key(day)
+      days[key] = days.get(key, 0) | (bit if runs[day.weekday()] else 0)
+      day += timedelta(days=1)
+
+  for row in tables['calendar_dates']:
+    bit = 1 << services[row['service_id']]
+    key = date_key(gtfs_date(row['date']))
+    if row['exception_type'] == '1':
+      days[key] = days.get(key, 0) | bit
+    else:
+      days[key] = days.get(key, 0) & ~bit
+  return days, weekly
+
+def coordinate(value):
+  '''A latitude or longitude as a float, or NaN if it's missing.'''
+  try:
+    return float(value)
+  except ValueError:
+    return float('nan')
+
+def build_indexes(tables):
+  '''Work out the indexes a Feed uses from its tables.
+
+  They are arrays of stop_times row indices sorted a particular way,
+  alongside dicts giving the range of positions for each stop or trip.'''
+  stop_times = tables['stop_times']
+  arrivals = time_codes(stop_times['arrival_time'])
+  rows = range(len(stop_times))
+
+  # Stop times ordered by arrival, overall and for each stop, with parallel
+  # arrays of the arrival times so they can be searched by bisection. Those
+  # with no arrival time can't be put in order, so are left out.
+  timed = [row for row in rows if arrivals[row] != MISSING_TIME]
+  by_arrival = compact_array(sorted(timed, key=arrivals.__getitem__))
+  stop_codes = stop_times['stop_id'].codes
+  by_stop = compact_array(sorted(timed, key=lambda row: (stop_codes[row], arrivals[row])))
+
+  # Each trip's stop times in the order the bus visits them.
+  trip_codes = stop_times['trip_id'].codes
+  sequences = stop_times['stop_sequence'].codes
+  by_trip = compact_array(sorted(rows, key=lambda row: (trip_codes[row], sequences[row])))
+
+  # The service each stop time runs under, so checking whether a departure
+  # runs on a given day doesn't need to look up its trip.
+  trips = tables['trips']
+  services = service_codes(tables)
+  trip_ids = trips['trip_id']
+  trip_services = {trip_ids[row]: services[service] for row, service in enumerate(trips['service_id'])}
+  stop_trip_ids = stop_times['trip_id']
+  row_services = compact_array(trip_services.get(stop_trip_ids[row], -1) for row in rows)
+
+  # A grid of stop locations for finding the stops nearest a point.
+  stops = tables['stops']
+  stop_lats = array('d', map(coordinate, stops['stop_lat']))
+  stop_lons = array('d', map(coordinate, stops['stop_lon']))
+  grid_cells, grid_offsets, grid_points = build_grid(stop_lats, stop_lons)
+
+  # Connections between consecutive stops of each trip, in order of
+  # departure, for planning journeys. Stops are numbered by their row in
+  # stops and trips by their position in trip_ranges. Stops with a blank
+  # time are ridden through to the next one with a time.
+  trip_ranges = group_ranges(stop_times['trip_id'], by_trip)
+  departures = time_codes(stop_times['departure_time'])
+  stop_rows = {stop_id: row for row, stop_id in enumerate(stops['stop_id'])}
+  stop_time_stops = [stop_rows.get(stop_id, -1) for stop_id in stop_times['stop_id']]
+  connections = []
+  for trip, (lo, hi) in enumerate(trip_ranges.values()):
+    here = None
+    for there in by_trip[lo:hi]:
+      if arrivals[there] == MISSING_TIME or departures[there] == MISSING_TIME:
+        continue
+      if here is not None and stop_time_stops[here] >= 0 and stop_time_stops[there] >= 0:
+        connections.append((departures[here], arrivals[there], stop_time_stops[here], stop_time_stops[there], trip, here))
+      here = there
+  connections.sort()
+
+  # The distinct stops each route visits, in the order of its longest trip
+  # in each direction, followed by any only other trips visit.
+  directions = trips.columns.get('direction_id')
+  route_trips = {}
+  for row, route_id in enumerate(trips['route_id']):
+    trip_id = trip_ids[row]
+    lo, hi = trip_ranges.get(trip_id, (0, 0))
+    direction = '' if directions is None else directions[row]
+    route_trips.setdefault(route_id, []).append((direction, lo - hi, trip_id))
+  route_stops = []
+  route_stop_ranges = {}
+  for route_id in sorted(route_trips):
+    start = len(route_stops)
+    seen = set()
+    ordered = sorted(route_trips[route_id])
+    longest = {}
+    for trip in ordered:
+      longest.setdefault(trip[0], trip)
+    rest = [trip for trip in ordered if longest[trip[0]] is not trip]
+    for _, _, trip_id in [*longest.values(), *rest]:
+      lo, hi = trip_ranges.get(trip_id, (0, 0))
+      for position in range(lo, hi):
+        stop = stop_time_stops[by_trip[position]]
+        if stop >= 0 and stop not in seen:
+          seen.add(stop)
+          route_stops.append(stop)
+    route_stop_ranges[route_id] = (start, len(route_stops))
+
+  # The points of each shape in order, with the Douglas-Peucker tolerance up
+  # to which each one survives simplification.
+  shapes = tables['shapes']
+  shape_codes = shapes['shape_id'].codes
+  shape_sequences = shapes['shape_pt_sequence']
+  by_shape = sorted(range(len(shapes)), key=lambda row: (shape_codes[row], int(shape_sequences[row])))
+  shape_lats = array('d', (coordinate(shapes['shape_pt_lat'][row]) for row in by_shape))
+  shape_lons = array('d', (coordinate(shapes['shape_pt_lon'][row]) for row in by_shape))
+  shape_ranges = group_ranges(shapes['shape_id'], by_shape)
+  shape_levels = array('d')
+  for lo, hi in shape_ranges.values():
+    shape_levels.extend(simplification_levels(shape_lats[lo:hi], shape_lons[lo:hi]))
+
+  return {
+    'stop_lats': stop_lats,
+    'stop_lons': stop_lons,
+    'grid_cells': grid_cells,
+    'grid_offsets': grid_offsets,
+    'grid_points': grid_points,
+    'arrival_seconds': arrivals,
+    'row_services': row_services,
+    'by_arrival': by_arrival,
+    'arrivals': compact_array(arrivals[row] for row in by_arrival),
+    'by_stop': by_stop,
+    'stop_arrivals': compact_array(arrivals[row] for row in by_stop),
+    'stop_ranges': group_ranges(stop_times['stop_id'], by_stop),
+    'by_trip': by_trip,
+    'trip_ranges': trip_ranges,
+    'connection_dep_time': compact_array(c[0] for c in connections),
+    'connection_arr_time': compact_array(c[1] for c in connections),
+    'connection_dep_stop': compact_array(c[2] for c in connections),
+    'connection_arr_stop': compact_array(c[3] for c in connections),
+    'connection_trip': compact_array(c[4] for c in connections),
+    # the stop_times row each connection departs from
+    'connection_rows': compact_array(c[5] for c in connections),
+    'stop_time_stops': compact_array(stop_time_stops),
+    'route_stops': compact_array(route_stops),
+    'route_stop_ranges': route_stop_ranges,
+    'shape_lats': shape_lats,
+    'shape_lons': shape_lons,
+    'shape_levels': shape_levels,
+    'shape_ranges': shape_ranges,
+  }
+
+class Feed:
+  '''The stops, stop times and routes of a GTFS feed, plus the indexes
+  used to answer queries against them.'''
+
+  def __init__(self, tables, indexes=None):
+    self.tables = tables
+    self.stops = tables['stops']
+    self.stop_times = tables['stop_times']
+    self.routes = tables['routes']
+
+    if indexes is None:
+      indexes = build_indexes(tables)
+    self.indexes = indexes
+    self._arrival_seconds = indexes['arrival_seconds']
+    self._row_services = indexes['row_services']
+    self._by_arrival = indexes['by_arrival']
+    self._arrivals = indexes['arrivals']
+    self._by_stop = indexes['by_stop']
+    self._stop_arrivals = indexes['stop_arrivals']
+    self._stop_ranges = indexes['stop_ranges']
+    self._by_trip = indexes['by_trip']
+    self._trip_ranges = indexes['trip_ranges']
+
+    stop_ids = self.stops['stop_id']
+    self._stop_rows = {stop_ids[row]: row for row in range(len(self.stops))}
+
+    self._service_days, self._weekly_services = service_days(tables)
+
+    self.stop_grid = PointGrid(
+      indexes['stop_lats'], indexes['stop_lons'],
+      indexes['grid_cells'], indexes['grid_offsets'], indexes['grid_points'],
+    )
+
+    self.connections = Connections(
+      indexes['connection_dep_stop'], indexes['connection_arr_stop'],
+      indexes['connection_dep_time'], indexes['connection_arr_time'],
+      indexes['connection_trip'],
+    )
+    self._connection_rows = indexes['connection_rows']
+
+    self._stop_time_stops = indexes['stop_time_stops']
+    self._route_stops = indexes['route_stops']
+    self._route_stop_ranges = indexes['route_stop_ranges']
+    self._shape_lats = indexes['shape_lats']
+    self._shape_lons = indexes['shape_lons']
+    self._shape_levels = indexes['shape_levels']
+    self._shape_ranges = indexes['shape_ranges']
+
+    trips = tables['trips']
+    self._trip_rows = {trip_id: row for row, trip_id in enumerate(trips['trip_id'])}
+    route_ids = self.routes['route_id']
+    self._route_rows = {route_ids[row]: row for row in range(len(self.routes))}
+
+    # Walks between stops, from transfers that give a time to allow.
+    self._footpaths = {}
+    for transfer in tables['transfers']:
+      from_row = self._stop_rows.get(transfer['from_stop_id'])
+      to_row = self._stop_rows.get(transfer['to_stop_id'])
+      if transfer['transfer_type'] == '3' or from_row is None or to_row is None or from_row == to_row:
+        continue
+      seconds = int(transfer['min_transfer_time'] or 0)
+      self._footpaths.setdefault(from_row, []).append((to_row, seconds))
+
+  def stop(self, stop_id):
+    '''The stop with the given ID as a dict, or None.'''
+    row = self._stop_rows.get(stop_id)
+    return None if row is None else self.stops.row(row)
+
+  def nearest_stops(self, lat, lon, k, radius=None):
+    '''Up to `k` (distance in metres, stop) pairs nearest to (lat, lon),
+    closest first, optionally only those within `radius` metres.'''
+    return [(distance, self.stops.row(row)) for distance, row in self.stop_grid.nearest(lat, lon, k, radius)]
+
+  def trip(self, trip_id):
+    '''The trip with the given ID as a dict, with its stop times in order
+    under 'stops', each joined with the stop it's at. None if there's no
+    such trip.'''
+    row = self._trip_rows.get(trip_id)
+    if row is None:
+      return None
+    trip = self.tables['trips'].row(row)
+    stops = []
+    lo, hi = self._trip_ranges.get(trip_id, (0, 0))
+    for stop_time in self._by_trip[lo:hi]:
+      stop = self._stop_time_stops[stop_time]
+      joined = self.stops.row(stop) if stop >= 0 else {}
+      joined.update(self.stop_times.row(stop_time))
+      stops.append(joined)
+    trip['stops'] = stops
+    return trip
+
+  def route_stops(self, route_id):
+    '''The distinct stops a route visits, in order, or None if there's no
+    such route.'''
+    if route_id not in self._route_rows:
+      return None
+    lo, hi = self._route_stop_ranges.get(route_id, (0, 0))
+    return list(self.stops.rows(self._route_stops[lo:hi]))
+
+  def shape(self, shape_id, tolerance=0):
+    '''The points of a shape as (lat, lon) pairs, simplified so that no
+    point left out is more than `tolerance` metres from the line. None if
+    there is no such shape.'''
+    bounds = self._shape_ranges.get(shape_id)
+    if bounds is None:
+      return None
+    lats, lons, levels = self._shape_lats, self._shape_lons, self._shape_levels
+    return [(lats[i], lons[i]) for i in range(*bounds) if levels[i] >= tolerance]
+
+  def plan_journeys(self, from_stop_id, to_stop_id, depart, day=None, limit=3):
+    '''Up to `limit` journeys between two stops leaving after `depart`
+    (seconds since midnight), each arriving as early as possible, and
+    each leaving later than the one before.
+
+    Each journey is a list of legs as dicts: riding a bus, with its trip
+    and route, or walking between stops.'''
+    source, target = self._stop_rows[from_stop_id], self._stop_rows[to_stop_id]
+    runs = None
+    if day is not None:
+      mask = self.active_services(day)
+      services, rows = self._row_services, self._connection_rows
+      runs = lambda c: services[rows[c]] >= 0 and mask >> services[rows[c]] & 1
+
+    journeys = []
+    while len(journeys) < limit:
+      legs = earliest_arrival(self.connections, source, target, depart, self._footpaths, runs)
+      if not legs:
+        break
+      journeys.append([self._leg(leg) for leg in legs])
+
+      # Look for the next journey that catches a later first bus.
+      walking = 0
+      for leg in legs:
+        if leg.trip is not None:
+          depart = leg.departure - walking + 1
+          break
+        walking += leg.arrival - leg.departure
+      else:
+        break
+    return journeys
+
+  def _leg(self, leg):
+    stop = lambda row: self.stops.row(row)
+    if leg.trip is None:
+      return {
+        'mode': 'walk',
+        'from_stop': stop(leg.from_stop),
+        'to_stop': stop(leg.to_stop),
+        'departure_time': unparse_time(leg.departure),
+        'arrival_time': unparse_time(leg.arrival),
+      }
+    trip_id = self.stop_times['trip_id'][self._connection_rows[leg.first]]
+    trip_row = self._trip_rows.get(trip_id)
+    return {
+      'mode': 'bus',
+      'trip_id': trip_id,
+      'route_id': None if trip_row is None else self.tables['trips']['route_id'][trip_row],
+      'from_stop': stop(leg.from_stop),
+      'to_stop': stop(leg.to_stop),
+      'departure_time': unparse_time(leg.departure),
+      'arrival_time': unparse_time(leg.arrival),
+    }
+
+  def active_services(self, day):
+    '''A bitmask of the services running on `day`, by service code.
+
+    Days outside the feed's calendar get its usual weekly timetable, as the
+    feed we ship ended in 2015 but is still used as if it were current.'''
+    mask = self._service_days.get(date_key(day))
+    if mask is None:
+      mask = self._weekly_services[day.weekday()]
+    return mask
+
+  def runs_on(self, rows, day):
+    '''Keep only the stop times in `rows` (row indices) that run on `day`.'''
+    mask = self.active_services(day)
+    services = self._row_services
+    return (row for row in rows if services[row] >= 0 and mask >> services[row] & 1)
+
+  def next_stop_times(self, stop_id, after, limit=5, day=None):
+    '''The first `limit` stop times at a stop arriving strictly after
+    `after` (seconds since midnight), earliest first. If `day` is given,
+    only buses running that day are included.'''
+    lo, hi = self._stop_ranges.get(stop_id, (0, 0))
+    start = bisect_right(self._stop_arrivals, after, lo, hi)
+    if day is None:
+      rows = self._by_stop[start:min(start + limit, hi)]
+    else:
+      rows = list(islice(self.runs_on(self._by_stop[start:hi], day), limit))
+    return list(self.stop_times.rows(rows))
+
+  def find_stop_times(self, stop_id=None, trip_id=None, start=None, end=None, day=None):
+    '''Stop times matching every filter given, arriving between `start` and
+    `end` inclusive (seconds since midnight) on `day`.
+
+    Results for a trip are in stop sequence order, otherwise they are in
+    arrival order. With no filters at all this is every stop time in feed
+    order. Those with a blank arrival time are only found by trip, or with
+    no filters.'''
+    rows = self._find_rows(stop_id, trip_id, start, end)
+    if day is not None:
+      rows = compact_array(self.runs_on(rows, day))
+    return self.stop_times.rows(rows)
+
+  def _find_rows(self, stop_id, trip_id, start, end):
+    if trip_id is not None:
+      lo, hi = self._trip_ranges.get(trip_id, (0, 0))
+      rows = self._by_trip[lo:hi]
+      if stop_id is not None or start is not None or end is not None:
+        stop_codes = self.stop_times['stop_id'].codes
+        stop_code = self.stop_times['stop_id'].encode(stop_id)
+        arrivals = self._arrival_seconds
+        rows = compact_array(
+          row for row in rows
+          if (stop_id is None or stop_codes[row] == stop_code)
+          and (start is None or arrivals[row] >= start)
+          and (end is None or arrivals[row] != MISSING_TIME and arrivals[row] <= end)
+        )
+      return rows
+
+    if stop_id is not None:
+      lo, hi = self._stop_ranges.get(stop_id, (0, 0))
+      order, arrivals = self._by_stop, self._stop_arrivals
+    elif start is not None or end is not None:
+      lo, hi = 0, len(self._arrivals)
+      order, arrivals = self._by_arrival, self._arrivals
+    else:
+      return range(len(self.stop_times))
+
+    if start is not None:
+      lo = bisect_left(arrivals, start, lo, hi)
+    if end is not None:
+      hi = bisect_right(arrivals, end, lo, hi)
+    return order[lo:hi]
+
+FEED_TABLES = ('stops', 'stop_times', 'routes', 'trips', 'calendar', 'calendar_dates', 'transfers', 'shapes')
+
+SNAPSHOT_MAGIC = b'NCSSGTFS'
+# Bump whenever the layout of the snapshot or the indexes in it change.
+SNAPSHOT_VERSION = 7
+
+class SnapshotError(Exception):
+  '''The snapshot is unreadable, or out of date with its source files.'''
+
+def read_feed(path):
+  '''Parse the feed from the GTFS .txt files in `path`.'''
+  return Feed({name: Table.read(path, name) for name in FEED_TABLES})
+
+def source_fingerprint(filename, sha256=True):
+  stat = os.stat(filename)
+  fingerprint = {'size': stat.st_size, 'mtime': stat.st_mtime_ns}
+  if sha256:
+    with open(filename, 'rb') as f:
+      fingerprint['sha256'] = hashlib.sha256(f.read()).hexdigest()
+  return fingerprint
+
+def source_filenames(path):
+  return {name: os.path.join(path, f'{name}.txt') for name in FEED_TABLES}
+
+def write_snapshot(filename, feed, sources):
+  '''Write `feed` to `filename` as fixed width arrays followed by a JSON
+  manifest describing where each one is. `sources` is a fingerprint of each
+  file the feed was read from.'''
+  directory = os.path.dirname(os.path.abspath(filename))
+  fd, temp = tempfile.mkstemp(dir=directory, prefix='.snapshot-')
+  try:
+    with os.fdopen(fd, 'wb') as f:
+      f.write(SNAPSHOT_MAGIC)
+
+      def add(values):
+        # Keep every array aligned so it can be used in place.
+        f.write(bytes(-f.tell() % 8))
+        offset = f.tell()
+        f.write(values)
+        return {'offset': offset, 'length': f.tell() - offset, 'typecode': getattr(values, 'typecode', 'B')}
+
+      def add_strings(strings):
+        encoded = [string.encode('utf-8') for string in strings]
+        offsets = compact_array(accumulate((len(value) for value in encoded), initial=0))
+        return {'offsets': add(offsets), 'blob': add(b''.join(encoded))}
+
+      def add_ranges(ranges):
+        return {
+          'keys': add_strings(ranges),
+          'lo': add(compact_array(lo for lo, _ in ranges.values())),
+          'hi': add(compact_array(hi for _, hi in ranges.values())),
+        }
+
+      manifest = {'version': SNAPSHOT_VERSION, 'sources': sources, 'tables': {}, 'indexes': {}}
+      for name, table in feed.tables.items():
+        manifest['tables'][name] = {
+          'names': table.names,
+          'columns': [
+            {
+              'kind': column.kind,
+              'codes': add(column.codes),
+              'strings': add_strings(column.strings) if column.kind == 'string' else None,
+            }
+            for column in table.columns.values()
+          ],
+        }
+      for name, index in feed.indexes.items():
+        if isinstance(index, dict):
+          manifest['indexes'][name] = {'ranges': add_ranges(index)}
+        else:
+          manifest['indexes'][name] = {'array': add(index)}
+
+      manifest = json.dumps(manifest).encode('utf-8')
+      f.write(manifest)
+      f.write(struct.pack('<Q', len(manifest)))
+    os.chmod(temp, 0o644)
+    os.replace(temp, filename)
+  except BaseException:
+    os.unlink(temp)
+    raise
+
+COLUMN_KINDS = {column.kind: column for column in (StringColumn, IntColumn, TimeColumn)}
+
+def read_snapshot(filename, path):
+  '''Load a feed from a snapshot written by `write_snapshot`, as long as
+  it is still up to date with the files in `path`.
+
+  The snapshot is memory mapped and its arrays used where they are, so
+  nothing is parsed and every process using it shares the same pages.'''
+  with open(filename, 'rb') as f:
+    data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+  if data[:len(SNAPSHOT_MAGIC)] != SNAPSHOT_MAGIC:
+    raise SnapshotError(f'{filename} is not a feed snapshot')
+  length, = struct.unpack('<Q', data[-8:])
+  manifest = json.loads(data[-8 - length:-8])
+
+  if manifest['version'] != SNAPSHOT_VERSION:
+    raise SnapshotError(f'{filename} is version {manifest["version"]}, not {SNAPSHOT_VERSION}')
+  sources = source_filenames(path)
+  if set(sources) != set(manifest['sources']):
+    raise SnapshotError(f'{filename} was built from different files')
+  for name, source in sources.items():
+    expected = manifest['sources'][name]
+    current = source_fingerprint(source, sha256=False)
+    # Only hash the file if it looks different, e.g. after a fresh checkout.
+    if current != {'size': expected['size'], 'mtime': expected['mtime']}:
+      if source_fingerprint(source)['sha256'] != expected['sha256']:
+        raise SnapshotError(f'{source} has changed since {filename} was built')
+
+  view = memoryview(data)
+  section = lambda spec: view[spec['offset']:spec['offset'] + spec['length']].cast(spec['typecode'])
+  strings = lambda spec: StringTable(section(spec['offsets']), section(spec['blob']))
+
+  tables = {}
+  for name, spec in manifest['tables'].items():
+    columns = []
+    for column in spec['columns']:
+      if column['kind'] == 'string':
+        columns.append(StringColumn(strings(column['strings']), section(column['codes'])))
+      else:
+        columns.append(COLUMN_KINDS[column['kind']](section(column['codes'])))
+    tables[name] = Table(spec['names'], columns)
+
+  indexes = {}
+  for name, spec in manifest['indexes'].items():
+    if 'ranges' in spec:
+      ranges = spec['ranges']
+      indexes[name] = dict(zip(strings(ranges['keys']), zip(section(ranges['lo']), section(ranges['hi']))))
+    else:
+      indexes[name] = section(spec['array'])
+
+  return Feed(tables, indexes)
+
+def build_snapshot(path, snapshot):
+  '''Parse the feed in `path` and write it to `snapshot`.'''
+  sources = {name: source_fingerprint(filename) for name, filename in source_filenames(path).items()}
+  feed = read_feed(path)
+  write_snapshot(snapshot, feed, sources)
+  return feed
+
+def load_feed(path, snapshot=None):
+  '''Load the feed in `path` from its snapshot (by default `path` with a
+  .snapshot extension), rebuilding the snapshot first if it is missing or
+  out of date.'''
+  if snapshot is None:
+    snapshot = os.path.normpath(path) + '.snapshot'
+  try:
+    return read_snapshot(snapshot, path)
+  except (OSError, ValueError, KeyError, SnapshotError):
+    pass
+
+  try:
+    build_snapshot(path, snapshot)
+    return read_snapshot(snapshot, path)
+  except (OSError, SnapshotError):
+    # e.g. a read only checkout, so just keep the feed in memory
+    return read_feed(path)
+
+if __name__ == '__main__':
+  import sys
+  path = sys.argv[1] if len(sys.argv) > 1 else 'data/buses'
+  build_snapshot(path, os.path.normpath(path) + '.snapshot')
@@ -0,0 +1,96 @@
+'''
+  Journey planning with the Connection Scan Algorithm.
+
+  A timetable is broken into connections: a bus leaving one stop and
+  arriving at the next stop on its trip. With every connection sorted by
+  departure time, the earliest arrival at any stop can be found by one pass
+  over them from the time the journey starts.
+'''
+from bisect import bisect_left
+
+INFINITY = float('inf')
+
+class Connections:
+  '''Every connection in a timetable, sorted by departure time, as parallel
+  arrays. Stops and trips are numbered by the caller.'''
+
+  def __init__(self, dep_stop, arr_stop, dep_time, arr_time, trip):
+    self.dep_stop = dep_stop
+    self.arr_stop = arr_stop
+    self.dep_time = dep_time
+    self.arr_time = arr_time
+    self.trip = trip
+
+  def __len__(self):
+    return len(self.dep_time)
+
+class Leg:
+  '''Part of a journey: riding one trip from `first` to `last` (indices of
+  connections), or walking between stops when `trip` is None.'''
+
+  def __init__(self, from_stop, to_stop, departure, arrival, trip=None, first=None, last=None):
+    self.from_stop = from_stop
+    self.to_stop = to_stop
+    self.departure = departure
+    self.arrival = arrival
+    self.trip = trip
+    self.first = first
+    self.last = last
+
+def earliest_arrival(connections, source, target, depart, footpaths=None, runs=None):
+  '''The journey from `source` that reaches `target` soonest, leaving no
+  earlier than `depart`, as a list of legs. None if there isn't one.
+
+  `footpaths`, if given, maps a stop to a list of (stop, seconds) that can
+  be walked to from it. `runs`, if given, is called with a connection's
+  index and decides whether it can be used, e.g. whether its trip runs
+  that day.'''
+  dep_stop, arr_stop = connections.dep_stop, connections.arr_stop
+  dep_time, arr_time = connections.dep_time, connections.arr_time
+  trips = connections.trip
+  footpaths = footpaths or {}
+
+  arrival = {source: depart}
+  # How each stop was reached: the connection that got off there, or the
+  # stop walked from.
+  reached_by = {}
+  boarded = {}  # trip -> index of the connection it was boarded at
+
+  def walk(stop, time):
+    for other, seconds in footpaths.get(stop, ()):
+      if time + seconds < arrival.get(other, INFINITY):
+        arrival[other] = time + seconds
+        reached_by[other] = ('walk', stop, time)
+
+  walk(source, depart)
+  for c in range(bisect_left(dep_time, depart), len(dep_time)):
+    if arrival.get(target, INFINITY) <= dep_time[c]:
+      break
+    trip = trips[c]
+    if trip not in boarded:
+      if arrival.get(dep_stop[c], INFINITY) > dep_time[c] or (runs is not None and not runs(c)):
+        continue
+      boarded[trip] = c
+    stop, time = arr_stop[c], arr_time[c]
+    if time < arrival.get(stop, INFINITY):
+      arrival[stop] = time
+      reached_by[stop] = ('ride', boarded[trip], c)
+      walk(stop, time)
+
+  if target not in reached_by:
+    return None
+
+  legs = []
+  stop = target
+  while stop != source:
+    how = reached_by[stop]
+    if how[0] == 'walk':
+      _, previous, time = how
+      legs.append(Leg(previous, stop, time, arrival[stop]))
+    else:
+      _, first, last = how
+      previous = dep_stop[first]
+      legs.append(Leg(previous, stop, dep_time[first], arr_time[last], trips[first], first, last))
+    stop = previous
+  legs.reverse()
+  return legs
@@ -0,0 +1,127 @@
+'''
+  Where the sun is, using NOAA's solar position equations.
+
+  Astral can only tell us about the cities in its database, one day and one
+  elevation at a time. These work for any latitude and longitude, and share
+  the position of the sun between the times asked for on the same day.
+'''
+from datetime import date, datetime, timedelta, timezone
+from math import acos, asin, cos, degrees, radians, sin, tan
+
+# Degrees below the horizon of the sun's centre at sunrise and sunset,
+# allowing for refraction and the size of the sun.
+SUNRISE_DEPRESSION = 0.833
+
+# Golden hour is when the sun is between these elevations.
+GOLDEN_HOUR_HIGH = 6.0
+GOLDEN_HOUR_LOW = -4.0
+
+J2000 = 2451545.0  # the Julian day at noon on 1 January 2000
+
+def julian_day(day):
+  '''The Julian day at midnight UTC at the start of `day`.'''
+  return day.toordinal() - date(2000, 1, 1).toordinal() + J2000 - 0.5
+
+def sun_position(jd):
+  '''The sun's declination in degrees, and the equation of time in minutes,
+  at Julian day `jd`.'''
+  t = (jd - J2000) / 36525.0
+  mean_long = (280.46646 + t * (36000.76983 + 0.0003032 * t)) % 360.0
+  mean_anomaly = 357.52911 + t * (35999.05029 - 0.0001537 * t)
+  eccentricity = 0.016708634 - t * (0.000042037 + 0.0000001267 * t)
+
+  m = radians(mean_anomaly)
+  centre = sin(m) * (1.914602 - t * (0.004817 + 0.000014 * t)) + sin(2 * m) * (0.019993 - 0.000101 * t) + sin(3 * m) * 0.000289
+  omega = radians(125.04 - 1934.136 * t)
+  apparent_long = mean_long + centre - 0.00569 - 0.00478 * sin(omega)
+
+  seconds = 21.448 - t * (46.815 + t * (0.00059 - t * 0.001813))
+  obliquity = 23.0 + (26.0 + seconds / 60.0) / 60.0 + 0.00256 * cos(omega)
+  declination = degrees(asin(sin(radians(obliquity)) * sin(radians(apparent_long))))
+
+  y = tan(radians(obliquity) / 2) ** 2
+  l0 = radians(mean_long)
+  equation_of_time = 4 * degrees(
+    y * sin(2 * l0)
+    - 2 * eccentricity * sin(m)
+    + 4 * eccentricity * y * sin(m) * cos(2 * l0)
+    - 0.5 * y * y * sin(4 * l0)
+    - 1.25 * eccentricity * eccentricity * sin(2 * m)
+  )
+  return declination, equation_of_time
+
+def _hour_angle(declination, sin_lat, cos_lat, sin_elevation):
+  '''The hour angle in degrees at which the sun, at `declination` degrees,
+  is at the elevation whose sine is `sin_elevation`, from a latitude whose
+  sine and cosine are given. None if it never is.'''
+  declination = radians(declination)
+  cos_hour_angle = (sin_elevation - sin_lat * sin(declination)) / (cos_lat * cos(declination))
+  if not -1 <= cos_hour_angle <= 1:
+    return None
+  return degrees(acos(cos_hour_angle))
+
+def sun_times_range(start, count, lat, lon, elevations):
+  '''sun_times for each of `count` days from `start`, sharing the work
+  between them.
+
+  The sun's position is only worked out once a day, at local noon, which
+  gives a first guess at every time that day. Each is then corrected with
+  the position at that guess, interpolated from the noons around it, which
+  is within a second of working it out afresh.'''
+  jd = julian_day(start)
+  noon = 0.5 - lon / 360  # local noon, as a fraction of a day after midnight UTC
+  noons = [sun_position(jd + offset + noon) for offset in range(-1, count + 1)]
+  sin_lat, cos_lat = sin(radians(lat)), cos(radians(lat))
+  targets = [(sin(radians(elevation)), -1 if rising else 1) for elevation, rising in elevations]
+  first = datetime(start.year, start.month, start.day, tzinfo=timezone.utc)
+
+  days = []
+  for offset in range(count):
+    midnight = first + timedelta(days=offset)
+    # The parabolas through the declination and equation of time at
+    # yesterday's, today's and tomorrow's noons, x days after today's.
+    (d0, e0), (d1, e1), (d2, e2) = noons[offset:offset + 3]
+    d_slope, d_curve = (d2 - d0) / 2, (d2 - 2 * d1 + d0) / 2
+    e_slope, e_curve = (e2 - e0) / 2, (e2 - 2 * e1 + e0) / 2
+    times = []
+    for sin_elevation, sign in targets:
+      minutes = None
+      hour_angle = _hour_angle(d1, sin_lat, cos_lat, sin_elevation)
+      if hour_angle is not None:
+        x = (4 * sign * hour_angle - e1) / 1440  # the guess, in days after noon
+        hour_angle = _hour_angle(d1 + x * (d_slope + x * d_curve), sin_lat, cos_lat, sin_elevation)
+        if hour_angle is not None:
+          minutes = 720 - 4 * lon + 4 * sign * hour_angle - (e1 + x * (e_slope + x * e_curve))
+      times.append(None if minutes is None else midnight + timedelta(seconds=round(minutes * 60)))
+    days.append(times)
+  return days
+
+def sun_times(day, lat, lon, elevations):
+  '''When on `day` (a UTC date) the sun passes each of `elevations`, given
+  as (degrees, rising) pairs, as UTC datetimes. None for any it doesn't.'''
+  return sun_times_range(day, 1, lat, lon, elevations)[0]
+
+def elevation_time(day, lat, lon, elevation, rising):
+  '''When on `day` (a UTC date) the sun passes `elevation` degrees, rising
+  or setting, as a UTC datetime. None if it's always above or below it.'''
+  return sun_times(day, lat, lon, [(elevation, rising)])[0]
+
+# What the golden hour endpoint reports for each day, in order.
+DAY_EVENTS = (
+  ('sunrise', -SUNRISE_DEPRESSION, True),
+  ('morning_golden_hour_start', GOLDEN_HOUR_LOW, True),
+  ('morning_golden_hour_end', GOLDEN_HOUR_HIGH, True),
+  ('golden_hour_start', GOLDEN_HOUR_HIGH, False),
+  ('golden_hour_end', GOLDEN_HOUR_LOW, False),
+  ('sunset', -SUNRISE_DEPRESSION, False),
+)
+
+def day_events_range(start, count, lat, lon):
+  '''Sunrise, sunset and the morning and evening golden hours on each of
+  `count` days from `start`.'''
+  days = sun_times_range(start, count, lat, lon, [(elevation, rising) for _, elevation, rising in DAY_EVENTS])
+  return [{name: time for (name, _, _), time in zip(DAY_EVENTS, times)} for times in days]
+
+def day_events(day, lat, lon):
+  '''Sunrise, sunset and the morning and evening golden hours on `day`.'''
+  return day_events_range(day, 1, lat, lon)[0]
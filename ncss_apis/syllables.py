@@ -1,11 +1,12 @@
 from flask import request, abort, jsonify
 
-import syllables
-
 import string
 
 from .app import app
-from .utils import plain_textify
+from .utils import lazy_import, plain_textify
+
+# The syllables library takes a while to import, so wait until it's used.
+estimate = lazy_import('syllables', 'estimate')
 
 @app.route('/syllables/<word>', methods=['GET'])
 def syllables_api(word):
@@ -31,5 +32,5 @@ def syllables_api(word):
               type: string
               example: 2
   """
-  return plain_textify(str(syllables.estimate(word)))
+  return plain_textify(str(estimate(word)))
 
@@ -0,0 +1,99 @@
+'''
+  A shared ticker for live streams.
+
+  Rather than each subscriber polling for changes, one background thread
+  recomputes the value for every key that has subscribers once per tick and
+  sends it to all of that key's subscribers, only when it has changed. However
+  many clients are watching the same key, it is computed once per tick.
+'''
+import queue
+import threading
+import time
+from datetime import datetime
+
+from .app import app
+
+class Ticker:
+  '''Pushes `compute(key, now)` to the subscribers of each key whenever it
+  changes, checking every `interval` seconds.'''
+
+  def __init__(self, compute, interval, clock=datetime.now):
+    self.compute = compute
+    self.interval = interval
+    self.clock = clock
+    self._lock = threading.Lock()
+    self._subscribers = {}  # key -> set of queues
+    self._latest = {}  # key -> the value last sent to its subscribers
+    self._thread = None
+
+  def subscribe(self, key):
+    '''A queue that gets the key's current value straight away, then each
+    new value as it changes.'''
+    subscriber = queue.SimpleQueue()
+    value = missing = object()
+    while True:
+      with self._lock:
+        if key in self._subscribers or value is not missing:
+          if key not in self._subscribers:
+            self._latest[key] = value
+            self._subscribers[key] = set()
+          self._subscribers[key].add(subscriber)
+          subscriber.put(self._latest[key])
+          if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='ticker', daemon=True)
+            self._thread.start()
+          return subscriber
+      # The first subscriber to a key computes its value outside the lock,
+      # as tick does, so nobody else waits on it.
+      value = self.compute(key, self.clock())
+
+  def unsubscribe(self, key, subscriber):
+    with self._lock:
+      subscribers = self._subscribers.get(key)
+      if subscribers is None:
+        return
+      subscribers.discard(subscriber)
+      if not subscribers:
+        del self._subscribers[key]
+        del self._latest[key]
+
+  def subscriber_count(self, key):
+    with self._lock:
+      return len(self._subscribers.get(key, ()))
+
+  def tick(self):
+    '''Recompute every watched key and send the ones that changed.'''
+    now = self.clock()
+    with self._lock:
+      keys = list(self._subscribers)
+    for key in keys:
+      # Computed outside the lock so subscribing never waits on a whole tick.
+      value = self.compute(key, now)
+      with self._lock:
+        subscribers = self._subscribers.get(key)
+        if subscribers is None or value == self._latest[key]:
+          continue
+        self._latest[key] = value
+        for subscriber in subscribers:
+          subscriber.put(value)
+
+  def _run(self):
+    while True:
+      time.sleep(self.interval)
+      try:
+        self.tick()
+      except Exception as e:
+        app.logger.error(e)
+
+  def stream(self, key, keepalive):
+    '''Yield each value for `key` as it arrives, or None if nothing has
+    arrived for `keepalive` seconds, until the consumer stops reading.'''
+    subscriber = self.subscribe(key)
+    try:
+      while True:
+        try:
+          yield subscriber.get(timeout=keepalive)
+        except queue.Empty:
+          yield None
+    finally:
+      self.unsubscribe(key, subscriber)
@@ -1,4 +1,11 @@
-from flask import make_response
+import gzip
+import hashlib
+import importlib
+import threading
+
+from flask import make_response, request, Response
+
+from .app import app
 
 def plain_textify(string):
     """Convert a string to a UTF-8 encoded body with the text/plain
@@ -6,3 +13,90 @@ def plain_textify(string):
     resp = make_response(string)
     resp.headers['Content-Type'] = 'text/plain; charset=utf-8'
     return resp
+
+
+class StaticBody:
+    """A response body that never changes, encoded and gzipped once up
+    front and served with a strong ETag so clients can revalidate with
+    If-None-Match instead of downloading it again."""
+
+    def __init__(self, body, mimetype):
+        self.mimetype = mimetype
+        self.body = body
+        self.gzipped = gzip.compress(body, mtime=0)
+        digest = hashlib.sha256(body).hexdigest()[:32]
+        # Each encoding is a different representation, so needs its own tag.
+        self.etag = digest
+        self.gzip_etag = f'{digest}-gzip'
+
+    @classmethod
+    def json(cls, obj, mimetype='application/json'):
+        """Serialize `obj` exactly as `jsonify` would."""
+        return cls(app.json.response(obj).get_data(), mimetype)
+
+    def response(self):
+        """Build the response for the current request, picking the gzip
+        variant when the client accepts it."""
+        if request.accept_encodings['gzip']:
+            body, etag = self.gzipped, self.gzip_etag
+        else:
+            body, etag = self.body, self.etag
+
+        if request.if_none_match.contains_weak(etag):
+            resp = Response(status=304)
+        else:
+            resp = Response(body, mimetype=self.mimetype)
+            if body is self.gzipped:
+                resp.content_encoding = 'gzip'
+        resp.set_etag(etag)
+        resp.vary.add('Accept-Encoding')
+        return resp
+
+
+# Every Lazy value, so they can all be built up front by warm().
+lazy_values = []
+
+class Lazy:
+    """A value that is only built, by calling `factory`, the first time it's
+    used, so importing the module it belongs to stays cheap. Attributes,
+    items and calls go to the value itself, so a Lazy can stand in for it.
+    """
+
+    _unset = object()
+
+    def __init__(self, factory, name=None):
+        self._factory = factory
+        self.name = name or f'{factory.__module__}.{factory.__qualname__}'
+        self._value = self._unset
+        self._lock = threading.Lock()
+        lazy_values.append(self)
+
+    def get(self):
+        value = self._value
+        if value is self._unset:
+            # Only one thread builds it; any others wait for that one.
+            with self._lock:
+                if self._value is self._unset:
+                    self._value = self._factory()
+                value = self._value
+        return value
+
+    def __getattr__(self, name):
+        return getattr(self.get(), name)
+
+    def __getitem__(self, key):
+        return self.get()[key]
+
+    def __call__(self, *args, **kwargs):
+        return self.get()(*args, **kwargs)
+
+
+def lazy_import(module, name):
+    """`name` from `module`, not imported until it's first used."""
+    return Lazy(lambda: getattr(importlib.import_module(module), name), f'{module}.{name}')
+
+
+def warm():
+    """Build every Lazy value now rather than on first use."""
+    for value in lazy_values:
+        value.get()
@@ -61,3 +61,145 @@ one | ########################                                     | 1.0
 two | ############################################################ | 2.5
 """
     )
+
+
+def test_bar_chart_matches_ascii_art():
+    import random
+    from ascii_art import Bar
+    from ncss_apis.chart import bar_chart
+
+    rng = random.Random(1)
+    for _ in range(100):
+        data = {f"k{n}": rng.choice([0.0, 0.001, 1.0, 2.5, rng.uniform(0, 1000)]) for n in range(rng.randint(1, 30))}
+        if max(data.values()) == 0:
+            continue
+        for width in [1, 7, 60]:
+            assert bar_chart(list(data.items()), width=width) == Bar(data, width=width).render()
+            assert bar_chart(list(data.items()), width=width, sort="desc") == Bar(data, width=width, sort=True).render()
+
+
+def test_bar_chart_options():
+    from ncss_apis.chart import bar_chart
+
+    items = [("a", 1.0), ("b", 4.0), ("c", 3.0), ("d", 2.0)]
+    keys = lambda chart: [row.split("|")[0].strip() for row in chart.strip("\n").split("\n")]
+
+    # the largest values, in the order given unless sorted
+    assert keys(bar_chart(items, top=2)) == ["b", "c"]
+    assert keys(bar_chart(items, top=2, sort="asc")) == ["c", "b"]
+    assert keys(bar_chart(items, sort="desc")) == ["b", "c", "d", "a"]
+    assert keys(bar_chart(items, sort="key")) == ["a", "b", "c", "d"]
+
+    # log(1 + 99) is half of log(1 + 9999)
+    assert bar_chart([("a", 99.0), ("b", 9999.0)], width=10, log=True) == "\na | #####      | 99.0\nb | ########## | 9999.0\n"
+    # nothing to scale by
+    assert bar_chart([("a", 0.0), ("b", -1.0)], width=4) == "\na |      | 0.0\nb |      | -1.0\n"
+
+
+def test_barchart_options(client):
+    res = client.get("/chart/bar", query_string={"one": 1, "two": 2.5, "three": 2, "top": 2, "sort": "desc", "width": 10})
+    assert res.status_code == 200
+    assert res.data.decode("utf-8") == "\n  two | ########## | 2.5\nthree | ########   | 2.0\n"
+
+    for query in [{"top": 0}, {"width": "wide"}, {"width": 1001}, {"sort": "sideways"}, {"log": "maybe"}]:
+        res = client.get("/chart/bar", query_string={"one": 1, **query})
+        assert res.status_code == 400
+
+
+def test_barchart_post(client):
+    expected = client.get("/chart/bar", query_string={"one": 1, "two": 2.5}).data
+
+    res = client.post("/chart/bar", json={"one": 1, "two": 2.5})
+    assert res.status_code == 200
+    assert res.data == expected
+
+    res = client.post("/chart/bar", data="one,1\ntwo,2.5\n", content_type="text/csv")
+    assert res.status_code == 200
+    assert res.data == expected
+
+    assert client.post("/chart/bar", json=[1, 2]).status_code == 400
+    assert client.post("/chart/bar", json={"one": "lots"}).status_code == 400
+    assert client.post("/chart/bar", json={"one": True}).status_code == 400
+    assert client.post("/chart/bar", json={}).status_code == 400
+    assert client.post("/chart/bar", data="one,1,2\n", content_type="text/csv").status_code == 400
+
+
+def test_barchart_large(client):
+    data = {f"item{n}": (n * 7919) % 50021 for n in range(50000)}
+
+    # too many to draw them all
+    res = client.post("/chart/bar", json=data)
+    assert res.status_code == 400
+
+    res = client.post("/chart/bar", json=data, query_string={"top": 3, "sort": "desc", "width": 20})
+    assert res.status_code == 200
+    rows = res.data.decode("utf-8").strip("\n").split("\n")
+    assert [row.split("|")[2].strip() for row in rows] == ["50020.0", "50019.0", "50018.0"]
+    assert all(len(row.split("|")[1]) == 22 for row in rows)
+
+
+def test_glyph_fonts_match_text2art():
+    from art import text2art
+    from ncss_apis.glyphs import ART_FONTS, load_fonts
+
+    fonts = load_fonts()
+    assert set(ART_FONTS) <= set(fonts)
+
+    printable = "".join(chr(c) for c in range(32, 127))
+    texts = [
+        "",
+        "Shelley",
+        printable,
+        printable[::-1],
+        "two\nlines",
+        "trailing\n",
+        "\nleading",
+        "blank\n\n\nlines\n\n",
+        "tab\tbed",
+        "unsupported ☃ é 😲",
+        "☃\n☃",
+        "☃\nafter",
+    ]
+    for name in ART_FONTS:
+        for text in texts:
+            assert fonts[name].render(text) == text2art(text, font=name), (name, text)
+
+
+def test_asciiart_text_other_fonts(client):
+    from art import text2art
+
+    # fonts we don't have tables for are still rendered by art
+    res = client.get("/asciiart/text", query_string={"string": "hi", "font": "block"})
+    assert res.status_code == 200
+    assert res.data.decode("utf-8") == text2art("hi", font="block").replace("\r\n", "\n")
+
+
+def test_asciiart_text_limits(client, monkeypatch):
+    from art import text2art
+
+    config = client.application.config
+
+    # too long to even try
+    res = client.get("/asciiart/text", query_string={"string": "a" * 1001, "font": "graffiti"})
+    assert res.status_code == 413
+    monkeypatch.setitem(config, "ASCII_ART_MAX_LENGTH", 2000)
+    res = client.get("/asciiart/text", query_string={"string": "a" * 1001, "font": "graffiti"})
+    assert res.status_code == 200
+
+    # short enough, but too big in a wide font
+    monkeypatch.setitem(config, "ASCII_ART_MAX_SIZE", 10000)
+    res = client.get("/asciiart/text", query_string={"string": "w" * 100, "font": "nscript"})
+    assert res.status_code == 422
+    res = client.get("/asciiart/text", query_string={"string": "w" * 100, "font": "black_square"})
+    assert res.status_code == 200
+    # fonts without tables are sized pessimistically
+    res = client.get("/asciiart/text", query_string={"string": "w" * 100, "font": "block"})
+    assert res.status_code == 422
+
+    # big art is streamed, and still the same
+    monkeypatch.setitem(config, "ASCII_ART_STREAM_SIZE", 100)
+    text = "Stream\nme"
+    res = client.get("/asciiart/text", query_string={"string": text, "font": "epic"})
+    assert res.status_code == 200
+    assert res.content_type == "text/plain; charset=utf-8"
+    assert res.data.decode("utf-8") == text2art(text, font="epic")
@@ -139,3 +139,132 @@ def test_moonphase_invalid_input2(client):
     }
     res = client.get("/moonphase", query_string=query)
     assert res.status_code == 400
+
+
+def test_moonphase_matches_astral():
+    from datetime import date, datetime, timedelta
+
+    from astral import Astral
+
+    from ncss_apis.astronomy import moon_phase
+
+    a = Astral()
+    for offset in range(0, 20000, 7):
+        day = date(1950, 1, 1) + timedelta(days=offset)
+        assert moon_phase(day) == a.moon_phase(datetime(day.year, day.month, day.day))
+
+
+def test_moonphase_range(client):
+    res = client.get("/moonphase/range", query_string={"start": "2019-12-20", "end": "2020-01-10"})
+    assert res.status_code == 200
+    data = res.get_json()
+    assert len(data) == 22
+    assert data[0]["date"] == "2019-12-20"
+    assert data[-1]["date"] == "2020-01-10"
+    for entry in data:
+        year, month, day = map(int, entry["date"].split("-"))
+        single = client.get("/moonphase", query_string={"year": year, "month": month, "day": day})
+        assert single.data.decode("utf-8") == entry["name"]
+        assert 0 <= entry["phase"] < 28
+
+    res = client.get("/moonphase/range", query_string={"start": "2019-01-01", "end": "2019-01-01"})
+    assert len(res.get_json()) == 1
+
+
+def test_moonphase_range_invalid(client):
+    for query in [
+        {},
+        {"start": "2019-01-01"},
+        {"end": "2019-01-01"},
+        {"start": "2019-01-01", "end": "tomorrow"},
+        {"start": "2019-02-30", "end": "2019-03-01"},
+        {"start": "2019-01-02", "end": "2019-01-01"},
+        {"start": "2000-01-01", "end": "2019-01-01"},
+    ]:
+        res = client.get("/moonphase/range", query_string=query)
+        assert res.status_code == 400
+
+
+def test_goldenhour_cached():
+    from ncss_apis.astronomy import golden_hour, golden_hours
+
+    first = golden_hour("Sydney")
+    assert golden_hours["Sydney"][1] == first
+    assert golden_hour("sydney") is first
+
+    # a window from an earlier day is worked out again
+    day, window = golden_hours["Sydney"]
+    golden_hours["Sydney"] = (day.replace(year=day.year - 1), window)
+    assert golden_hour("Sydney") == first
+    assert golden_hours["Sydney"][0] == day
+
+
+def test_goldenhour_batch(client):
+    res = client.get("/goldenhour/batch", query_string=[("city", "Sydney"), ("city", "Hobbiton"), ("city", "Adelaide")])
+    assert res.status_code == 200
+    data = res.get_json()
+    assert [entry["city"] for entry in data] == ["Sydney", "Hobbiton", "Adelaide"]
+    assert data[1]["error"] == 404
+
+    single = client.get("/goldenhour", query_string={"city": "Adelaide"}).data.decode("utf-8")
+    assert data[2]["message"] == single
+    assert data[2]["start"] < data[2]["end"]
+
+    assert client.get("/goldenhour/batch").status_code == 400
+    assert client.get("/goldenhour/batch", query_string=[("city", "Sydney")] * 101).status_code == 400
+
+
+def test_goldenhour_midsummer(client, monkeypatch):
+    from datetime import date, datetime
+    from ncss_apis import astronomy
+
+    class Midsummer(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return datetime(2024, 6, 21, 12, tzinfo=tz)
+
+    # the sun never gets 4 degrees below the horizon in Reykjavik in June
+    monkeypatch.setattr(astronomy, "datetime", Midsummer)
+    monkeypatch.setattr(astronomy, "golden_hours", {})
+
+    res = client.get("/goldenhour", query_string={"city": "Reykjavik"})
+    assert res.status_code == 422
+    assert res.get_json()["message"] == "There is no golden hour in Reykjavik today"
+    assert astronomy.golden_hours["Reykjavik"] == (date(2024, 6, 21), None)
+
+    res = client.get("/goldenhour/batch", query_string=[("city", "Sydney"), ("city", "Reykjavik")])
+    assert res.status_code == 200
+    sydney, reykjavik = res.get_json()
+    assert sydney["start"].startswith("2024-06-21")
+    assert reykjavik == {"city": "Reykjavik", "error": 422, "message": "There is no golden hour in Reykjavik today"}
+
+
+def test_goldenhour_location(client):
+    query = {"lat": -33.87, "lon": 151.21, "start": "2019-01-01", "end": "2019-01-31"}
+    res = client.get("/goldenhour", query_string=query)
+    assert res.status_code == 200
+    data = res.get_json()
+    assert len(data) == 31
+    assert data[0]["date"] == "2019-01-01"
+    assert data[0]["golden_hour_start"] < data[0]["golden_hour_end"]
+    assert data[0]["sunset"].startswith("2019-01-01T09:")
+
+    res = client.get("/goldenhour", query_string={"lat": -33.87, "lon": 151.21})
+    assert len(res.get_json()) == 1
+
+    for bad in [
+        {"lat": -33.87},
+        {"lon": 151.21},
+        {"lat": "south", "lon": 151.21},
+        {"lat": -100, "lon": 151.21},
+        {"lat": -33.87, "lon": 151.21, "start": "2019-01-02", "end": "2019-01-01"},
+        {"lat": -33.87, "lon": 151.21, "start": "2000-01-01", "end": "2019-01-01"},
+        {"lat": -33.87, "lon": 151.21, "start": "soon"},
+        # times on the first and last days can't all be held by a datetime
+        {"lat": 0, "lon": 180, "start": "0001-01-01"},
+        {"lat": 0, "lon": -180, "start": "9999-12-31"},
+    ]:
+        assert client.get("/goldenhour", query_string=bad).status_code == 400
+
+    for edge in [{"lat": 0, "lon": 180, "start": "0001-01-02"}, {"lat": 0, "lon": -180, "start": "9999-12-30"}]:
+        assert client.get("/goldenhour", query_string=edge).status_code == 200
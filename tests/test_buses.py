@@ -1,8 +1,14 @@
+import json
+
+from ncss_apis.gtfs import parse_time
+
+
 def test_example(client):
     """
     This tests the example on https://groklearning.com/learn/ncss-2020-web/json-http-requests/22/ | HTTP Requests with JSON
     """
-    data = {"stop_id": "82", "time": "07:15:00"}
+    # buses only run on some days, so pick a weekday
+    data = {"stop_id": "82", "time": "07:15:00", "date": "2015-03-02"}
 
     res = client.post("/buses/hail", json=data)
     assert res.status_code == 200
@@ -23,6 +29,11 @@ def test_hail_bus_types(client):
     res = client.post("/buses/hail", json=data)
     assert res.status_code == 404
 
+    # stop ids are strings, anything else can't be a stop
+    for stop_id in [["82"], {"a": 1}, 82]:
+        res = client.post("/buses/hail", json={"stop_id": stop_id})
+        assert res.status_code == 404
+
     # should 400 on garbage in body
     data = {"stop_id": "82", "time": "07:15:00"}
     res = client.post("/buses/hail", data=data)
@@ -77,3 +88,377 @@ def test_basic_get_methods(client):
     assert len(data) > 0
     assert "route_id" in data[0]
     assert "route_desc" in data[0]
+
+
+def test_hail_returns_next_departures_in_order(client):
+    data = {"stop_id": "82", "time": "07:15:00", "date": "2015-03-02"}
+    res = client.post("/buses/hail", json=data)
+    assert res.status_code == 200
+    stop_times = res.get_json()["stop_times"]
+    assert 0 < len(stop_times) <= 5
+
+    arrivals = [tuple(map(int, st["arrival_time"].split(":"))) for st in stop_times]
+    assert arrivals == sorted(arrivals)
+    assert all(arrival > (7, 15, 0) for arrival in arrivals)
+    assert all(st["stop_id"] == "82" for st in stop_times)
+
+
+def test_collections_are_cacheable(client):
+    for url in ["/buses/stops", "/buses/stop_times", "/buses/routes"]:
+        res = client.get(url)
+        assert res.status_code == 200
+        etag = res.headers["ETag"]
+        assert not etag.startswith("W/")
+
+        res = client.get(url, headers={"If-None-Match": etag})
+        assert res.status_code == 304
+        assert res.data == b""
+
+        res = client.get(url, headers={"If-None-Match": '"something-else"'})
+        assert res.status_code == 200
+
+
+def test_collections_gzip(client):
+    import gzip
+    import json
+
+    plain = client.get("/buses/stop_times")
+    assert "Content-Encoding" not in plain.headers
+
+    res = client.get("/buses/stop_times", headers={"Accept-Encoding": "gzip"})
+    assert res.status_code == 200
+    assert res.headers["Content-Encoding"] == "gzip"
+    assert "Accept-Encoding" in res.headers["Vary"]
+    assert res.headers["ETag"] != plain.headers["ETag"]
+    assert len(res.data) < len(plain.data)
+    assert json.loads(gzip.decompress(res.data)) == plain.get_json()
+
+    res = client.get(
+        "/buses/stop_times",
+        headers={"Accept-Encoding": "gzip", "If-None-Match": res.headers["ETag"]},
+    )
+    assert res.status_code == 304
+
+
+def test_stop_times_filters(client):
+    res = client.get("/buses/stop_times", query_string={"stop_id": "82"})
+    assert res.status_code == 200
+    data = res.get_json()
+    assert len(data) > 0
+    assert all(st["stop_id"] == "82" for st in data)
+
+    res = client.get("/buses/stop_times", query_string={"trip_id": "1848"})
+    data = res.get_json()
+    assert len(data) > 0
+    assert all(st["trip_id"] == "1848" for st in data)
+    sequence = [int(st["stop_sequence"]) for st in data]
+    assert sequence == sorted(sequence)
+
+    query = {"stop_id": "82", "from": "07:00:00", "until": "09:00:00"}
+    res = client.get("/buses/stop_times", query_string=query)
+    data = res.get_json()
+    assert len(data) > 0
+    for st in data:
+        hours, minutes, _ = map(int, st["arrival_time"].split(":"))
+        assert 7 <= hours <= 8 or (hours, minutes) == (9, 0)
+
+    res = client.get("/buses/stop_times", query_string={"stop_id": "garbage"})
+    assert res.status_code == 200
+    assert res.get_json() == []
+
+
+def test_stop_times_invalid_filters(client):
+    for query in [
+        {"from": "garbage"},
+        {"until": "7am"},
+        {"limit": "0"},
+        {"limit": "lots"},
+        {"cursor": "-1"},
+        {"format": "xml"},
+    ]:
+        res = client.get("/buses/stop_times", query_string=query)
+        assert res.status_code == 400
+
+
+def test_stop_times_pagination(client):
+    everything = client.get("/buses/stop_times", query_string={"stop_id": "82"}).get_json()
+
+    pages = []
+    res = client.get("/buses/stop_times", query_string={"stop_id": "82", "limit": 3})
+    while True:
+        assert res.status_code == 200
+        page = res.get_json()
+        assert len(page) <= 3
+        pages.extend(page)
+        if "Link" not in res.headers:
+            break
+        next_url = res.headers["Link"].split(";")[0].strip("<>")
+        res = client.get(next_url)
+
+    assert pages == everything
+
+
+def test_stop_times_ndjson(client):
+    import json
+
+    everything = client.get("/buses/stop_times").get_json()
+
+    res = client.get("/buses/stop_times", query_string={"format": "ndjson"})
+    assert res.status_code == 200
+    assert res.mimetype == "application/x-ndjson"
+    lines = res.data.decode("utf-8").splitlines()
+    assert [json.loads(line) for line in lines] == everything
+
+    res = client.get("/buses/stop_times", query_string={"format": "ndjson", "trip_id": "1848", "limit": 2})
+    lines = res.data.decode("utf-8").splitlines()
+    assert len(lines) == 2
+    assert "cursor=2" in res.headers["Link"]
+
+
+def test_hail_service_days(client):
+    weekday = {"stop_id": "82", "time": "07:15:00", "date": "2015-03-04"}
+    weekday_times = client.post("/buses/hail", json=weekday).get_json()["stop_times"]
+    assert len(weekday_times) > 0
+
+    saturday = dict(weekday, date="2015-03-07")
+    saturday_times = client.post("/buses/hail", json=saturday).get_json()["stop_times"]
+    assert saturday_times != weekday_times
+
+    # no buses on sundays or christmas day
+    for day in ["2015-03-08", "2015-12-25"]:
+        res = client.post("/buses/hail", json=dict(weekday, date=day))
+        assert res.status_code == 200
+        assert res.get_json()["stop_times"] == []
+        assert "No buses" in res.get_json()["message"]
+
+    # the timetable repeats weekly outside the feed's calendar
+    res = client.post("/buses/hail", json=dict(weekday, date="2026-10-21"))
+    assert res.get_json()["stop_times"] == weekday_times
+
+    res = client.post("/buses/hail", json=dict(weekday, date="garbage"))
+    assert res.status_code == 400
+    assert "Date" in res.get_json()["message"]
+
+    query = {"stop_id": "82", "date": "2015-03-08"}
+    res = client.get("/buses/stop_times", query_string=query)
+    assert res.status_code == 200
+    assert res.get_json() == []
+    res = client.get("/buses/stop_times", query_string={"date": "tuesday"})
+    assert res.status_code == 400
+
+
+def test_nearest_stops(client):
+    # right on top of Power Street
+    query = {"lat": -23.669039, "lon": 133.868417}
+    res = client.get("/buses/nearest", query_string=query)
+    assert res.status_code == 200
+    data = res.get_json()
+    assert len(data) == 5
+    assert data[0]["stop_id"] == "82"
+    assert data[0]["distance"] == 0
+    assert "stop_name" in data[0]
+    distances = [stop["distance"] for stop in data]
+    assert distances == sorted(distances)
+
+    res = client.get("/buses/nearest", query_string=dict(query, k=2))
+    assert len(res.get_json()) == 2
+
+    res = client.get("/buses/nearest", query_string=dict(query, k=100, radius=300))
+    data = res.get_json()
+    assert 0 < len(data) < 100
+    assert all(stop["distance"] <= 300 for stop in data)
+
+
+def test_nearest_stops_invalid(client):
+    for query in [
+        {"lon": 133.87},
+        {"lat": -23.67},
+        {"lat": "here", "lon": 133.87},
+        {"lat": -91, "lon": 133.87},
+        {"lat": -23.67, "lon": 133.87, "k": 0},
+        {"lat": -23.67, "lon": 133.87, "k": 1.5},
+        {"lat": -23.67, "lon": 133.87, "k": 1000},
+        {"lat": -23.67, "lon": 133.87, "radius": -1},
+    ]:
+        res = client.get("/buses/nearest", query_string=query)
+        assert res.status_code == 400
+
+
+def test_journey(client):
+    query = {"from_stop": "82", "to_stop": "180", "depart_after": "07:00:00", "date": "2015-03-02"}
+    res = client.get("/buses/journey", query_string=query)
+    assert res.status_code == 200
+    journeys = res.get_json()
+    assert 1 <= len(journeys) <= 3
+    departures = []
+    for journey in journeys:
+        legs = journey["legs"]
+        assert legs[0]["from_stop"]["stop_id"] == "82"
+        assert legs[-1]["to_stop"]["stop_id"] == "180"
+        for leg, after in zip(legs, legs[1:]):
+            assert leg["to_stop"] == after["from_stop"]
+        assert journey["departure_time"] == legs[0]["departure_time"]
+        assert journey["arrival_time"] == legs[-1]["arrival_time"]
+        departures.append(parse_time(journey["departure_time"]))
+    assert departures[0] >= parse_time("07:00:00")
+    assert departures == sorted(set(departures))
+
+    res = client.get("/buses/journey", query_string=dict(query, limit=1))
+    assert len(res.get_json()) == 1
+
+
+def test_journey_invalid(client):
+    query = {"from_stop": "82", "to_stop": "180"}
+    for bad in [
+        {"from_stop": ""},
+        {"to_stop": ""},
+        {"to_stop": "82"},
+        {"depart_after": "soon"},
+        {"date": "tomorrow"},
+        {"limit": 0},
+        {"limit": 11},
+    ]:
+        res = client.get("/buses/journey", query_string=dict(query, **bad))
+        assert res.status_code == 400
+
+    res = client.get("/buses/journey", query_string=dict(query, to_stop="nowhere"))
+    assert res.status_code == 404
+
+
+def test_shape(client):
+    res = client.get("/buses/shapes/1415")
+    assert res.status_code == 200
+    assert res.mimetype == "application/geo+json"
+    full = res.get_json()
+    assert full["type"] == "Feature"
+    assert full["properties"] == {"shape_id": "1415", "tolerance": 0}
+    coordinates = full["geometry"]["coordinates"]
+    assert len(coordinates) == 200
+    assert coordinates[0] == [133.878218, -23.699239]
+
+    # tolerances are rounded down to the nearest precomputed one
+    res = client.get("/buses/shapes/1415", query_string={"tolerance": 30})
+    simplified = res.get_json()
+    assert simplified["properties"]["tolerance"] == 20
+    points = simplified["geometry"]["coordinates"]
+    assert 2 <= len(points) < len(coordinates)
+    assert points[0] == coordinates[0] and points[-1] == coordinates[-1]
+    assert all(point in coordinates for point in points)
+
+    res = client.get("/buses/shapes/1415", query_string={"tolerance": 20, "format": "polyline"})
+    assert res.status_code == 200
+    data = res.get_json()
+    assert data["tolerance"] == 20
+    assert isinstance(data["polyline"], str)
+    assert res.headers["ETag"]
+
+
+def test_shape_invalid(client):
+    assert client.get("/buses/shapes/nope").status_code == 404
+    for query in [{"tolerance": -1}, {"tolerance": "lots"}, {"format": "kml"}]:
+        res = client.get("/buses/shapes/1415", query_string=query)
+        assert res.status_code == 400
+
+
+def test_hail_batch(client):
+    hails = [
+        {"stop_id": "82", "time": "07:15:00", "date": "2015-03-02"},
+        {"stop_id": "nowhere", "time": "07:15:00"},
+        {"stop_id": "82", "time": "quarter past"},
+        {"time": "07:15:00"},
+        "82",
+        {"stop_id": "82", "time": "07:15:00", "date": "2015-03-02"},
+    ]
+    res = client.post("/buses/hail/batch", json=hails)
+    assert res.status_code == 200
+    data = res.get_json()
+    assert len(data) == len(hails)
+
+    single = client.post("/buses/hail", json=hails[0]).get_json()
+    assert data[0] == single
+    assert data[5] == single
+    assert data[1] == {"error": 404, "message": "Stop not found"}
+    assert data[2] == {"error": 400, "message": "Time was not in the correct format"}
+    assert data[3]["error"] == 400
+    assert data[4]["error"] == 400
+
+
+def test_hail_batch_bad_stop_id(client):
+    # one malformed hail doesn't spoil the rest
+    hails = [
+        {"stop_id": "82", "time": "07:15:00", "date": "2015-03-02"},
+        {"stop_id": {"a": 1}},
+        {"stop_id": ["82"]},
+    ]
+    res = client.post("/buses/hail/batch", json=hails)
+    assert res.status_code == 200
+    data = res.get_json()
+    assert data[0] == client.post("/buses/hail", json=hails[0]).get_json()
+    assert data[1] == {"error": 404, "message": "Stop not found"}
+    assert data[2] == {"error": 404, "message": "Stop not found"}
+
+
+def test_hail_batch_invalid(client):
+    assert client.post("/buses/hail/batch", json={"stop_id": "82"}).status_code == 400
+    assert client.post("/buses/hail/batch", json=[{"stop_id": "82"}] * 101).status_code == 400
+    res = client.post("/buses/hail/batch", json=[])
+    assert res.status_code == 200
+    assert res.get_json() == []
+
+
+def test_board_stream(client):
+    from ncss_apis.buses import boards
+
+    res = client.get("/buses/stops/82/board/stream", query_string={"limit": 3})
+    assert res.status_code == 200
+    assert res.mimetype == "text/event-stream"
+    assert res.headers["Cache-Control"] == "no-cache"
+
+    chunks = res.response
+    assert next(chunks).startswith(b"retry:")
+    event = next(chunks).decode()
+    assert event.startswith("event: board\ndata: ")
+    assert event.endswith("\n\n")
+    board = json.loads(event.split("data: ", 1)[1])
+    assert board["stop"]["stop_id"] == "82"
+    assert len(board["stop_times"]) <= 3
+    assert boards.subscriber_count(("82", 3)) == 1
+
+    res.close()
+    assert boards.subscriber_count(("82", 3)) == 0
+
+
+def test_board_stream_invalid(client):
+    assert client.get("/buses/stops/nowhere/board/stream").status_code == 404
+    assert client.get("/buses/stops/82/board/stream", query_string={"limit": 50}).status_code == 400
+
+
+def test_trip(client):
+    res = client.get("/buses/trips/1848")
+    assert res.status_code == 200
+    trip = res.get_json()
+    assert trip["trip_id"] == "1848"
+    assert trip["route_id"] == "1415"
+    stops = trip["stops"]
+    assert stops[0]["stop_name"] == "Alice Springs Interchange"
+    sequences = [int(stop["stop_sequence"]) for stop in stops]
+    assert sequences == sorted(sequences)
+    assert all("stop_lat" in stop and "arrival_time" in stop for stop in stops)
+
+    etag = res.headers["ETag"]
+    res = client.get("/buses/trips/1848", headers={"If-None-Match": etag})
+    assert res.status_code == 304
+
+    assert client.get("/buses/trips/nope").status_code == 404
+
+
+def test_route_stops(client):
+    res = client.get("/buses/routes/1415/stops")
+    assert res.status_code == 200
+    stops = res.get_json()
+    stop_ids = [stop["stop_id"] for stop in stops]
+    assert stop_ids[0] == "87"
+    assert len(stop_ids) == len(set(stop_ids))
+    assert "stop_name" in stops[0]
+
+    assert client.get("/buses/routes/nope/stops").status_code == 404
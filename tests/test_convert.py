@@ -1,3 +1,6 @@
+import os
+
+
 def test_convert_number(client):
     # 'value' query param is required
     res = client.get("/convert/number")
@@ -143,3 +146,159 @@ def test_convert_units(client):
     assert res.status_code == 400
     data = res.get_json()
     assert "cannot" in data["message"].lower()
+
+
+def test_unit_conversion_matches_pint():
+    from ncss_apis.convert import unit_conversion, units
+
+    pairs = [("km", "m"), ("mile", "km"), ("tims", "m"), ("ft", "tims"), ("km/h", "m/s"), ("2 lb", "kg"), ("acre", "m**2")]
+    for unit, to in pairs:
+        for quantity in [0.0, 0.1, 3.14, -7.5, 123456.789, 1e-300, 1e300]:
+            expected = (quantity * units.parse_expression(unit)).to(units.parse_expression(to))
+            assert f"{unit_conversion(unit, to).convert(quantity):P}" == f"{expected:P}"
+
+
+def test_unit_registry_cache(tmp_path, monkeypatch):
+    import pint
+    from ncss_apis import convert
+
+    folder = convert.units_cache_folder(str(tmp_path))
+    convert.make_units(str(tmp_path))
+    assert os.listdir(folder)
+
+    # loaded from the cache, with the custom units still defined
+    cached, uncached = convert.make_units(str(tmp_path)), pint.UnitRegistry()
+    uncached.define(convert.CUSTOM_UNITS[0])
+    for unit, to in [("tims", "m"), ("mile", "km"), ("km/h", "m/s"), ("acre", "m**2")]:
+        expected = (3.14 * uncached.parse_expression(unit)).to(uncached.parse_expression(to))
+        actual = (3.14 * cached.parse_expression(unit)).to(cached.parse_expression(to))
+        assert f"{actual:P}" == f"{expected:P}"
+
+    # a new version of pint, or new custom units, get a cache of their own
+    monkeypatch.setattr(convert, "CUSTOM_UNITS", convert.CUSTOM_UNITS + ["blorp = 2 * m"])
+    assert convert.units_cache_folder(str(tmp_path)) != folder
+    monkeypatch.undo()
+    monkeypatch.setattr(pint, "__version__", "0.0.1")
+    assert convert.units_cache_folder(str(tmp_path)) != folder
+
+
+def test_convert_units_cached(client):
+    from ncss_apis.convert import unit_conversion
+
+    unit_conversion.cache_clear()
+    for quantity in ["1", "2", "3"]:
+        res = client.get("/convert/unit", query_string={"quantity": quantity, "unit": "tims", "to": "m"})
+        assert res.status_code == 200
+    assert res.data.decode("utf-8") == "4.5 meter"
+    info = unit_conversion.cache_info()
+    assert (info.misses, info.hits) == (1, 2)
+
+    # failures are remembered too, and give the same response each time
+    for _ in range(2):
+        res = client.get("/convert/unit", query_string={"quantity": "1", "unit": "km", "to": "kg"})
+        assert res.status_code == 400
+        assert "cannot" in res.get_json()["message"].lower()
+    assert unit_conversion.cache_info().hits == 3
+
+    # offset units convert too
+    res = client.get("/convert/unit", query_string={"quantity": "100", "unit": "degC", "to": "kelvin"})
+    assert res.status_code == 200
+    assert res.data.decode("utf-8") == "373.15 kelvin"
+
+
+def test_convert_units_batch(client):
+    quantities = [3.14, "42", True, None, "lots", 1e308, 0.5]
+    res = client.post("/convert/unit/batch", query_string={"unit": "km", "to": "m"}, json=quantities)
+    assert res.status_code == 200
+    data = res.get_json()
+    assert data["unit"] == "meter"
+    assert data["values"] == [3140.0, 42000.0, None, None, None, None, 500.0]
+    assert [error["index"] for error in data["errors"]] == [2, 3, 4, 5]
+
+    # the same answers as converting one at a time
+    single = client.get("/convert/unit", query_string={"quantity": "3.14", "unit": "km", "to": "m"})
+    assert single.data.decode("utf-8") == f"{data['values'][0]} {data['unit']}"
+
+    res = client.post(
+        "/convert/unit/batch",
+        query_string={"unit": "tims", "to": "m"},
+        data="1,2\n3\n",
+        content_type="text/csv",
+    )
+    assert res.status_code == 200
+    assert res.get_json()["values"] == [1.5, 3.0, 4.5]
+
+
+def test_convert_units_batch_invalid(client):
+    url = "/convert/unit/batch"
+    assert client.post(url, query_string={"to": "m"}, json=[1]).status_code == 400
+    assert client.post(url, query_string={"unit": "km"}, json=[1]).status_code == 400
+    assert client.post(url, query_string={"unit": "km", "to": "m"}, json={"value": 1}).status_code == 400
+    assert client.post(url, query_string={"unit": "km", "to": "kg"}, json=[1]).status_code == 400
+    assert client.post(url, query_string={"unit": "km", "to": "clearlynotaunit"}, json=[1]).status_code == 404
+    assert client.post(url, query_string={"unit": "km", "to": "m"}, json=[1] * 100001).status_code == 400
+
+
+def test_convert_number_batch(client):
+    res = client.post("/convert/number/batch", query_string={"to": "rank"}, json=["1", 2, "two", None, True, "", 3.5])
+    assert res.status_code == 200
+    data = res.get_json()
+    assert data["values"] == ["first", "second", None, None, None, None, None]
+    assert [error["index"] for error in data["errors"]] == [2, 3, 4, 5, 6]
+    assert data["errors"][0]["message"] == "Invalid number to convert to rank"
+
+    res = client.post("/convert/number/batch", query_string={"to": "number"}, json=["eleven", "1"])
+    assert res.get_json()["values"] == ["11", None]
+
+    assert client.post("/convert/number/batch", json={"value": 1}).status_code == 400
+    assert client.post("/convert/number/batch", query_string={"to": "roman"}, json=[1]).status_code == 400
+    assert client.post("/convert/number/batch", json=["1"] * 10001).status_code == 400
+
+
+def test_convert_number_range(client):
+    res = client.get("/convert/number/range", query_string={"from": 1, "to": 3, "mode": "rank"})
+    assert res.status_code == 200
+    assert res.data.decode("utf-8") == "first\nsecond\nthird\n"
+
+    res = client.get("/convert/number/range", query_string={"from": -1, "to": 1})
+    assert res.data.decode("utf-8") == "minus one\nzero\none\n"
+
+    # the same as converting them one at a time
+    lines = client.get("/convert/number/range", query_string={"from": 95, "to": 105}).data.decode("utf-8").split("\n")
+    for number, line in zip(range(95, 106), lines):
+        single = client.get("/convert/number", query_string={"value": number})
+        assert single.data.decode("utf-8") == line
+
+    for query in [
+        {"to": 3},
+        {"from": 1},
+        {"from": "one", "to": 3},
+        {"from": 3, "to": 1},
+        {"from": -1, "to": 3, "mode": "rank"},
+        {"from": 1, "to": 3, "mode": "number"},
+        {"from": 0, "to": 10 ** 7},
+        {"from": 10 ** 400, "to": 10 ** 400},
+    ]:
+        assert client.get("/convert/number/range", query_string=query).status_code == 400
+
+
+def test_convert_number_range_leaves_cache(client):
+    from ncss_apis.convert import convert_number
+
+    client.get("/convert/number", query_string={"value": 7})
+    res = client.get("/convert/number/range", query_string={"from": 1000, "to": 5200})
+    assert res.status_code == 200
+    assert res.data.decode("utf-8").count("\n") == 4201
+
+    # a big range doesn't push out what was already cached
+    hits = convert_number.cache_info().hits
+    client.get("/convert/number", query_string={"value": 7})
+    assert convert_number.cache_info().hits == hits + 1
+
+    # but small numbers share the cache, so a second 1-100 is all hits
+    client.get("/convert/number/range", query_string={"from": 1, "to": 100}).get_data()
+    hits, misses = convert_number.cache_info().hits, convert_number.cache_info().misses
+    res = client.get("/convert/number/range", query_string={"from": 1, "to": 100})
+    assert res.data.decode("utf-8").splitlines()[6] == "seven"
+    assert convert_number.cache_info().misses == misses
+    assert convert_number.cache_info().hits >= hits + 100
@@ -10,3 +10,54 @@ def test_good_emoji(client):
   assert res.status_code == 200
   emoji = res.data.decode("utf-8")
   assert emoji in {'🐾', '🐩'}
+
+def test_emoji_index_matches_emojislib():
+  import emojislib
+  from ncss_apis.emoji import emoji_index
+
+  def emojislib_emojis(key):
+    # what /emoji/<key> used to pick from
+    by_key = list(emojislib.by_key(key))
+    by_name = [emojislib.by_name(key).char] if emojislib.by_name(key) else []
+    search_by_name = list(emojislib.search_by_name(key))
+    search_by_key = list(emojislib.search_by_key(key))
+    search_by_category = list(emojislib.search_by_cate(key))
+    return sorted(map(str, set(by_key or by_name or search_by_name or search_by_key or search_by_category)))
+
+  # names, keywords, words in names, categories, keywords only found as
+  # part of a string of keywords, and things that aren't any of them
+  keys = ['dog', 'Dog', 'poodle', 'face', 'man', 'people', 'animals', 'ufo', 'UFO', 'olf', 'ee', 'e', '+', '-1', 'xyzzy', 'flag_', 'u']
+  for key in keys:
+    assert sorted(emoji_index[key]) == emojislib_emojis(key), key
+
+def test_emoji_index_caches_other_keys():
+  from ncss_apis.emoji import emoji_index
+
+  assert 'oodl' not in emoji_index.index
+  assert emoji_index['oodl'] == ('🐩',)
+  assert emoji_index._search_cached.cache_info().currsize > 0
+
+def test_emoji_search(client):
+  res = client.get("/emoji/search", query_string={"q": "dgo"})
+  assert res.status_code == 200
+  results = res.get_json()
+  assert results[0] == {"emoji": "🐶", "name": "dog", "match": "dog", "distance": 1}
+  assert len(results) <= 10
+
+  res = client.get("/emoji/search", query_string={"q": "Dog", "limit": 3})
+  results = res.get_json()
+  assert [result["emoji"] for result in results] == ["🐶", "🐾", "🐩"]
+  assert all(result["distance"] == 0 for result in results)
+
+  res = client.get("/emoji/search", query_string={"q": "thmubsup"})
+  assert res.get_json()[0]["emoji"] == "👍"
+
+  res = client.get("/emoji/search", query_string={"q": "xyzzyq"})
+  assert res.status_code == 200
+  assert res.get_json() == []
+
+def test_emoji_search_invalid(client):
+  assert client.get("/emoji/search").status_code == 400
+  assert client.get("/emoji/search", query_string={"q": " "}).status_code == 400
+  for limit in ["0", "101", "lots"]:
+    assert client.get("/emoji/search", query_string={"q": "dog", "limit": limit}).status_code == 400
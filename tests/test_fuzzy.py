@@ -0,0 +1,42 @@
+from ncss_apis.fuzzy import TrigramIndex, edit_distance, max_edits
+
+
+def test_edit_distance():
+    assert edit_distance("dog", "dog") == 0
+    assert edit_distance("dgo", "dog") == 1  # a swap
+    assert edit_distance("dg", "dog") == 1
+    assert edit_distance("dogs", "dog") == 1
+    assert edit_distance("dig", "dog") == 1
+    assert edit_distance("", "dog") == 3
+    assert edit_distance("kitten", "sitting") == 3
+    # gives up once it's past the limit
+    assert edit_distance("kitten", "sitting", 1) == 2
+    assert edit_distance("dgo", "dog", 1) == 1
+
+
+def test_trigram_index_search():
+    index = TrigramIndex(["dog", "dog2", "do", "doge", "cat", "caterpillar", "smile", "smiley"])
+
+    assert sorted(index.search("dog")) == [(0, "dog"), (0, "dog2"), (0, "doge"), (1, "do")]
+    assert sorted(index.search("dgo")) == [(1, "do"), (1, "dog")]
+    assert sorted(index.search("cat")) == [(0, "cat"), (0, "caterpillar")]
+    assert sorted(index.search("smlie")) == [(1, "smile")]
+    assert sorted(index.search("smlies")) == [(2, "smile"), (2, "smiley")]
+    # too short to allow for typos
+    assert max_edits("do") == 0
+    assert sorted(index.search("dg")) == []
+    assert index.search("xyzzy") == []
+
+
+def test_trigram_index_finds_typos():
+    import random
+
+    terms = [f"{a}{b}{c}{d}" for a in "bdfh" for b in "aeiou" for c in "lmnrst" for d in ["", "e", "er"]]
+    index = TrigramIndex(terms)
+    rng = random.Random(1)
+    for term in rng.sample(terms, 50):
+        # any single typo, other than to the first letter
+        i = rng.randrange(1, len(term))
+        for typo in [term[:i] + term[i + 1:], term[:i] + "x" + term[i:], term[:i] + "z" + term[i + 1:]]:
+            if len(typo) >= 3:
+                assert (edit_distance(typo, term), term) in index.search(typo) or term.startswith(typo), typo
@@ -0,0 +1,123 @@
+import random
+
+from math import cos, radians
+
+from ncss_apis.geo import (
+    EARTH_RADIUS,
+    PointGrid,
+    build_grid,
+    encode_polyline,
+    haversine,
+    segment_distance,
+    simplification_levels,
+)
+
+
+def test_haversine():
+    assert haversine(-23.7, 133.87, -23.7, 133.87) == 0
+    # one degree of latitude is about 111km
+    assert abs(haversine(-23, 133, -24, 133) - 111195) < 10
+    assert abs(haversine(0, 179.5, 0, -179.5) - 111195) < 10
+
+
+def test_nearest_matches_brute_force():
+    rng = random.Random(1)
+    lats = [rng.gauss(-23.7, 0.05) for _ in range(2000)] + [float("nan")]
+    lons = [rng.gauss(133.87, 0.05) for _ in range(2000)] + [133.87]
+    grid = PointGrid(lats, lons, *build_grid(lats, lons))
+
+    for _ in range(50):
+        lat, lon = rng.gauss(-23.7, 0.1), rng.gauss(133.87, 0.1)
+        k = rng.choice([1, 5, 20])
+        radius = rng.choice([None, 100, 1000])
+
+        expected = sorted(
+            (haversine(lat, lon, lats[i], lons[i]), i) for i in range(2000)
+        )
+        if radius is not None:
+            expected = [(d, i) for d, i in expected if d <= radius]
+
+        nearest = grid.nearest(lat, lon, k, radius)
+        assert [i for _, i in nearest] == [i for _, i in expected[:k]]
+        assert [d for d, _ in nearest] == sorted(d for d, _ in nearest)
+
+
+def test_nearest_far_from_every_point():
+    # towns hundreds of km apart, so the queries between and beyond them
+    # look at more cells than the rings are searched for
+    rng = random.Random(2)
+    towns = [(rng.uniform(-40, -15), rng.uniform(115, 150)) for _ in range(20)]
+    lats, lons = [], []
+    for _ in range(3000):
+        lat, lon = rng.choice(towns)
+        lats.append(rng.gauss(lat, 0.05))
+        lons.append(rng.gauss(lon, 0.05))
+    grid = PointGrid(lats, lons, *build_grid(lats, lons))
+
+    queries = [(-25, 133), (-30, 125), (-45, 100), (0, 170), (60, -100), (-89.9, 0)]
+    queries += [(rng.uniform(-50, -5), rng.uniform(100, 160)) for _ in range(20)]
+    for lat, lon in queries:
+        expected = sorted(
+            (haversine(lat, lon, lats[i], lons[i]), i) for i in range(3000)
+        )
+        for k, radius in [(1, None), (5, None), (5, 500000)]:
+            nearest = grid.nearest(lat, lon, k, radius)
+            within = [(d, i) for d, i in expected if radius is None or d <= radius]
+            assert [i for _, i in nearest] == [i for _, i in within[:k]], (lat, lon, k)
+
+
+def test_nearest_edge_cases():
+    grid = PointGrid([], [], *build_grid([], []))
+    assert grid.nearest(0, 0, 5) == []
+
+    lats, lons = [10.0, 10.001], [20.0, 20.0]
+    grid = PointGrid(lats, lons, *build_grid(lats, lons))
+    # asking for more than there are returns all of them, even far away
+    assert [i for _, i in grid.nearest(-30, -40, 5)] == [0, 1]
+    assert [i for _, i in grid.nearest(50, 60, 1)] == [1]
+    assert grid.nearest(10, 20, 0) == []
+
+
+def douglas_peucker(points, tolerance):
+    scale = cos(radians(points[0][0]))
+    xy = [(radians(lon) * scale * EARTH_RADIUS, radians(lat) * EARTH_RADIUS) for lat, lon in points]
+
+    def keep(lo, hi):
+        if hi - lo < 2:
+            return []
+        distance, index = max(
+            (segment_distance(*xy[i], *xy[lo], *xy[hi]), i) for i in range(lo + 1, hi)
+        )
+        if distance < tolerance:
+            return []
+        return keep(lo, index) + [index] + keep(index, hi)
+
+    return [0] + keep(0, len(points) - 1) + [len(points) - 1]
+
+
+def test_simplification_levels_match_douglas_peucker():
+    rng = random.Random(2)
+    lat, lon = -23.7, 133.87
+    points = []
+    for _ in range(300):
+        lat += rng.gauss(0, 0.0005)
+        lon += rng.gauss(0.0003, 0.0005)
+        points.append((lat, lon))
+    levels = simplification_levels([p[0] for p in points], [p[1] for p in points])
+
+    for tolerance in [0, 1, 5, 20, 80, 1000]:
+        kept = [i for i, level in enumerate(levels) if level >= tolerance]
+        assert kept == douglas_peucker(points, tolerance)
+
+
+def test_simplification_levels_short():
+    assert list(simplification_levels([], [])) == []
+    assert list(simplification_levels([1], [2])) == [float("inf")]
+    assert list(simplification_levels([1, 2], [2, 3])) == [float("inf")] * 2
+
+
+def test_encode_polyline():
+    # the example from Google's documentation
+    points = [(38.5, -120.2), (40.7, -120.95), (43.252, -126.453)]
+    assert encode_polyline(points) == "_p~iF~ps|U_ulLnnqC_mqNvxq`@"
+    assert encode_polyline([]) == ""
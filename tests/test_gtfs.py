@@ -0,0 +1,312 @@
+import os
+
+from ncss_apis.gtfs import Feed, Table, IntColumn, TimeColumn, StringColumn, parse_time, format_time
+
+
+def make_feed():
+    stops = Table.build(
+        ["stop_id", "stop_name", "stop_lat", "stop_lon"],
+        [["1", "One", "-23.7", "133.87"], ["2", "Two", "-23.71", "133.88"]],
+    )
+    stop_times = Table.build(
+        ["trip_id", "stop_id", "arrival_time", "departure_time", "stop_sequence"],
+        [
+            ["a", "1", "9:00:00", "9:00:00", "0"],
+            ["b", "1", "7:30:00", "7:30:00", "0"],
+            ["b", "2", "7:45:00", "7:45:00", "1"],
+            ["c", "2", "8:00:00", "8:00:00", "0"],
+            ["d", "1", "25:10:00", "25:10:00", "0"],
+            ["e", "1", "8:15:00", "8:15:00", "0"],
+        ],
+    )
+    trips = Table.build(
+        ["trip_id", "route_id", "service_id"],
+        [["a", "r", "WEEK"], ["b", "r", "WEEK"], ["c", "s", "SAT"], ["d", "r", "WEEK"], ["e", "s", "SAT"]],
+    )
+    days = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+    calendar = Table.build(
+        ["service_id"] + days + ["start_date", "end_date"],
+        [
+            ["WEEK", "1", "1", "1", "1", "1", "0", "0", "20150101", "20151231"],
+            ["SAT", "0", "0", "0", "0", "0", "1", "0", "20150101", "20151231"],
+        ],
+    )
+    calendar_dates = Table.build(
+        ["service_id", "date", "exception_type"],
+        [["WEEK", "20150302", "2"], ["SAT", "20150302", "1"]],
+    )
+    return Feed({
+        "stops": stops,
+        "stop_times": stop_times,
+        "routes": Table.build(["route_id"], [["r"], ["s"], ["t"]]),
+        "trips": trips,
+        "calendar": calendar,
+        "calendar_dates": calendar_dates,
+        "transfers": Table.build(["from_stop_id", "to_stop_id", "transfer_type", "min_transfer_time"], []),
+        "shapes": Table.build(
+            ["shape_id", "shape_pt_lat", "shape_pt_lon", "shape_pt_sequence"],
+            [
+                ["s", "-23.7", "133.87", "0"],
+                ["s", "-23.7", "133.8705", "1"],
+                ["s", "-23.7", "133.871", "2"],
+                ["s", "-23.71", "133.871", "3"],
+            ],
+        ),
+    })
+
+
+def test_parse_time():
+    assert parse_time("0:00:00") == 0
+    assert parse_time("7:04:30") == 7 * 3600 + 4 * 60 + 30
+    assert parse_time("07:04:30") == parse_time("7:04:30")
+    # GTFS times may run past midnight
+    assert parse_time("25:00:00") == 25 * 3600
+
+
+def test_format_time():
+    assert format_time(parse_time("7:04:00")) == "7:04 AM"
+    assert format_time(parse_time("16:18:00")) == "4:18 PM"
+    assert format_time(parse_time("24:30:00")) == "12:30 AM"
+
+
+def test_next_stop_times():
+    feed = make_feed()
+    trips = lambda stop_times: [st["trip_id"] for st in stop_times]
+
+    assert trips(feed.next_stop_times("1", 0)) == ["b", "e", "a", "d"]
+    assert trips(feed.next_stop_times("1", parse_time("8:15:00"))) == ["a", "d"]
+    assert trips(feed.next_stop_times("1", 0, limit=2)) == ["b", "e"]
+    assert feed.next_stop_times("1", parse_time("26:00:00")) == []
+    assert feed.next_stop_times("missing", 0) == []
+    assert feed.stop("2") == {"stop_id": "2", "stop_name": "Two", "stop_lat": "-23.71", "stop_lon": "133.88"}
+    assert feed.stop("3") is None
+
+
+def test_find_stop_times():
+    feed = make_feed()
+    trips = lambda stop_times: [st["trip_id"] for st in stop_times]
+
+    assert list(feed.find_stop_times()) == list(feed.stop_times)
+    assert trips(feed.find_stop_times(stop_id="1")) == ["b", "e", "a", "d"]
+    assert trips(feed.find_stop_times(stop_id="2")) == ["b", "c"]
+    assert trips(feed.find_stop_times(trip_id="b")) == ["b", "b"]
+    assert trips(feed.find_stop_times(trip_id="b", stop_id="2")) == ["b"]
+
+    # the time window is inclusive at both ends
+    start, end = parse_time("7:45:00"), parse_time("9:00:00")
+    assert trips(feed.find_stop_times(start=start, end=end)) == ["b", "c", "e", "a"]
+    assert trips(feed.find_stop_times(stop_id="1", start=start)) == ["e", "a", "d"]
+    assert trips(feed.find_stop_times(stop_id="1", end=end)) == ["b", "e", "a"]
+    assert trips(feed.find_stop_times(trip_id="b", start=start)) == ["b"]
+
+    assert list(feed.find_stop_times(stop_id="missing")) == []
+    assert list(feed.find_stop_times(trip_id="missing")) == []
+    assert list(feed.find_stop_times(trip_id="b", stop_id="missing")) == []
+
+
+def test_table_columns():
+    names = ["id", "time", "name", "distance", "padded"]
+    rows = [
+        ["10", "7:00:00", "Power Street", "0", "07:00:00"],
+        ["-2", "25:01:02", "Power Street", "0.574", "08:00:00"],
+        ["3", "7:00:00", "", "1"],
+    ]
+    table = Table.build(names, rows)
+
+    assert isinstance(table["id"], IntColumn)
+    assert isinstance(table["time"], TimeColumn)
+    assert isinstance(table["name"], StringColumn)
+    assert isinstance(table["distance"], StringColumn)
+    # zero padded times can't be reproduced from seconds, so stay as strings
+    assert isinstance(table["padded"], StringColumn)
+    assert table["name"].strings == ["Power Street", ""]
+
+    assert len(table) == 3
+    assert list(table) == [dict(zip(names, row + [""] * (len(names) - len(row)))) for row in rows]
+    assert table.row(1)["time"] == "25:01:02"
+    assert list(table.rows([2, 0]))[0]["id"] == "3"
+
+    # IDs too big for 32 bits take 64, and those too big for that are strings
+    for big in [str(2**31), str(3 * 10**9), str(2**63), str(10**30)]:
+        table = Table.build(["trip_id"], [["1"], ["2"], [big], ["4"]])
+        assert list(table["trip_id"]) == ["1", "2", big, "4"]
+    assert isinstance(Table.build(["trip_id"], [["1"], [str(2**31)]])["trip_id"], IntColumn)
+    assert isinstance(Table.build(["trip_id"], [["1"], [str(2**63)]])["trip_id"], StringColumn)
+
+    # times can be blank, but a column with nothing in it isn't times
+    table = Table.build(["arrival_time", "headsign"], [["7:00:00", ""], ["", ""]])
+    assert isinstance(table["arrival_time"], TimeColumn)
+    assert isinstance(table["headsign"], StringColumn)
+    assert list(table["arrival_time"]) == ["7:00:00", ""]
+
+
+def copy_feed(tmp_path):
+    import shutil
+
+    path = tmp_path / "buses"
+    shutil.copytree("data/buses", path)
+    return str(path), str(tmp_path / "buses.snapshot")
+
+
+def test_snapshot_matches_parsed_feed(tmp_path):
+    from ncss_apis.gtfs import load_feed, read_feed
+
+    path, snapshot = copy_feed(tmp_path)
+    parsed = read_feed(path)
+    loaded = load_feed(path, snapshot)
+    assert os.path.exists(snapshot)
+
+    # loaded straight out of the memory mapped file
+    assert isinstance(loaded.stop_times["trip_id"].codes, memoryview)
+    assert isinstance(loaded.indexes["by_stop"], memoryview)
+
+    for name in ["stops", "stop_times", "routes"]:
+        assert list(loaded.tables[name]) == list(parsed.tables[name])
+    assert loaded.stop("82") == parsed.stop("82")
+    for stop_id in ["82", "120", "garbage"]:
+        assert loaded.next_stop_times(stop_id, parse_time("7:15:00")) == parsed.next_stop_times(stop_id, parse_time("7:15:00"))
+        assert list(loaded.find_stop_times(stop_id=stop_id, start=parse_time("9:00:00"))) == list(
+            parsed.find_stop_times(stop_id=stop_id, start=parse_time("9:00:00"))
+        )
+    assert list(loaded.find_stop_times(trip_id="1848")) == list(parsed.find_stop_times(trip_id="1848"))
+
+
+def test_snapshot_rebuilt_when_source_changes(tmp_path):
+    from ncss_apis.gtfs import load_feed
+
+    path, snapshot = copy_feed(tmp_path)
+    load_feed(path, snapshot)
+    built = os.stat(snapshot).st_mtime_ns
+
+    # touching a file without changing it keeps the snapshot
+    stops = os.path.join(path, "stops.txt")
+    os.utime(stops, ns=(built + 10**9, built + 10**9))
+    load_feed(path, snapshot)
+    assert os.stat(snapshot).st_mtime_ns == built
+
+    with open(stops, "a", encoding="utf-8") as f:
+        f.write("\n999,New Stop,,-23.7,133.87,1")
+    feed = load_feed(path, snapshot)
+    assert feed.stop("999")["stop_name"] == "New Stop"
+    assert os.stat(snapshot).st_mtime_ns != built
+
+
+def test_snapshot_ignored_when_invalid(tmp_path):
+    from ncss_apis.gtfs import load_feed
+
+    path, snapshot = copy_feed(tmp_path)
+    with open(snapshot, "wb") as f:
+        f.write(b"not a snapshot")
+    assert load_feed(path, snapshot).stop("82")["stop_name"] == "Power Street"
+
+
+def test_blank_times(tmp_path):
+    from ncss_apis.gtfs import load_feed
+
+    # 88 isn't a timepoint on 1848, which goes 87 at 7:00, 88, then 201 at 7:02
+    path, snapshot = copy_feed(tmp_path)
+    stop_times = os.path.join(path, "stop_times.txt")
+    with open(stop_times, encoding="utf-8") as f:
+        text = f.read()
+    with open(stop_times, "w", encoding="utf-8") as f:
+        f.write(text.replace("\n1848,7:01:00,7:01:00,88,", "\n1848,,,88,"))
+
+    for feed in [load_feed(path, snapshot), load_feed(path, snapshot)]:
+        assert [stop["arrival_time"] for stop in feed.trip("1848")["stops"][:3]] == ["7:00:00", "", "7:02:00"]
+        assert list(feed.find_stop_times(trip_id="1848"))[1]["departure_time"] == ""
+        # it has no place in arrival order, so isn't a bus to catch at 88
+        assert all(row["arrival_time"] for row in feed.next_stop_times("88", parse_time("6:59:00"), limit=100))
+        assert [row["arrival_time"] for row in feed.find_stop_times(trip_id="1848", end=parse_time("7:01:30"))] == ["7:00:00"]
+        assert all(row["arrival_time"] for row in feed.find_stop_times(stop_id="88"))
+        # but the bus still goes past it
+        legs = feed.plan_journeys("87", "201", parse_time("6:59:00"), limit=1)[0]
+        assert [(leg["trip_id"], leg["departure_time"], leg["arrival_time"]) for leg in legs] == [("1848", "7:00:00", "7:02:00")]
+
+
+def test_service_calendar():
+    from datetime import date
+
+    feed = make_feed()
+    trips = lambda stop_times: [st["trip_id"] for st in stop_times]
+
+    monday, saturday, sunday = date(2015, 3, 9), date(2015, 3, 7), date(2015, 3, 8)
+    assert trips(feed.next_stop_times("1", 0, day=monday)) == ["b", "a", "d"]
+    assert trips(feed.next_stop_times("1", 0, day=saturday)) == ["e"]
+    assert trips(feed.next_stop_times("1", 0, day=sunday)) == []
+    assert trips(feed.next_stop_times("1", 0, limit=1, day=monday)) == ["b"]
+
+    # a holiday monday that runs the saturday timetable instead
+    holiday = date(2015, 3, 2)
+    assert trips(feed.next_stop_times("1", 0, day=holiday)) == ["e"]
+    assert trips(feed.find_stop_times(stop_id="2", day=holiday)) == ["c"]
+    assert trips(feed.find_stop_times(day=monday)) == ["a", "b", "b", "d"]
+
+    # outside the calendar, the usual weekly timetable is assumed
+    assert trips(feed.next_stop_times("1", 0, day=date(2026, 10, 19))) == ["b", "a", "d"]
+    assert trips(feed.next_stop_times("1", 0, day=date(2026, 10, 18))) == []
+
+
+def test_shape():
+    feed = make_feed()
+    assert feed.shape("s") == [(-23.7, 133.87), (-23.7, 133.8705), (-23.7, 133.871), (-23.71, 133.871)]
+    # the middle point of the straight first half is the first to go
+    assert feed.shape("s", 1) == [(-23.7, 133.87), (-23.7, 133.871), (-23.71, 133.871)]
+    assert feed.shape("s", 10000) == [(-23.7, 133.87), (-23.71, 133.871)]
+    assert feed.shape("t") is None
+
+
+def test_trip():
+    feed = make_feed()
+    trip = feed.trip("b")
+    assert trip["route_id"] == "r"
+    assert [(stop["stop_id"], stop["stop_name"], stop["arrival_time"]) for stop in trip["stops"]] == [
+        ("1", "One", "7:30:00"),
+        ("2", "Two", "7:45:00"),
+    ]
+    assert trip["stops"][0]["stop_lat"] == "-23.7"
+    assert feed.trip("z") is None
+
+
+def test_route_stops():
+    feed = make_feed()
+    stop_ids = lambda stops: [stop["stop_id"] for stop in stops]
+    # in the order of the longest trip, b
+    assert stop_ids(feed.route_stops("r")) == ["1", "2"]
+    # trips of the same length go in order of ID, c then e
+    assert stop_ids(feed.route_stops("s")) == ["2", "1"]
+    assert feed.route_stops("t") == []
+    assert feed.route_stops("u") is None
+
+
+def test_route_stops_directions():
+    # Out along 1 2 3 4, with a short trip that detours to 5, and back
+    # along 4 3 6 1.
+    stops = Table.build(
+        ["stop_id", "stop_name", "stop_lat", "stop_lon"],
+        [[str(n), str(n), "-23.7", "133.87"] for n in range(1, 7)],
+    )
+    visits = {"long": "1234", "short": "15", "back": "4361"}
+    stop_times = Table.build(
+        ["trip_id", "stop_id", "arrival_time", "departure_time", "stop_sequence"],
+        [
+            [trip_id, stop_id, "8:00:00", "8:00:00", str(sequence)]
+            for trip_id, stop_ids in visits.items()
+            for sequence, stop_id in enumerate(stop_ids)
+        ],
+    )
+    trips = Table.build(
+        ["trip_id", "route_id", "service_id", "direction_id"],
+        [["long", "r", "WEEK", "0"], ["short", "r", "WEEK", "0"], ["back", "r", "WEEK", "1"]],
+    )
+    feed = Feed({
+        "stops": stops,
+        "stop_times": stop_times,
+        "routes": Table.build(["route_id"], [["r"]]),
+        "trips": trips,
+        "calendar": make_feed().tables["calendar"],
+        "calendar_dates": Table.build(["service_id", "date", "exception_type"], []),
+        "transfers": Table.build(["from_stop_id", "to_stop_id", "transfer_type", "min_transfer_time"], []),
+        "shapes": Table.build(["shape_id", "shape_pt_lat", "shape_pt_lon", "shape_pt_sequence"], []),
+    })
+    # the longest trip each way, then 5, which only the short trip visits
+    assert [stop["stop_id"] for stop in feed.route_stops("r")] == ["1", "2", "3", "4", "6", "5"]
@@ -0,0 +1,45 @@
+from ncss_apis.planner import Connections, earliest_arrival
+
+
+def make_connections(rows):
+    # rows of (dep_stop, arr_stop, dep_time, arr_time, trip)
+    rows = sorted(rows, key=lambda row: (row[2], row[3]))
+    return Connections(*(list(column) for column in zip(*rows)))
+
+
+TIMETABLE = make_connections([
+    # trip 0 goes 0 -> 1 -> 2 slowly
+    (0, 1, 100, 200, 0),
+    (1, 2, 210, 400, 0),
+    # trip 1 goes 1 -> 3 quickly, then 3 is a short walk from 2
+    (1, 3, 220, 250, 1),
+    # trip 2 leaves 0 too early for a journey starting at 100
+    (0, 2, 50, 60, 2),
+])
+
+
+def test_earliest_arrival_single_trip():
+    legs = earliest_arrival(TIMETABLE, 0, 2, 100)
+    assert len(legs) == 1
+    leg = legs[0]
+    assert (leg.from_stop, leg.to_stop, leg.departure, leg.arrival, leg.trip) == (0, 2, 100, 400, 0)
+
+
+def test_earliest_arrival_with_transfer_and_walk():
+    footpaths = {3: [(2, 60)]}
+    legs = earliest_arrival(TIMETABLE, 0, 2, 100, footpaths)
+    assert [(leg.from_stop, leg.to_stop, leg.trip) for leg in legs] == [(0, 1, 0), (1, 3, 1), (3, 2, None)]
+    assert legs[-1].departure == 250
+    assert legs[-1].arrival == 310
+
+
+def test_earliest_arrival_runs():
+    # without trip 0, nothing leaves stop 0 after 100
+    assert earliest_arrival(TIMETABLE, 0, 2, 100, runs=lambda c: TIMETABLE.trip[c] != 0) is None
+    legs = earliest_arrival(TIMETABLE, 0, 2, 0, runs=lambda c: TIMETABLE.trip[c] != 0)
+    assert [(leg.departure, leg.arrival, leg.trip) for leg in legs] == [(50, 60, 2)]
+
+
+def test_earliest_arrival_unreachable():
+    assert earliest_arrival(TIMETABLE, 2, 0, 0) is None
+    assert earliest_arrival(TIMETABLE, 0, 2, 500) is None
@@ -0,0 +1,70 @@
+from datetime import date, timedelta
+
+from astral import Astral, AstralError, SUN_RISING, SUN_SETTING
+
+from ncss_apis.solar import day_events, day_events_range, elevation_time
+
+
+def astral_tolerance(lat):
+    # Astral works out where the sun is at midnight UTC rather than at the
+    # time asked for, so it drifts further from us away from the equator,
+    # where the sun crosses each elevation at a shallower angle.
+    for below, seconds in [(40, 120), (50, 160), (60, 240)]:
+        if abs(lat) < below:
+            return seconds
+    return 360
+
+
+def test_matches_astral():
+    a = Astral()
+    cities = [a[name] for name in a.geocoder.locations]
+    assert any(abs(city.latitude) >= 60 for city in cities)
+    for city in cities:
+        tolerance = astral_tolerance(city.latitude)
+        for day in [date(2019, 1, 13), date(2020, 6, 21), date(2021, 9, 30)]:
+            for elevation, direction in [(6, SUN_SETTING), (-4, SUN_SETTING), (6, SUN_RISING), (-0.833, SUN_RISING)]:
+                try:
+                    expected = a.time_at_elevation_utc(elevation, direction, day, city.latitude, city.longitude)
+                except AstralError:
+                    # the sun barely reaches it, e.g. 6 degrees in Yellowknife
+                    # in January, so the drift can put it out of reach
+                    continue
+                actual = elevation_time(day, city.latitude, city.longitude, elevation, direction == SUN_RISING)
+                assert abs((actual - expected).total_seconds()) < tolerance, (city.name, day, elevation)
+
+
+def test_day_events_range():
+    # the same times as working each day out on its own, to the second
+    start = date(2019, 12, 20)
+    for lat, lon in [(-33.87, 151.21), (51.5, -0.13), (69.65, 18.96), (78, 15)]:
+        for offset, events in enumerate(day_events_range(start, 30, lat, lon)):
+            expected = day_events(start + timedelta(days=offset), lat, lon)
+            assert events.keys() == expected.keys()
+            for name, time in events.items():
+                if expected[name] is None:
+                    assert time is None, (lat, offset, name)
+                else:
+                    assert abs((time - expected[name]).total_seconds()) <= 1, (lat, offset, name)
+
+
+def test_day_events():
+    events = day_events(date(2019, 1, 13), -33.87, 151.21)
+    assert (
+        events["morning_golden_hour_start"]
+        < events["sunrise"]
+        < events["morning_golden_hour_end"]
+        < events["golden_hour_start"]
+        < events["sunset"]
+        < events["golden_hour_end"]
+    )
+
+    # the sun doesn't rise in Svalbard in January, or set in June
+    assert set(day_events(date(2019, 1, 13), 78, 15).values()) == {None}
+    assert day_events(date(2019, 6, 21), 78, 15)["sunset"] is None
+
+
+def test_day_to_day():
+    # consecutive days' sunsets are within a few minutes of a day apart
+    sunsets = [elevation_time(date(2019, 1, 1) + timedelta(days=n), 51.5, -0.13, -0.833, False) for n in range(365)]
+    for today, tomorrow in zip(sunsets, sunsets[1:]):
+        assert abs((tomorrow - today).total_seconds() - 86400) < 180
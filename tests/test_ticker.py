@@ -0,0 +1,84 @@
+import threading
+
+from ncss_apis.ticker import Ticker
+
+
+def test_ticker_fans_out_changes():
+    computed = []
+    values = {"a": 1, "b": 10}
+
+    def compute(key, now):
+        computed.append(key)
+        return values[key]
+
+    ticker = Ticker(compute, interval=3600, clock=lambda: None)
+    first = ticker.subscribe("a")
+    second = ticker.subscribe("a")
+    other = ticker.subscribe("b")
+    assert first.get_nowait() == 1
+    assert second.get_nowait() == 1
+    assert other.get_nowait() == 10
+    assert computed == ["a", "b"]
+
+    # nothing changed, so nothing is sent
+    ticker.tick()
+    assert first.empty() and second.empty() and other.empty()
+
+    values["a"] = 2
+    computed.clear()
+    ticker.tick()
+    # each key is computed once however many subscribers it has
+    assert sorted(computed) == ["a", "b"]
+    assert first.get_nowait() == 2
+    assert second.get_nowait() == 2
+    assert other.empty()
+
+
+def test_ticker_unsubscribe():
+    ticker = Ticker(lambda key, now: key, interval=3600, clock=lambda: None)
+    first = ticker.subscribe("a")
+    second = ticker.subscribe("a")
+    assert ticker.subscriber_count("a") == 2
+    ticker.unsubscribe("a", first)
+    assert ticker.subscriber_count("a") == 1
+    ticker.unsubscribe("a", second)
+    assert ticker.subscriber_count("a") == 0
+    ticker.unsubscribe("a", second)
+
+
+def test_ticker_stream():
+    ticker = Ticker(lambda key, now: key.upper(), interval=3600, clock=lambda: None)
+    stream = ticker.stream("a", keepalive=0.01)
+    assert next(stream) == "A"
+    assert ticker.subscriber_count("a") == 1
+    assert next(stream) is None
+    stream.close()
+    assert ticker.subscriber_count("a") == 0
+
+
+def test_ticker_subscribe_computes_outside_lock():
+    started, release = threading.Event(), threading.Event()
+
+    def compute(key, now):
+        if key == "slow":
+            started.set()
+            release.wait(5)
+        return key
+
+    ticker = Ticker(compute, interval=3600, clock=lambda: None)
+    ticker.subscribe("a")
+    slow = threading.Thread(target=ticker.subscribe, args=("slow",))
+    slow.start()
+    assert started.wait(5)
+
+    # while the first subscriber to "slow" waits on its value, others can
+    # still subscribe and ticks still go out
+    others = threading.Thread(target=lambda: (ticker.subscribe("b"), ticker.tick()))
+    others.start()
+    others.join(1)
+    blocked = others.is_alive()
+    release.set()
+    slow.join(5)
+    others.join(5)
+    assert not blocked
+    assert ticker.subscriber_count("slow") == 1
@@ -0,0 +1,66 @@
+import os
+import subprocess
+import sys
+import threading
+
+from ncss_apis.utils import Lazy, lazy_import
+
+
+def test_lazy():
+    calls = []
+
+    def factory():
+        calls.append(1)
+        return {"a": [1, 2, 3]}
+
+    value = Lazy(factory)
+    assert calls == []
+    assert value["a"] == [1, 2, 3]
+    assert value.get() is value.get()
+    assert list(value.keys()) == ["a"]
+    assert calls == [1]
+
+
+def test_lazy_built_once_across_threads():
+    calls = []
+    started = threading.Event()
+
+    def factory():
+        calls.append(1)
+        started.wait(1)
+        return object()
+
+    value = Lazy(factory)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(value.get())) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    started.set()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+    assert len(set(map(id, results))) == 1
+
+
+def test_lazy_import():
+    dumps = lazy_import("json", "dumps")
+    assert dumps.name == "json.dumps"
+    assert dumps([1]) == "[1]"
+
+
+def test_import_is_lazy():
+    # importing the app shouldn't load the slow libraries, unless asked to
+    code = "import sys, ncss_apis; print(*(m for m in ['pint', 'art', 'num2words', 'astral'] if m in sys.modules))"
+    env = {key: value for key, value in os.environ.items() if key != "NCSS_APIS_WARM"}
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True, env=env)
+    assert result.stdout.split() == []
+
+    for off in ["0", "false"]:
+        env["NCSS_APIS_WARM"] = off
+        result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True, env=env)
+        assert result.stdout.split() == []
+
+    for on in ["1", "true"]:
+        env["NCSS_APIS_WARM"] = on
+        result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True, env=env)
+        assert result.stdout.split() == ["pint", "art", "num2words", "astral"]